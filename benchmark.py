@@ -36,7 +36,8 @@ with namespace("test") as np:
     )
 
 analyser = command_manager.require(alc)
-argv = analyser.argv
+state = analyser.acquire()
+argv = state.argv
 print(alc)
 msg = [Plain(".test"), At(124)]
 count = 20000
@@ -47,8 +48,8 @@ if __name__ == "__main__":
     for _ in range(count):
         st = time.perf_counter()
         argv.build(msg)
-        analyser.process(argv)
-        analyser.reset()
+        analyser.process(state)
+        state.reset()
         sec += time.perf_counter() - st
     print(f"Alconna: {count / sec:.2f}msg/s")
 
@@ -58,8 +59,8 @@ if __name__ == "__main__":
     for _ in range(count):
         st = time.thread_time_ns()
         argv.build(msg)
-        analyser.process(argv)
-        analyser.reset()
+        analyser.process(state)
+        state.reset()
         li += (time.thread_time_ns() - st)
 
     print(f"Alconna: {li / count} ns per loop with {count} loops")
@@ -70,8 +71,8 @@ if __name__ == "__main__":
     prof.enable()
     for _ in range(count):
         argv.build(msg)
-        analyser.process(argv)
-        analyser.reset()
+        analyser.process(state)
+        state.reset()
     prof.create_stats()
 
     stats = pstats.Stats(prof)
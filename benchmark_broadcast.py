@@ -0,0 +1,28 @@
+import time
+
+from arclet.alconna import AllParam, Alconna, Args, Config, Option, ShardedBroadcaster, command_manager, namespace
+
+# 紧凑头部的命令都是命令 "bench" 的候选, 因此每条消息都需要解析大量命令
+for i in range(2000):
+    with namespace(f"bench{i}") as np:
+        np.prefixes = ["/"]
+        np.config.enable_message_cache = False
+        Alconna("bench", Args.foo(int), Option("--bar", Args.baz(str)), Args.rest(AllParam), Config(compact=True))
+
+messages = [f"/bench{i} --bar baz" for i in range(200)]
+
+
+if __name__ == "__main__":
+    st = time.perf_counter()
+    serial = [dict(command_manager.broadcast(msg)) for msg in messages]
+    sec = time.perf_counter() - st
+    print(f"serial: {len(messages) / sec:.2f}msg/s")
+
+    for workers in (2, 4, 8):
+        with ShardedBroadcaster(workers) as broadcaster:
+            broadcaster.broadcast("/bench0")  # 预热工作进程
+            st = time.perf_counter()
+            sharded = broadcaster.broadcast_many(messages)
+            sec = time.perf_counter() - st
+        assert [list(r) for r in sharded] == [list(r) for r in serial]
+        print(f"sharded x{workers}: {len(messages) / sec:.2f}msg/s")
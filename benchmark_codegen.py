@@ -0,0 +1,33 @@
+import time
+
+from arclet.alconna import Alconna, Args, Config, Option, Subcommand, codegen_compiler
+
+
+def make(name: str, compiler=None):
+    return Alconna(
+        name,
+        Args.foo(int),
+        Option("--bar", Args.baz(str)),
+        Option("-v"),
+        Subcommand("sub", Args.qux(int), Option("--quux", Args.corge(float, 1.0))),
+        Config(compiler=compiler, enable_message_cache=False),
+    )
+
+
+default = make("test")
+codegen = make("test1", codegen_compiler)
+messages = ["{} 1", "{} 1 --bar baz -v", "{} 1 sub 2 --quux 3.5", "{} 1 -v sub 2"]
+count = 20000
+
+if __name__ == "__main__":
+    for msg in messages:
+        assert default.parse(msg.format("test")).all_matched_args == codegen.parse(msg.format("test1")).all_matched_args
+
+    for label, alc in (("default", default), ("codegen", codegen)):
+        batch = [msg.format(alc.command) for msg in messages]
+        st = time.perf_counter()
+        for _ in range(count):
+            for msg in batch:
+                alc.parse(msg)
+        sec = time.perf_counter() - st
+        print(f"{label}: {count * len(messages) / sec:.2f}msg/s")
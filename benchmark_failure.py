@@ -0,0 +1,24 @@
+import time
+
+from arclet.alconna import Alconna, Args, Config, Option
+
+cached = Alconna("cmd", Args.foo(int), Option("--bar", Args.baz(str)), Config(failure_cache=128))
+plain = Alconna("cmd2", Args.foo(int), Option("--bar", Args.baz(str)))
+cases = {
+    "bad args": "{} abc --bar baz",
+    "unknown option": "{} 1 --qux",
+}
+count = 50000
+
+
+if __name__ == "__main__":
+    for name, message in cases.items():
+        st = time.perf_counter()
+        for _ in range(count):
+            plain.parse(message.format("cmd2"))
+        old = count / (time.perf_counter() - st)
+        st = time.perf_counter()
+        for _ in range(count):
+            cached.parse(message.format("cmd"))
+        new = count / (time.perf_counter() - st)
+        print(f"{name}: {old:.2f}msg/s -> {new:.2f}msg/s, x{new / old:.2f}")
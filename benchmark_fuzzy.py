@@ -0,0 +1,41 @@
+import random
+import time
+
+from arclet.alconna.ingedia._util import fuzzy_match
+
+
+def levenshtein(source: str, target: str) -> float:
+    """此前使用的全矩阵实现, 作为对照"""
+    l_s, l_t = len(source), len(target)
+    s_range, t_range = range(l_s + 1), range(l_t + 1)
+    matrix = [[(i if j == 0 else j) for j in t_range] for i in s_range]
+
+    for i in s_range[1:]:
+        for j in t_range[1:]:
+            sub_distance = matrix[i - 1][j - 1] + (0 if source[i - 1] == target[j - 1] else 1)
+            matrix[i][j] = min(matrix[i - 1][j] + 1, matrix[i][j - 1] + 1, sub_distance)
+
+    return 1 - float(matrix[l_s][l_t]) / max(l_s, l_t)
+
+
+rng = random.Random(0)
+letters = "abcdefghijklmnopqrstuvwxyz-"
+aliases = frozenset("--" + "".join(rng.choice(letters) for _ in range(rng.randint(3, 14))) for _ in range(40))
+queries = ["--" + "".join(rng.choice(letters) for _ in range(rng.randint(3, 14))) for _ in range(500)]
+threshold = 0.6
+count = 20
+
+
+if __name__ == "__main__":
+    st = time.perf_counter()
+    for _ in range(count):
+        expected = [next((al for al in aliases if levenshtein(q, al) >= threshold), None) for q in queries]
+    old = count * len(queries) / (time.perf_counter() - st)
+    print(f"matrix: {old:.2f}query/s")
+
+    st = time.perf_counter()
+    for _ in range(count):
+        result = [fuzzy_match(aliases, q, threshold) for q in queries]
+    new = count * len(queries) / (time.perf_counter() - st)
+    print(f"indexed: {new:.2f}query/s, x{new / old:.2f}")
+    assert result == expected
@@ -0,0 +1,38 @@
+import time
+
+from arclet.alconna import Alconna, Args, Config, Option, Subcommand
+
+options = [Option(f"--opt{i}", getattr(Args, f"v{i}")(int), default=i) for i in range(20)]
+subcommands = [Subcommand(f"sub{i}", Option(f"--inner{i}", getattr(Args, f"w{i}")(str)), getattr(Args, f"s{i}")(int)) for i in range(5)]
+message = "cmd " + " ".join(f"--opt{i} {i}" for i in range(0, 20, 2)) + " sub0 1 --inner0 x sub1 2"
+count = 20000
+
+
+def run(lazy: bool):
+    alc = Alconna("cmd", *options, *subcommands, Config(enable_message_cache=False, lazy_result=lazy))
+    analyser = alc.compile()
+    state = analyser.acquire()
+    argv = state.argv
+    export = 0.0
+    st = time.perf_counter()
+    for _ in range(count):
+        state.reset()
+        argv.enter(None).build(message)
+        analyser.process(state)
+        _st = time.perf_counter()
+        res = analyser.export(state)
+        export += time.perf_counter() - _st
+        assert res.matched
+    total = time.perf_counter() - st
+    st = time.perf_counter()
+    for _ in range(count):
+        alc.parse(message)
+    return export, total, time.perf_counter() - st
+
+
+if __name__ == "__main__":
+    eager = run(False)
+    lazy = run(True)
+    print(f"export: eager {eager[0]:.4f}s, lazy {lazy[0]:.4f}s, x{eager[0] / lazy[0]:.2f}")
+    print(f"process + export: eager {eager[1]:.4f}s, lazy {lazy[1]:.4f}s, x{eager[1] / lazy[1]:.2f}")
+    print(f"parse: eager {count / eager[2]:.2f}msg/s, lazy {count / lazy[2]:.2f}msg/s, x{eager[2] / lazy[2]:.2f}")
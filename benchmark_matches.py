@@ -0,0 +1,32 @@
+import time
+
+from arclet.alconna import Alconna, Args, Config, Option, Subcommand
+
+alc = Alconna(
+    ["!", "/"],
+    "cmd",
+    Args.foo(int),
+    Option("--bar", Args.baz(str)),
+    Subcommand("sub", Args.qux(int), Option("--flag")),
+    Config(enable_message_cache=False),
+)
+cases = {
+    "matching": "/cmd 123 --bar abc sub 456 --flag",
+    "bad args": "/cmd abc --bar abc sub 456",
+    "other command": "/other 123 --bar abc",
+}
+count = 20000
+
+
+if __name__ == "__main__":
+    for name, message in cases.items():
+        assert alc.parse(message).matched == alc.matches(message)[0]
+        st = time.perf_counter()
+        for _ in range(count):
+            alc.parse(message)
+        old = count / (time.perf_counter() - st)
+        st = time.perf_counter()
+        for _ in range(count):
+            alc.matches(message)
+        new = count / (time.perf_counter() - st)
+        print(f"{name}: parse {old:.2f}msg/s, matches {new:.2f}msg/s, x{new / old:.2f}")
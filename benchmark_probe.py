@@ -0,0 +1,29 @@
+import time
+
+from arclet.alconna import Alconna, Args, Config, Option
+
+alc = Alconna(["!", "/"], "cmd", Args.foo(int), Option("--bar", Args.baz(str)), Config(enable_message_cache=False))
+probed = Alconna(
+    ["!", "/"], "cmd", Args.foo(int), Option("--bar", Args.baz(str)), Config(enable_message_cache=False, probe_header=True)
+)
+cases = {
+    "chat message": "hello everyone, what are we doing tonight?",
+    "other command": "/other 123 --bar abc",
+    "matching": "/cmd 123 --bar abc",
+}
+count = 50000
+
+
+def run(command: Alconna, message):
+    st = time.perf_counter()
+    for _ in range(count):
+        command.parse(message)
+    return count / (time.perf_counter() - st)
+
+
+if __name__ == "__main__":
+    for name, message in cases.items():
+        old = run(alc, message)
+        new = run(probed, message)
+        print(f"{name}: without probe {old:.2f}msg/s, with probe {new:.2f}msg/s, x{new / old:.2f}")
+    print(probed.probe_stats)
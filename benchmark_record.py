@@ -0,0 +1,58 @@
+import gc
+import time
+import tracemalloc
+
+from arclet.alconna import Alconna, Args, Config, command_manager
+
+
+class Segment:
+    """与常见适配器一致, 元素的数据存放在字典中"""
+
+    def __init__(self, type: str, data: dict):
+        self.type = type
+        self.data = data
+
+    def __repr__(self):
+        return f"Segment({self.type!r}, {len(self.data['raw'])} bytes)"
+
+
+class Event:
+    """随消息一同传入上下文的事件, 其原始数据不属于解析结果"""
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+
+
+configs = {
+    "shared LRU(128)": Config(),
+    "budget 1MB": Config(record_budget=1 << 20),
+    "budget 1MB, compact": Config(record_budget=1 << 20, record_compact=True),
+}
+count = 1000
+
+
+def feed(alc: Alconna, name: str):
+    for j in range(count):
+        alc.parse([f"{name} {j}", Segment("image", {"raw": bytes(64 * 1024)})], {"event": Event(bytes(64 * 1024))})
+
+
+if __name__ == "__main__":
+    for i, (name, config) in enumerate(configs.items()):
+        alc = Alconna(f"img{i}", Args.index(int).image(Segment), config)
+        # 吞吐量与内存分开测量, 以免 tracemalloc 的开销影响吞吐量
+        st = time.perf_counter()
+        feed(alc, f"img{i}")
+        rate = count / (time.perf_counter() - st)
+        command_manager.clear_result(alc)
+        gc.collect()
+        tracemalloc.start()
+        feed(alc, f"img{i}")
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = command_manager.record_stats(alc)
+        print(
+            f"{name}: {rate:.2f}msg/s, retained {current / 1024 / 1024:.2f}MB, "
+            f"{len(command_manager.get_result(alc))} records, {stats}"
+        )
+        command_manager.clear_result(alc)
@@ -0,0 +1,37 @@
+import time
+
+from arclet.alconna import Alconna, Args, Option, Subcommand, command_manager, namespace
+from arclet.alconna._stargazing.compiler import parse_sistana
+
+
+def make(backend: str):
+    with namespace(f"bench_{backend}") as np:
+        np.config.backend = backend
+        np.config.enable_message_cache = False
+        return Alconna(
+            "test",
+            Args.foo(int),
+            Option("--bar", Args.baz(str)),
+            Option("-v"),
+            Subcommand("sub", Args.qux(int), Option("--quux", Args.corge(float, 1.0))),
+        )
+
+
+ingedia = make("ingedia")
+sistana = make("sistana")
+messages = ["test 1", "test 1 --bar baz -v", "test 1 sub 2 --quux 3.5", "test 1 -v sub 2"]
+count = 20000
+
+if __name__ == "__main__":
+    analyser = command_manager.require(sistana)
+    assert all(parse_sistana(sistana, analyser, msg) for msg in messages)
+    for msg in messages:
+        assert ingedia.parse(msg).all_matched_args == sistana.parse(msg).all_matched_args
+
+    for alc in (ingedia, sistana):
+        st = time.perf_counter()
+        for _ in range(count):
+            for msg in messages:
+                alc.parse(msg)
+        sec = time.perf_counter() - st
+        print(f"{alc.config.backend}: {count * len(messages) / sec:.2f}msg/s")
@@ -0,0 +1,42 @@
+import time
+
+from arclet.alconna import Config
+from arclet.alconna.ingedia._argv import Argv
+
+argv = Argv(Config(enable_message_cache=False), separators=" ")
+words = "lorem ipsum dolor sit amet consectetur adipiscing elit".split()
+
+
+def consume(text: str) -> int:
+    argv.build(text)
+    count = 0
+    while not argv.done:
+        data, _ = argv.next()
+        argv.rollback(data)
+        argv.next()
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    threshold = Argv.span_threshold
+    for size in (10_000, 100_000, 1_000_000):
+        text = ""
+        while len(text) < size:
+            text += " ".join(words) + " "
+        text = text[:size].strip()
+        Argv.span_threshold = threshold
+        st = time.perf_counter()
+        new_count = consume(text)
+        new = time.perf_counter() - st
+        if size > 100_000:
+            # 切分剩余字符串的方式是平方级的, 且撤销日志会保留每个剩余字符串, 不再对照
+            print(f"{size // 1000}KB, {new_count} tokens: span {new:.4f}s")
+            continue
+        Argv.span_threshold = len(text) + 1
+        st = time.perf_counter()
+        old_count = consume(text)
+        old = time.perf_counter() - st
+        Argv.span_threshold = threshold
+        assert old_count == new_count
+        print(f"{size // 1000}KB, {new_count} tokens: split {old:.4f}s, span {new:.4f}s, x{old / new:.2f}")
@@ -0,0 +1,41 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from arclet.alconna import Alconna, Args, Config, Option, Subcommand
+
+def make(name: str, cache: bool):
+    return Alconna(
+        name,
+        Args.foo(int),
+        Option("--bar", Args.baz(str)),
+        Subcommand("sub", Args.qux(int)),
+        Config(enable_message_cache=cache, failure_cache=64 if cache else 0),
+    )
+
+
+count = 20000
+
+
+def work(alc: Alconna, index: int):
+    for i in range(count):
+        # 每个线程只有 8 种消息, 开启缓存时几乎全部命中记录, 用于检验并发读写记录时的开销
+        alc.parse(f"{alc.name} {index} --bar baz sub {i % 8}")
+
+
+if __name__ == "__main__":
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    if gil:
+        print("note: with the GIL enabled, threads only check correctness; no throughput gain is expected")
+    for alc in (make("nocache", False), make("cache", True)):
+        base = 0.0
+        print(f"{alc.name}:")
+        for threads in (1, 2, 4, 8):
+            st = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                for fut in [pool.submit(work, alc, i) for i in range(threads)]:
+                    fut.result()
+            rate = threads * count / (time.perf_counter() - st)
+            base = base or rate
+            print(f"  {threads} thread(s): {rate:.2f}msg/s, x{rate / base:.2f}")
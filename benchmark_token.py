@@ -0,0 +1,45 @@
+import time
+from dataclasses import dataclass, field
+
+from arclet.alconna import Config
+from arclet.alconna.ingedia._argv import Argv
+
+
+@dataclass(frozen=True)
+class At:
+    target: str
+    extra: tuple = field(default=(("name", "someone"), ("role", "member")))
+
+
+@dataclass(frozen=True)
+class Image:
+    url: str
+    meta: tuple = field(default=tuple((f"k{i}", i) for i in range(20)))
+
+
+class Legacy(Argv):
+    @staticmethod
+    def generate_token(data: list) -> int:
+        return hash(repr(data))
+
+
+cases = {
+    "text": ["cmd foo bar --baz 123"],
+    "long text": ["cmd " + "word " * 400],
+    "rich": ["cmd", At("123456"), "hello", Image("https://example.com/a.png"), At("654321")],
+}
+count = 50000
+
+
+def run(argv: Argv, data: list):
+    st = time.perf_counter()
+    for _ in range(count):
+        argv.build(data)
+    return count / (time.perf_counter() - st)
+
+
+if __name__ == "__main__":
+    for name, data in cases.items():
+        old = run(Legacy(Config(enable_message_cache=True)), data)
+        new = run(Argv(Config(enable_message_cache=True)), data)
+        print(f"{name}: hash(repr) {old:.2f}msg/s, fingerprint {new:.2f}msg/s, x{new / old:.2f}")
@@ -27,7 +27,7 @@ class Commands:
     async def broadcast(self, message: Optional[Any] = None):
         data = {}
         for alc, (executor, block) in self.executors.items():
-            arp = alc.parse(message) if message else alc()
+            arp = (await alc.aparse(message)) if message else alc()
             if arp.matched:
                 res = executor.result
                 data[alc.path] = (await res) if is_awaitable(res) else res
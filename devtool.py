@@ -4,6 +4,7 @@ import traceback
 from collections import namedtuple
 from typing import Any, Literal
 
+from arclet.alconna._trie import CharTrie
 from arclet.alconna.ingedia._analyser import Analyser, default_compiler
 from arclet.alconna.ingedia._handlers import analyse_header as alh
 from arclet.alconna.ingedia._handlers import analyse_args as ala
@@ -34,6 +35,8 @@ class _DummyAnalyser(Analyser):
         cls.command = cls._DummyALC()  # type: ignore
         cls.compile_params = {}
         cls.compact_params = []
+        cls.compact_trie = CharTrie()
+        cls.compact_any = []
         cls.default_opt_result = {}
         return super().__new__(cls)
 
@@ -91,7 +94,6 @@ def analyse_option(
     conf = Config(keep_crlf=False, fuzzy_match=False, raise_exception=raise_exception, context_style=context_style)
     argv: Argv[DataCollection] = Argv(conf, dev_space)
     _analyser = _DummyAnalyser.__new__(_DummyAnalyser)
-    _analyser.reset()
     _analyser.command.separators = " "
     _analyser.need_main_args = False
     _analyser.command.options.append(option)
@@ -101,8 +103,9 @@ def analyse_option(
     try:
         argv.enter(kwargs)
         argv.build(command)
-        alo(_analyser, argv, option, False)
-        return _analyser.options_result[option.dest]
+        state = _analyser.new_state()
+        alo(state, argv, option, False)
+        return state.options_result[option.dest]
     except Exception as e:
         if raise_exception:
             traceback.print_exception(AnalyseError, e, e.__traceback__)
@@ -119,7 +122,6 @@ def analyse_subcommand(
     conf = Config(keep_crlf=False, fuzzy_match=False, raise_exception=raise_exception, context_style=context_style)
     argv: Argv[DataCollection] = Argv(conf, dev_space)
     _analyser = _DummyAnalyser.__new__(_DummyAnalyser)
-    _analyser.reset()
     _analyser.command.separators = " "
     _analyser.need_main_args = False
     _analyser.command.options.append(subcommand)
@@ -16,6 +16,8 @@ from .args import arg_field as arg_field
 from .args import Field as Field
 from .arparma import Arparma as Arparma
 from .arparma import ArparmaBehavior as ArparmaBehavior
+from .arparma import QueryPath as QueryPath
+from .arparma import query_path as query_path
 from .base import Option as Option
 from .base import Subcommand as Subcommand
 from .base import Metadata as Metadata
@@ -36,8 +38,11 @@ from .exceptions import InvalidParam as InvalidParam
 from .exceptions import NullMessage as NullMessage
 from .exceptions import ParamsUnmatched as ParamsUnmatched
 from .formatter import TextFormatter as TextFormatter
+from .ingedia._codegen import codegen_compiler as codegen_compiler
+from .ingedia._codegen import codegen_source as codegen_source
 from .manager import ShortcutArgs as ShortcutArgs
 from .manager import command_manager as command_manager
+from .sharding import ShardedBroadcaster as ShardedBroadcaster
 from .typing import AllParam as AllParam
 
 __version__ = "1.8.31"
@@ -1,303 +1,335 @@
+"""将 Alconna 命令编译为 Sistana 的命令模式, 作为可选的解析后端
+
+编译结果保存在命令的解析器上, 因此会在命令更新 (即解析器重建) 时一同失效.
+编译器只转换能与默认解析流程等价的特性; 对于不受支持的命令、消息, 或 Sistana 未能完整解析的消息,
+`parse_sistana` 会返回 None, 交由默认的解析流程处理, 从而保证两者的解析结果一致.
+"""
+
 from __future__ import annotations
 
-from collections import deque
-from typing import Any, Iterable, Sequence, overload
+from contextvars import ContextVar
+from itertools import count
+from typing import TYPE_CHECKING, Any
 
-import tarina
 from elaina_segment import Buffer
-from elaina_triehard import TrieHard
-
-from arclet.alconna import Alconna, Arg, Args, Arparma, HeadResult, Option, OptionResult, Subcommand, SubcommandResult
-from arclet.alconna.exceptions import (
-    ArgumentMissing,
-    InvalidArgs,
-    InvalidParam,
-    NullMessage,
-    ParamsUnmatched,
-    UnexpectedElement,
-)
-from arclet.alconna.sistana import (
-    Analyzer,
-    AnalyzeSnapshot,
-    Fragment,
-    LoopflowExitReason,
-    OptionPattern,
-    Preset,
-    SubcommandPattern,
-    Track,
-    Value,
-)
-from arclet.alconna.sistana.err import ParsePanic, Rejected
-from arclet.alconna.sistana.model.fragment import _Fragment
-from arclet.alconna.sistana.model.pointer import PointerRole
-from arclet.alconna.sistana.model.snapshot import SubcommandTraverse
-
-from .flywheel import build_runes
-
-
-def _alc_args_to_fragments(args: Args) -> deque[_Fragment]:
-    alc_argument = args.argument
-    fragments = deque()
-
-    for ag in alc_argument:
-        if ag.field.default is tarina.const.Empty:
-            default = None
-        else:
-            default = Value(ag.field.default)
-
-        frag = Fragment(
-            name=ag.name,
-            default=default,
+from tarina import Empty
+
+from ..arparma import Arparma
+from ..base import SPECIAL_OPTIONS, HeadResult, Option, OptionResult, Subcommand
+from ..config import global_config
+from ..ingedia._analyser import SubState
+from ..ingedia._argv import ARGV_OVERRIDES, Argv
+from ..manager import command_manager
+from ..sistana import Analyzer, Fragment, LoopflowExitReason, Rx, SubcommandPattern, Value
+from ..sistana.model.fragment import _Fragment
+
+if TYPE_CHECKING:
+    from nepattern import BasePattern
+
+    from ..args import Arg, _Args
+    from ..core import Alconna
+    from ..ingedia._analyser import Analyser, SubAnalyser
+    from ..sistana import Mix
+
+_seq: ContextVar[count] = ContextVar("_seq")
+"""本次解析中, 值的序号生成器"""
+_MISSING = object()
+"""可选且无默认值的参数缺失时的占位值"""
+_UNSAFE = frozenset("\"'\\")
+"""引号与转义交由默认的解析流程处理"""
+_ACCEPT = frozenset({LoopflowExitReason.completed, LoopflowExitReason.unsatisfied})
+_analyzer = Analyzer()
+
+
+class SeqRx(Rx[Any]):
+    """为接收到的值附加其在本次解析中的序号, 以便还原各个值的先后顺序"""
+
+    def receive(self, fetch, prev, put) -> None:
+        put((next(_seq.get()), fetch()))
+
+
+_rx = SeqRx()
+
+
+class Unsupported(Exception):
+    """命令使用了无法等价转换为 Sistana 的特性"""
+
+
+def _transformer(pattern: BasePattern):
+    def _transform(value: Any):
+        res = pattern.validate(value)
+        if not res.success:
+            raise res.error()
+        return res._value  # noqa
+
+    return _transform
+
+
+class SistanaPlan:
+    """命令的编译结果
+
+    Attributes:
+        pattern (SubcommandPattern): 编译得到的 Sistana 命令模式
+        root (tuple[str, ...]): 主命令的路径
+        nodes (dict): 命令路径 -> (子解析器, 主参数片段, 选项)
+        options (dict): (命令路径, 选项名) -> (头部片段名, 选项, 参数片段)
+        owners (dict): 片段名 -> (所属命令路径, 是否为子命令头部)
+        keywords (set[str]): 所有选项与子命令的名称
+    """
+
+    __slots__ = ("pattern", "root", "nodes", "options", "owners", "keywords", "_count")
+
+    def __init__(self, analyser: Analyser):
+        command = analyser.command
+        argv = analyser.argv
+        if (
+            analyser.extra_allow
+            or command.config.context_style
+            or argv.__class__ is not Argv
+            or str in argv.filter_out
+            or str in argv.preprocessors
+        ):
+            raise Unsupported(command.path)
+        self.root = (command.name,)
+        self.nodes: dict[tuple[str, ...], tuple[SubAnalyser, list[tuple[str, Arg]], list[tuple[tuple[str, ...], str]]]] = {}
+        self.options: dict[tuple[tuple[str, ...], str], tuple[str, Option, list[tuple[str, Arg]]]] = {}
+        self.owners: dict[str, tuple[tuple[str, ...], bool]] = {}
+        self.keywords: set[str] = set()
+        self._count = 0
+        args = self._fragments(self.root, command.args)
+        self.pattern = SubcommandPattern.build(
+            command.name, *(frag for frag, _ in args), separators=command.separators
         )
-        frag.apply_nepattern(ag.value)
-        fragments.append(frag)
-
-    return fragments
-
-
-@overload
-def into_sistana(alconna: Alconna) -> SubcommandPattern: ...
-
-
-@overload
-def into_sistana(alconna: Subcommand) -> SubcommandPattern: ...
-
-
-@overload
-def into_sistana(alconna: Option) -> OptionPattern: ...
-
-
-def into_sistana(alconna: Alconna | Subcommand | Option):
-    if isinstance(alconna, Alconna):
-        alconna.compile()
-
-        subcommands = {}
-        options = {}
-
-        for subcommand in alconna.options:
-            if isinstance(subcommand, Subcommand):
-                pattern = into_sistana(subcommand)
-                subcommands[subcommand.name] = pattern
-                for alias in subcommand.aliases:
-                    subcommands[alias] = pattern
-            elif isinstance(subcommand, Option):
-                pattern = into_sistana(subcommand)
-                options[subcommand.name] = pattern
-                for alias in subcommand.aliases:
-                    options[alias] = pattern
-
-        return SubcommandPattern(
-            header=alconna.command,
-            preset=Preset(
-                {
-                    alconna.name: Track(deque(_alc_args_to_fragments(alconna.args))),
-                    **{
-                        option.name: Track(deque(_alc_args_to_fragments(option.args)))
-                        for option in alconna.options
-                        if isinstance(option, Option)
-                    },
-                }
-            ),
-            options=options,
-            subcommands=subcommands,
-            prefixes=TrieHard(alconna.prefixes) if alconna.prefixes else None,
-            soft_keyword=alconna.soft_keyword,
-        )
-    elif isinstance(alconna, Subcommand):
-        subcommands = {}
-        options = {}
-
-        for subcommand in alconna.options:
-            if not isinstance(subcommand, Subcommand):
+        self._compile(analyser, self.pattern, self.root, args, frozenset())
+
+    def _name(self, path: tuple[str, ...], header: bool = False) -> str:
+        self._count += 1
+        name = f"${self._count}"
+        self.owners[name] = (path, header)
+        return name
+
+    def _fragments(self, path: tuple[str, ...], args: _Args) -> list[tuple[_Fragment, Arg]]:
+        if args.keyword_only or args.vars_positional or args.vars_keyword:
+            raise Unsupported(args)
+        result = []
+        for arg in args.normal:
+            if arg.type_.alias == "*":
+                raise Unsupported(arg)
+            field = arg.field
+            if field.default is not Empty:
+                default = Value((-1, field.default))
+            elif field.optional:
+                default = Value((-1, _MISSING))
+            else:
+                default = None
+            frag = Fragment(
+                self._name(path),
+                default=default,
+                separators=field.seps,
+                hybrid_separators=False,
+                receiver=_rx,
+                transformer=_transformer(arg.type_),
+            )
+            result.append((frag, arg))
+        return result
+
+    def _compile(
+        self,
+        analyser: SubAnalyser,
+        pattern: SubcommandPattern,
+        path: tuple[str, ...],
+        args: list[tuple[_Fragment, Arg]],
+        outer: frozenset[str],
+    ):
+        if analyser.compact_params:
+            raise Unsupported(analyser.command)
+        names = set(analyser.compile_params)
+        # Sistana 优先匹配上级命令的选项, 而默认流程优先匹配当前命令的选项, 因此不允许同名
+        if not names.isdisjoint(outer) or len(names) != sum(len(opt.aliases) for opt in analyser.command.options):
+            raise Unsupported(analyser.command)
+        self.keywords |= names
+        outer |= names
+        options = []
+        self.nodes[path] = (analyser, [(frag.name, arg) for frag, arg in args], options)
+        for opt in analyser.command.options:
+            if opt.soft_keyword:
+                raise Unsupported(opt)
+            aliases = sorted(opt.aliases - {opt.name})
+            if isinstance(opt, Subcommand):
+                sub_path = (*path, opt.name)
+                header = _Fragment(self._name(sub_path, True), receiver=_rx)
+                sub_args = self._fragments(sub_path, opt.args)
+                sub = pattern.subcommand(
+                    opt.name,
+                    *(frag for frag, _ in sub_args),
+                    aliases=aliases,
+                    separators=opt.separators,
+                    header_fragment=header,
+                )
+                self._compile(analyser.compile_params[opt.name], sub, sub_path, sub_args, outer)  # type: ignore
                 continue
-
-            pattern = into_sistana(subcommand)
-            subcommands[subcommand.name] = pattern
-            for alias in subcommand.aliases:
-                subcommands[alias] = pattern
-
-        for option in alconna.options:
-            if not isinstance(option, Option):
-                continue
-
-            pattern = into_sistana(option)
-            options[option.name] = pattern
-            for alias in option.aliases:
-                options[alias] = pattern
-
-        return SubcommandPattern(
-            header=alconna.name,
-            preset=Preset(
-                {
-                    alconna.name: Track(deque(_alc_args_to_fragments(alconna.args))),
-                    **{
-                        option.name: Track(deque(_alc_args_to_fragments(option.args)))
-                        for option in alconna.options
-                        if isinstance(option, Option)
-                    },
-                }
-            ),
-            options=options,
-            subcommands=subcommands,
-            soft_keyword=alconna.soft_keyword,
-        )
-    else:
-        return OptionPattern(
-            keyword=alconna.name,
-            soft_keyword=alconna.soft_keyword,
-        )
-
-
-def _reason_raise_alc_exception(reason: LoopflowExitReason) -> None:
-    if reason == LoopflowExitReason.completed:
-        return
-
-    if reason in {
-        LoopflowExitReason.unsatisfied,
-        LoopflowExitReason.previous_unsatisfied,
-        LoopflowExitReason.switch_unsatisfied_option,
-        LoopflowExitReason.unsatisfied_switch_subcommand,
-    }:
-        raise ParamsUnmatched(f"LoopflowDescription: {reason.value}")
-
-    if reason in {
-        LoopflowExitReason.out_of_data_subcommand,
-        LoopflowExitReason.out_of_data_option,
-    }:
-        raise ArgumentMissing(f"LoopflowDescription: {reason.value}")
-
-    if reason in {
-        LoopflowExitReason.prefix_expect_str,
-        LoopflowExitReason.header_expect_str,
-    }:
-        raise InvalidParam(f"LoopflowDescription: {reason.value}")
-
-    if reason in {
-        LoopflowExitReason.prefix_mismatch,
-        LoopflowExitReason.header_mismatch,
-    }:
-        raise InvalidArgs(f"LoopflowDescription: {reason.value}")
-
-    if reason == LoopflowExitReason.unexpected_segment:
-        raise UnexpectedElement(f"LoopflowDescription: {reason.value}")
-
-    if reason == LoopflowExitReason.option_duplicated_prohibited:
-        raise NullMessage(f"LoopflowDescription: {reason.value}")
-
-
-def _sistana_to_alc_result(traverses: list[SubcommandTraverse]) -> tuple[str, SubcommandResult] | None:
-    if not traverses:
-        return
-
-    first_traverse = traverses[0]
-    mix = first_traverse.mix
-
-    def extract_values_and_args(name: str):
-        track = mix.get_track(name)
-        value = ... if track.header is None else track.assignes[track.header.name]
-        args = {k: v for k, v in track.assignes.items() if track.header is None or k != track.header.name}
-        return value, args
-
-    value, args = extract_values_and_args(first_traverse.subcommand.header)
-    options = (
-        {opt: OptionResult(*extract_values_and_args(opt)) for opt in first_traverse.option_traverses._by_keyword}
-        if first_traverse.option_traverses.traverses
-        else None
-    )
-    subcommand_result = _sistana_to_alc_result(traverses[1:])
-
-    subcommands = None
-    if subcommand_result is not None:
-        subcommand_name, subcommands = subcommand_result
-        subcommands = {subcommand_name: subcommands}
-
-    return first_traverse.ref.last_value, SubcommandResult(value, args, options, subcommands)
-
-
-def dump_arparma(snapshot: AnalyzeSnapshot, message: Sequence[Any], matched: bool = True, head_matched: bool = True) -> Arparma:
-    subcommands = None
-    main_args = None
-    subcmds = None
-    options = None
-    result = _sistana_to_alc_result(snapshot.traverses)
-    if result is not None:
-        subcommands = result[1]
-        main_args = subcommands.args
-        subcmds = subcommands.subcommands
-        options = subcommands.options
-
-    return Arparma(
-        _id=-1,
-        origin=message,
-        matched=matched,
-        header_match=HeadResult(head_matched),
-        main_args=main_args,
-        subcommands=subcmds,
-        options=options,
-    )
-
-
-def process_adapt(pattern: SubcommandPattern, message: Sequence[Any]):
-    analyzer = Analyzer()
-    buffer = Buffer(build_runes(message), runes=False)
-    snapshot = pattern.prefix_entrypoint
-
-    matched = False
-    head_matched = False
-
+            if opt.action.type != 0:
+                raise Unsupported(opt)
+            header = _Fragment(self._name(path), receiver=_rx)
+            opt_args = self._fragments(path, opt.args)
+            pattern.option(
+                opt.name,
+                *(frag for frag, _ in opt_args),
+                aliases=aliases,
+                separators=opt.separators,
+                header_fragment=header,
+            )
+            options.append((path, opt.name))
+            self.options[(path, opt.name)] = (header.name, opt, [(frag.name, arg) for frag, arg in opt_args])
+
+    def _values(self, assignes: dict[str, Any], args: list[tuple[str, Arg]], result: dict[str, Any], seqs: list[int]):
+        """收集参数的值, 若参数缺失或与默认流程的结果可能不一致则返回 False"""
+        for name, arg in args:
+            if name in assignes:
+                seq, value = assignes[name]
+                if seq >= 0:
+                    seqs.append(seq)
+                if value is _MISSING:
+                    continue
+                # 默认流程中, 与选项或子命令同名的参数会被视为缺失
+                if value.__class__ is str and value in self.keywords:
+                    return False
+                result[arg.name] = value
+            elif (default := arg.field.default) is not Empty:
+                result[arg.name] = default
+            elif not arg.field.optional:
+                return False
+        return True
+
+    def export(self, command: Alconna, mix: Mix, message: Any, head: str, ctx: dict[str, Any] | None):
+        """将 Sistana 的解析结果转换为 `Arparma`, 若结果可能与默认流程不一致则返回 None"""
+        assignes = mix.assignes
+        if len(mix.command_tracks) > 1:
+            # 默认流程中, 子命令遇到上级命令的选项后便会结束, 之后不能再回到该子命令
+            owners = self.owners
+            current = self.root
+            for _, (path, enter) in sorted((value[0], owners[name]) for name, value in assignes.items() if value[0] >= 0):
+                if enter:
+                    if path[:-1] != current:
+                        return None
+                elif current[: len(path)] != path:
+                    return None
+                current = path
+        state: SubState | None = None
+        for path in reversed(mix.command_tracks):
+            analyser, args, options = self.nodes[path]
+            child, state = state, SubState(analyser)
+            seqs: list[int] = []
+            if not self._values(assignes, args, state.args_result, seqs):
+                return None
+            if not seqs:
+                # 没有主参数时, 默认流程是否填充默认值取决于后续的参数, 因此交由默认流程处理
+                if state.args_result and not analyser.default_main_only:
+                    return None
+            elif max(seqs) - min(seqs) + 1 != len(seqs):
+                return None
+            emitted = []
+            for key in options:
+                header, opt, opt_args = self.options[key]
+                if header not in assignes:
+                    continue
+                if isinstance(opt, SPECIAL_OPTIONS):
+                    return None
+                if not opt.nargs:
+                    emitted.append((assignes[header][0], opt.dest, OptionResult(opt.action.value)))
+                    continue
+                values = {}
+                if not self._values(assignes, opt_args, values, []):
+                    return None
+                emitted.append((assignes[header][0], opt.dest, OptionResult(None, values)))
+            # 选项的解析结果按出现顺序排列
+            emitted.sort(key=lambda x: x[0])
+            for _, dest, opt_result in emitted:
+                state.options_result[dest] = opt_result
+            if child is not None:
+                state.subcommands_result[child.analyser.command.dest] = child.result()
+        result = Arparma(command._hash, message, True, HeadResult(head, head, True), ctx={} if ctx is None else ctx)
+        state.fill_default()  # type: ignore
+        result.main_args = state.args_result  # type: ignore
+        result.options = state.options_result  # type: ignore
+        result.subcommands = state.subcommands_result  # type: ignore
+        result.unpack()
+        return result
+
+
+def compile_sistana(analyser: Analyser) -> SistanaPlan | None:
+    """获取解析器对应的编译结果, 若命令不受支持则返回 None"""
+    try:
+        return analyser.compiled["sistana"]
+    except KeyError:
+        try:
+            plan = SistanaPlan(analyser)
+        except (Unsupported, ValueError):
+            # ValueError: 参数的顺序不满足 Sistana 的要求
+            plan = None
+        analyser.compiled["sistana"] = plan
+        return plan
+
+
+def into_sistana(alconna: Alconna) -> SubcommandPattern:
+    """将命令编译为 Sistana 的命令模式
+
+    Raises:
+        ValueError: 命令使用了无法转换的特性
+    """
+    if (plan := compile_sistana(command_manager.require(alconna))) is None:
+        raise ValueError(alconna.path)
+    return plan.pattern
+
+
+def parse_sistana(alconna: Alconna, analyser: Analyser, message: Any, ctx: dict[str, Any] | None = None) -> Arparma | None:
+    """使用 Sistana 解析命令
+
+    Returns:
+        Arparma | None: 解析结果; 若命令或消息不受支持, 或解析未成功, 则返回 None
+    """
+    # 不受支持的命令在触碰消息之前返回, 其编译结果 (None) 由 compile_sistana 缓存
+    if (plan := compile_sistana(analyser)) is None:
+        return None
+    if message.__class__ is not str or (ctx and ARGV_OVERRIDES in ctx):
+        return None
+    argv = analyser.argv
+    if argv.checker and not argv.checker(message):
+        return None
+    if (text := argv.to_text(message)) is None or not (text := text.strip()) or not _UNSAFE.isdisjoint(text):
+        return None
+    if "\n" in text or "\r" in text:
+        return None
+    buffer = Buffer([text])
+    token = buffer.next(alconna.separators)
+    head = token.val
+    if head.__class__ is not str or (end := alconna._header.match(head)) < 0:
+        return None
+    token.apply()
+    if end < len(head):
+        buffer.pushleft(head[end:])
+        head = head[:end]
+    snapshot = plan.pattern.root_entrypoint
+    reset = _seq.set(count())
     try:
-        reason = analyzer.loopflow(snapshot, buffer)
+        reason = _analyzer.loopflow(snapshot, buffer)
     except Exception:
-        matched = False
-    else:
-        if reason not in {LoopflowExitReason.prefix_mismatch, LoopflowExitReason.header_mismatch}:
-            head_matched = True
+        return None
+    finally:
+        _seq.reset(reset)
+    if reason not in _ACCEPT:
+        return None
+    return plan.export(alconna, snapshot.mix, message, head, ctx)
 
-        if reason == LoopflowExitReason.completed:
-            matched = True
 
-    return dump_arparma(snapshot, message, matched, head_matched)
+def patch_alconna(alconna: Alconna):
+    """令命令使用 Sistana 解析"""
+    alconna.config.backend = "sistana"
 
 
-def patch_alconna(alconna: Alconna):
-    pattern = into_sistana(alconna)
-
-    alconna._sistana_pattern = pattern  # type: ignore
-    alconna._parse = lambda message, _: process_adapt(pattern, message)  # type: ignore
-
-
-def _sistana_debug(alc: Alconna, message):
-    pat = into_sistana(alc)
-
-    print(f"{pat=}, {message=}")
-    analyzer = Analyzer()
-    snapshot = pat.prefix_entrypoint
-    buffer = Buffer(build_runes(message), runes=False)
-    res = analyzer.loopflow(snapshot, buffer)
-    print(
-        res,
-        snapshot._export(),
-        dump_arparma(
-            snapshot,
-            message,
-            res == LoopflowExitReason.completed,
-            res in {LoopflowExitReason.prefix_mismatch, LoopflowExitReason.header_mismatch},
-        ),
-    )
-
-
-def patch_global(debug: bool = False):
-    def cached_parse(self: Alconna, message, _):
-        if hasattr(self, "_sistana_pattern"):
-            pattern = self._sistana_pattern  # type: ignore
-        else:
-            pattern = into_sistana(self)
-            self._sistana_pattern = pattern  # type: ignore
-            # self._sistana_debug = lambda s, message: _sistana_debug(pattern, message)  # type: ignore
-
-        return process_adapt(pattern, message)
-
-    Alconna._parse = cached_parse  # type: ignore
-
-    if debug:
-        Alconna._sistana_debug = _sistana_debug  # type: ignore
+def patch_global():
+    """令所有命名空间与已注册的命令使用 Sistana 解析"""
+    for ns in global_config.namespaces.values():
+        ns.config.backend = "sistana"
+    for cmd in command_manager.get_commands():
+        cmd.config.backend = "sistana"
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from typing import Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_LEAF = ""
+"""叶子标记; 节点的子键均为单个字符, 因此空字符串不会与之冲突"""
+
+
+class CharTrie(Generic[T]):
+    """字符前缀树, 每个键可以对应多个值"""
+
+    __slots__ = ("root", "size", "width")
+
+    def __init__(self):
+        self.root: dict = {}
+        self.size = 0
+        self.width = 0
+        """键的最大长度; 移除键时不会减小, 因此只是上界"""
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __contains__(self, key: str):
+        return bool(self.get(key))
+
+    def insert(self, key: str, value: T) -> None:
+        """插入一个键值对"""
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        if len(key) > self.width:
+            self.width = len(key)
+        values = node.setdefault(_LEAF, {})
+        if value not in values:
+            values[value] = None
+            self.size += 1
+
+    def discard(self, key: str, value: T) -> None:
+        """移除一个键值对, 并清理空节点"""
+        node = self.root
+        path = []
+        for char in key:
+            if char not in node:
+                return
+            path.append((node, char))
+            node = node[char]
+        values = node.get(_LEAF)
+        if not values or value not in values:
+            return
+        del values[value]
+        self.size -= 1
+        if values:
+            return
+        del node[_LEAF]
+        while path and not node:
+            parent, char = path.pop()
+            del parent[char]
+            node = parent
+
+    def get(self, key: str) -> tuple[T, ...]:
+        """获取键对应的所有值"""
+        node = self.root
+        for char in key:
+            if char not in node:
+                return ()
+            node = node[char]
+        return tuple(node.get(_LEAF, ()))
+
+    def prefixes(self, text: str) -> Iterator[tuple[int, tuple[T, ...]]]:
+        """按长度递增, 遍历所有是 `text` 前缀的键
+
+        Yields:
+            tuple[int, tuple[T, ...]]: 键的长度, 以及键对应的所有值
+        """
+        node = self.root
+        if _LEAF in node:
+            yield 0, tuple(node[_LEAF])
+        for index, char in enumerate(text, 1):
+            if char not in node:
+                return
+            node = node[char]
+            if _LEAF in node:
+                yield index, tuple(node[_LEAF])
+
+    def ends(self, text: str) -> list[int]:
+        """按长度递增, 获取所有是 `text` 前缀的键的长度"""
+        node = self.root
+        result = [0] if _LEAF in node else []
+        for index, char in enumerate(text, 1):
+            if char not in node:
+                break
+            node = node[char]
+            if _LEAF in node:
+                result.append(index)
+        return result
+
+    def longest(self, text: str) -> tuple[int, tuple[T, ...]] | None:
+        """获取是 `text` 前缀的最长键"""
+        result = None
+        for result in self.prefixes(text):
+            pass
+        return result
+
+    def clear(self):
+        self.root.clear()
+        self.size = 0
+        self.width = 0
@@ -8,7 +8,7 @@ import typing
 from typing import Any, Callable, Generic, Literal, TypeVar, ClassVar, ForwardRef, Final, TYPE_CHECKING, get_origin, get_args
 from typing_extensions import dataclass_transform, ParamSpec, Concatenate, TypeAlias
 
-from nepattern import NONE, BasePattern, RawStr, UnionPattern, parser
+from nepattern import ANY, NONE, STRING, BasePattern, RawStr, UnionPattern, parser
 from tarina import Empty, lang
 
 from ._dcls import safe_dcls_kw, safe_field_kw
@@ -16,6 +16,8 @@ from .exceptions import InvalidArgs
 from .typing import TAValue, parent_frame_namespace, merge_cls_and_parent_ns
 
 _T = TypeVar("_T")
+keyword_pattern = re.compile("(?:-*no)?-*(?P<name>.+)")
+"""从关键字参数的键中去除前缀 `-` 与否定前缀 `no`"""
 
 
 @dc.dataclass(**safe_dcls_kw(slots=True))
@@ -191,8 +193,59 @@ class Arg(Generic[_T]):
         return v
 
 
+class ArgsPlan:
+    """`_Args` 的解析计划
+
+    在 `_Args` 构造时一次性计算解析所需的静态数据, 解析时直接使用, 构造后不应再修改.
+    """
+
+    __slots__ = ("normal", "varpos", "varkey", "varkey_sep", "keywords", "kwonly_seps", "kwonly_kw_seps", "simple")
+
+    def __init__(self, args: _Args):
+        self.normal: tuple[tuple[Arg[Any], str, BasePattern[Any, Any, Any], Field[Any], int], ...] = tuple(
+            (arg, arg.name, arg.type_, arg.field, 2 if arg.type_.alias == "*" else int(arg.type_ is ANY or arg.type_ is STRING))
+            for arg in args.normal
+        )
+        """普通参数 (参数单元, 名称, 类型, 字段, 类别); 类别 0 为一般参数, 1 为 ANY/STRING 参数, 2 为 AllParam"""
+        self.varpos: tuple[tuple[int | Literal["+", "*", "str"], Arg[Any], int], ...] = tuple(
+            (flag, arg, int(flag) if flag.__class__ is int else -1) for flag, arg in args.vars_positional
+        )
+        """可变位置参数 (标记, 参数单元, 最大数量)"""
+        self.varkey: tuple[tuple[int | Literal["+", "*", "str"], Arg[Any], int, re.Pattern[str]], ...] = tuple(
+            (
+                flag,
+                arg,
+                int(flag) if flag.__class__ is int else -1,
+                re.compile(rf"^(-*[^{arg.field.kw_sep}]+){arg.field.kw_sep}(.*?)$"),
+            )
+            for flag, arg in args.vars_keyword
+        )
+        """可变关键字参数 (标记, 参数单元, 最大数量, 键值对的匹配式)"""
+        self.varkey_sep: str | None = args.vars_keyword[0][1].field.kw_sep if args.vars_keyword else None
+        """首个可变关键字参数的键值分隔符, 可变位置参数遇到含有该分隔符的值时停止"""
+        kwonly = args.keyword_only.values()
+        self.kwonly_seps = "".join(dict.fromkeys(sep for arg in kwonly for sep in arg.field.seps))
+        """仅关键字参数使用的分隔符"""
+        self.kwonly_kw_seps = "".join(dict.fromkeys(arg.field.kw_sep for arg in kwonly))
+        """仅关键字参数使用的键值分隔符"""
+        self.keywords: dict[str, str] = {}
+        """仅关键字参数的键及其常见的前缀与否定变体 -> 参数名"""
+        for name in args.keyword_only:
+            for key in (name, f"-{name}", f"--{name}", f"no{name}", f"no-{name}", f"-no-{name}", f"--no-{name}", f"--no{name}"):
+                # 与逐个匹配 keyword_pattern 的结果保持一致
+                _key = keyword_pattern.match(key)["name"]  # type: ignore
+                if _key not in args.keyword_only:
+                    _key = key
+                if _key in args.keyword_only:
+                    self.keywords[key] = _key
+        self.simple = not (args.vars_positional or args.vars_keyword or args.keyword_only) and all(
+            kind != 2 for *_, kind in self.normal
+        )
+        """是否只含有普通参数且不含 AllParam"""
+
+
 class _Args:
-    __slots__ = ("unpack", "vars_positional", "vars_keyword", "keyword_only", "normal", "data", "_visit", "optional_count", "origin")
+    __slots__ = ("unpack", "vars_positional", "vars_keyword", "keyword_only", "normal", "data", "_visit", "optional_count", "origin", "plan")
 
     def __init__(self, args: list[Arg[Any]], origin: type[ArgsBase] | None = None):
         self.origin = origin
@@ -204,6 +257,7 @@ class _Args:
         self._visit = set()
         self.optional_count = 0
         self.__check_vars__()
+        self.plan = ArgsPlan(self)
 
     def __check_vars__(self):
         """检查当前所有参数单元
@@ -7,8 +7,9 @@ from functools import lru_cache
 from types import MappingProxyType
 from typing import Any, Callable, ClassVar, Generic, TypeVar, cast, overload, Literal
 from typing_extensions import Self
+from weakref import WeakKeyDictionary
 
-from tarina import Empty, generic_isinstance, lang, safe_eval
+from tarina import Empty, generic_isinstance, is_awaitable, lang, safe_eval
 
 from .exceptions import BehaveCancelled, OutBoundsBehave
 from .base import HeadResult, OptionResult, SubcommandResult
@@ -20,53 +21,102 @@ T1 = TypeVar("T1")
 D = TypeVar("D")
 
 
-def _handle_opt(_pf: str, _parts: list[str], _opts: dict[str, OptionResult]):
-    """处理 `options.xxx.yyy.zzz` 形式的参数"""
+def _handle_opt(_pf: str, _parts: tuple[str, ...], _i: int, _opts: dict[str, OptionResult]):
+    """处理 `options.xxx.yyy.zzz` 形式的参数, `_i` 为 `_parts` 中尚未处理的部分的起始位置"""
     if _pf == "options":
-        _pf = _parts.pop(0)
-    if not _parts:  # options.foo or foo
+        _pf = _parts[_i]
+        _i += 1
+    if _i == len(_parts):  # options.foo or foo
         return _opts, _pf
     elif not (__src := _opts.get(_pf)):  # options.foo.bar or foo.bar
         return _opts, _pf
-    if (_end := _parts.pop(0)) == "value":
+    if (_end := _parts[_i]) == "value":
         return __src, _end
     if _end == "args":
-        return (__src.args, _parts.pop(0)) if _parts else (__src, _end)
+        return (__src.args, _parts[_i + 1]) if _i + 1 < len(_parts) else (__src, _end)
     return __src.args, _end
 
 
-def _handle_sub(_pf: str, _parts: list[str], _subs: dict[str, SubcommandResult]):
-    """处理 `subcommands.xxx.yyy.zzz` 形式的参数"""
+def _handle_sub(_pf: str, _parts: tuple[str, ...], _i: int, _subs: dict[str, SubcommandResult]):
+    """处理 `subcommands.xxx.yyy.zzz` 形式的参数, `_i` 为 `_parts` 中尚未处理的部分的起始位置"""
     if _pf == "subcommands":
-        _pf = _parts.pop(0)
-    if not _parts:
+        _pf = _parts[_i]
+        _i += 1
+    if _i == len(_parts):
         return _subs, _pf
     elif not (__src := _subs.get(_pf)):
         return _subs, _pf
-    if (_end := _parts.pop(0)) == "value":
+    _end = _parts[_i]
+    _i += 1
+    if _end == "value":
         return __src, _end
     if _end == "args":
-        return (__src.args, _parts.pop(0)) if _parts else (__src, _end)
-    if _end == "options" and (_end in __src.options or not _parts):
+        return (__src.args, _parts[_i]) if _i < len(_parts) else (__src, _end)
+    if _end == "options" and (_end in __src.options or _i == len(_parts)):
         raise RuntimeError(lang.require("arparma", "ambiguous_name").format(target=f"{_pf}.{_end}"))
     if _end == "options" or _end in __src.options:
-        return _handle_opt(_end, _parts, __src.options)
-    if _end == "subcommands" and (_end in __src.subcommands or not _parts):
+        return _handle_opt(_end, _parts, _i, __src.options)
+    if _end == "subcommands" and (_end in __src.subcommands or _i == len(_parts)):
         raise RuntimeError(lang.require("arparma", "ambiguous_name").format(target=f"{_pf}.{_end}"))
     if _end == "subcommands" or _end in __src.subcommands:
-        return _handle_sub(_end, _parts, __src.subcommands)
+        return _handle_sub(_end, _parts, _i, __src.subcommands)
     return __src.args, _end
 
 
+_FIELDS = frozenset({"options", "subcommands", "main_args", "other_args", "context"})
+
+
+class QueryPath(Generic[T]):
+    """切分好的查询路径, 应通过 `query_path` 获取
+
+    查询的结果仍取决于解析结果中存在的选项与子命令, 但路径本身只需处理一次
+    """
+
+    __slots__ = ("path", "parts", "prefix", "field", "expr")
+
+    def __init__(self, path: str):
+        self.path = path
+        """原始路径"""
+        self.parts = tuple(path.split("."))
+        """路径的各个部分"""
+        self.prefix = self.parts[0].replace("$main", "main_args").replace("$other", "other_args")
+        """替换了 `$main` 与 `$other` 的路径前缀"""
+        self.field = self.prefix if len(self.parts) > 1 and self.prefix in {"main_args", "other_args"} else None
+        """`$main.xxx` 与 `$other.xxx` 形式的路径所查询的属性"""
+        self.expr = ".".join((self.prefix, *self.parts[1:]))
+        """在上下文中查询时使用的路径"""
+
+    def __repr__(self):
+        return f"QueryPath({self.path!r})"
+
+
+@lru_cache(4096)
+def _query_path(path: str) -> QueryPath[Any]:
+    return QueryPath(path)
+
+
+def query_path(path: str, type_: type[T] | None = None) -> QueryPath[T]:
+    """获取编译后的查询路径, 相同的路径共享同一个 `QueryPath`
+
+    Args:
+        path (str): 要查询的路径
+        type_ (type[T] | None, optional): 查询结果的类型, 仅用于类型检查
+    """
+    return _query_path(path)
+
+
 class _Query(Generic[T]):
+    __slots__ = ("source",)
+
     source: Arparma
 
-    def __get__(self, instance: Arparma, owner: type) -> _Query[T]:
-        self.source = instance
-        return self
+    def __init__(self, source: Arparma | None = None):
+        if source is not None:
+            self.source = source
 
-    def __set_name__(self, owner, name):
-        self.name = name
+    def __get__(self, instance: Arparma, owner: type) -> _Query[T]:
+        # 每次访问都绑定一个新的查询器, 以免多线程下不同的 Arparma 互相覆盖
+        return _Query(instance)
 
     def __getitem__(self, item: type[T1]) -> _Query[T1]:
         return cast("_Query[T1]", self)
@@ -91,27 +141,50 @@ class _Query(Generic[T]):
             default (T | None, optional): 如果查询失败, 则返回该值
             force_return (bool, optional): 是否强制返回值, 默认为 False; 如果为 True, 则查询失败时抛出异常
         """
-        source, endpoint = self.source.__require__(path.split("."))
-        if source is None:
-            if force_return:
-                raise KeyError(path)
-            return default
-        if isinstance(source, dict):
-            if endpoint:
-                if endpoint in source:
-                    return source[endpoint]
-                if force_return:
-                    raise KeyError(path)
-                return default
-            return MappingProxyType(source)  # type: ignore
-        if endpoint:
-            try:
-                return getattr(source, endpoint)
-            except AttributeError:
-                if force_return:
-                    raise
-                return default
-        return source  # type: ignore
+        return self.source.get(_query_path(path), default, force_return=force_return)
+
+
+_RESERVED = {
+    "context": "context",
+    "args": "main_args",
+    "all_args": "all_matched_args",
+    "options": "options",
+    "subcommands": "subcommands",
+}
+"""调用时保留的参数名称及其对应的 `Arparma` 属性"""
+_VAR_KINDS = (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+
+
+class _CallPlan:
+    """`Arparma.call` 的绑定计划, 记录目标函数的每个参数从何处取值"""
+
+    __slots__ = ("params",)
+
+    def __init__(self, target: Callable[..., Any]):
+        params = []
+        for p in inspect.signature(target).parameters.values():
+            if p.kind not in _VAR_KINDS and p.name == "args" and isinstance(p.annotation, ArgsMeta) and issubclass(p.annotation, ArgsBase):  # noqa: E501
+                loader = p.annotation.load
+            else:
+                loader = None
+            params.append((p.name, p.kind, _RESERVED.get(p.name), loader))
+        self.params: tuple[tuple[str, Any, str | None, Callable[[Any], Any] | None], ...] = tuple(params)
+        """(参数名称, 参数种类, 保留参数对应的属性, `ArgsBase` 的加载方法)"""
+
+
+_call_plans: WeakKeyDictionary[Callable[..., Any], _CallPlan] = WeakKeyDictionary()
+
+
+def _call_plan(target: Callable[..., Any]) -> _CallPlan:
+    """获取目标函数的绑定计划, 其以目标函数为弱引用键缓存"""
+    try:
+        return _call_plans[target]
+    except KeyError:
+        plan = _call_plans[target] = _CallPlan(target)
+        return plan
+    except TypeError:
+        # 无法弱引用或无法哈希的对象不做缓存
+        return _CallPlan(target)
 
 
 class Arparma(Generic[TDC]):
@@ -167,7 +240,7 @@ class Arparma(Generic[TDC]):
         self.matched = matched
         self.header_match = header_match or HeadResult()
         self.error_info = error_info
-        self.error_data = error_data or []
+        self._error_data = error_data or []
         self.main_args = main_args or {}
         self.other_args = {}
         self.options = options or {}
@@ -176,8 +249,38 @@ class Arparma(Generic[TDC]):
         self.output = None
 
     _additional: ClassVar[dict[str, Callable[[], Any]]] = {}
+    _error_source: Callable[[], list[str | Any]] | None = None
     query = _Query[Any]()
 
+    @property
+    def error_data(self) -> list[str | Any]:
+        if self._error_source is not None:
+            self._error_data = self._error_source()
+            self._error_source = None
+        return self._error_data
+
+    @error_data.setter
+    def error_data(self, value: list[str | Any]):
+        self._error_source = None
+        self._error_data = value
+
+    def defer_error(self, source: Callable[[], list[str | Any]]):
+        """延迟计算错误数据, 其在首次访问 `error_data` 时才会通过 `source` 得到
+
+        Args:
+            source (Callable[[], list[str | Any]]): 计算错误数据的函数
+        """
+        self._error_source = source
+
+    def __getstate__(self):
+        if self._error_source is not None:
+            self.error_data  # noqa: B018
+        return self.__dict__.copy()
+
+    def __setstate__(self, state: dict[str, Any]):
+        # 避免反序列化时经由 `__getattr__` 查询尚未恢复的属性
+        self.__dict__.update(state)
+
     def _clr(self):
         self.context.clear()
         self.error_data.clear()
@@ -268,6 +371,26 @@ class Arparma(Generic[TDC]):
                 return self.fail(e)
         return self
 
+    async def aexecute(self, behaviors: list[ArparmaBehavior] | None = None) -> Self:
+        """执行行为器, 允许行为器的 `operate` 为异步函数
+
+        Args:
+            behaviors (list[ArparmaBehavior] | None, optional): 要执行的行为器列表
+        Returns:
+            Self: 返回自身
+        """
+        if not behaviors:
+            return self
+        for b in behaviors:
+            try:
+                if is_awaitable(res := b.operate(self)):
+                    await res
+            except BehaveCancelled:
+                continue
+            except OutBoundsBehave as e:
+                return self.fail(e)
+        return self
+
     def call(self, target: Callable[..., T]) -> T:
         """依据 `Arparma` 中的数据调用函数
 
@@ -282,40 +405,72 @@ class Arparma(Generic[TDC]):
             raise RuntimeError("No matched")
         pos_args = []
         kw_args = {}
-        data = {
-            **{k: v() for k, v in self._additional.items()},
-            **self.all_matched_args,
-            "context": self.context,
-            "args": self.main_args,
-            "all_args": self.all_matched_args,
-            "options": self.options,
-            "subcommands": self.subcommands,
-        }
-
-        sig = inspect.signature(target)
-        for p in sig.parameters.values():
-            if p.name not in data:
+        for name, kind, attr, loader in _call_plan(target).params:
+            if attr:
+                value = getattr(self, attr)
+            elif name in self.other_args:
+                value = self.other_args[name]
+            elif name in self.main_args:
+                value = self.main_args[name]
+            elif name in self._additional:
+                value = self._additional[name]()
+            else:
                 continue
-            if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
-                if p.name == "args" and isinstance(p.annotation, ArgsMeta) and issubclass(p.annotation, ArgsBase):
-                    pos_args.append(p.annotation.load(data[p.name]))
-                else:
-                    pos_args.append(data[p.name])
-            elif p.kind == p.VAR_POSITIONAL:
-                pos_args.extend(data[p.name])
-            elif p.kind == p.VAR_KEYWORD:
-                kw_args = {**kw_args, **data[p.name]}
+            if loader:
+                value = loader(value)
+            if kind is inspect.Parameter.VAR_POSITIONAL:
+                pos_args.extend(value)
+            elif kind is inspect.Parameter.VAR_KEYWORD:
+                kw_args = {**kw_args, **value}
+            elif kind is inspect.Parameter.KEYWORD_ONLY:
+                kw_args[name] = value
             else:
-                if p.name == "args" and isinstance(p.annotation, ArgsMeta) and issubclass(p.annotation, ArgsBase):
-                    kw_args[p.name] = p.annotation.load(data[p.name])
-                else:
-                    kw_args[p.name] = data[p.name]
-        bind = sig.bind(*pos_args, **kw_args)
-        bind.apply_defaults()
-        try:
-            return target(*bind.args, **bind.kwargs)
-        finally:
-            data.clear()
+                pos_args.append(value)
+        return target(*pos_args, **kw_args)
+
+    @overload
+    def get(self, path: QueryPath[T]) -> T | None:
+        ...
+
+    @overload
+    def get(self, path: QueryPath[T], *, force_return: Literal[True]) -> T:
+        ...
+
+    @overload
+    def get(self, path: QueryPath[T], default: D) -> T | D:
+        ...
+
+    def get(self, path: QueryPath[T] | str, default: D | None = None, *, force_return: bool = False) -> T | D | None:
+        """以编译后的路径查询 `Arparma` 中的数据
+
+        Args:
+            path (QueryPath[T] | str): 要查询的路径, 由 `query_path` 获取
+            default (T | None, optional): 如果查询失败, 则返回该值
+            force_return (bool, optional): 是否强制返回值, 默认为 False; 如果为 True, 则查询失败时抛出异常
+        """
+        if path.__class__ is str:
+            path = _query_path(path)  # type: ignore
+        source, endpoint = self._require(path)  # type: ignore
+        if source is None:
+            if force_return:
+                raise KeyError(path.path)  # type: ignore
+            return default
+        if isinstance(source, dict):
+            if endpoint:
+                if endpoint in source:
+                    return source[endpoint]
+                if force_return:
+                    raise KeyError(path.path)  # type: ignore
+                return default
+            return MappingProxyType(source)  # type: ignore
+        if endpoint:
+            try:
+                return getattr(source, endpoint)
+            except AttributeError:
+                if force_return:
+                    raise
+                return default
+        return source  # type: ignore
 
     def fail(self, exc: type[Exception] | Exception) -> Self:
         """生成一个失败的 `Arparma`"""
@@ -323,31 +478,33 @@ class Arparma(Generic[TDC]):
 
     def __require__(self, parts: list[str]) -> tuple[dict[str, Any] | OptionResult | SubcommandResult | None, str]:
         """如果能够返回, 除开基本信息, 一定返回该path所在的dict"""
+        return self._require(_query_path(".".join(parts)))
+
+    def _require(self, path: QueryPath) -> tuple[dict[str, Any] | OptionResult | SubcommandResult | None, str]:
+        parts = path.parts
         if len(parts) == 1:
             part = parts[0]
-            if part in {"options", "subcommands", "main_args", "other_args", "context"}:
+            if part in _FIELDS:
                 return getattr(self, part, {}), ""
             for src in (self.main_args, self.other_args, self.options, self.subcommands, self.context):
                 if part in src:
                     return src, part
             return (self.all_matched_args, "") if part == "args" else (None, part)
-        prefix = parts.pop(0)  # parts[0]
-        if prefix in {"options", "subcommands"} and prefix in self.components:
+        prefix = parts[0]
+        if prefix in {"options", "subcommands"} and (prefix in self.options or prefix in self.subcommands):
             raise RuntimeError(lang.require("arparma", "ambiguous_name").format(target=prefix))
         if prefix == "options" or prefix in self.options:
-            return _handle_opt(prefix, parts, self.options)
+            return _handle_opt(prefix, parts, 1, self.options)
         if prefix == "subcommands" or prefix in self.subcommands:
-            return _handle_sub(prefix, parts, self.subcommands)
-        prefix = prefix.replace("$main", "main_args").replace("$other", "other_args")
-        if prefix in {"main_args", "other_args"}:
-            return getattr(self, prefix, {}), parts.pop(0)
-        path = ".".join([prefix] + parts)
-        if path in self.context:
-            return self.context, path
+            return _handle_sub(prefix, parts, 1, self.subcommands)
+        if path.field:
+            return getattr(self, path.field, {}), parts[1]
+        if path.expr in self.context:
+            return self.context, path.expr
         try:
-            return safe_eval(path, self.context), ""  # type: ignore
+            return safe_eval(path.expr, self.context), ""  # type: ignore
         except Exception:
-            return None, prefix
+            return None, path.prefix
 
     def query_with(self, arg_type: type[T], *args):
         return self.query[arg_type](*args)
@@ -395,7 +552,11 @@ class Arparma(Generic[TDC]):
         return next(i for i in self.all_matched_args.values() if generic_isinstance(i, item))
 
     def __getattr__(self, item: str):
-        return self.all_matched_args.get(item, self.query(item.replace("_", ".")))
+        if item in self.other_args:
+            return self.other_args[item]
+        if item in self.main_args:
+            return self.main_args[item]
+        return self.query(item.replace("_", "."))
 
     def __repr__(self):
         if not self.matched:
@@ -413,6 +574,95 @@ class Arparma(Generic[TDC]):
             return ", ".join([f"{a}={v}" for a, v in attrs.items() if v])
 
 
+class LazyArparma(Arparma[TDC]):
+    """惰性构建的解析结果
+
+    解析结束时只保存原始的解析数据, 填充了默认值的 `options`、`subcommands` 与展开的 `other_args` 在首次访问时才构建
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._record = None
+        self._other_args: dict[str, Any] | None = None
+        super().__init__(*args, **kwargs)
+
+    def defer(self, record: Any):
+        """保存原始的解析数据
+
+        Args:
+            record (Any): 原始的解析数据, 需要提供 `options_result`、`subcommands_result` 与填充默认值的 `fill_default`
+        """
+        self._record = record
+        self._other_args = None
+
+    def _fill(self):
+        record = self._record
+        self._record = None
+        record.fill_default()
+        self._options = record.options_result
+        self._subcommands = record.subcommands_result
+
+    @property
+    def options(self) -> dict[str, OptionResult]:
+        if self._record is not None:
+            self._fill()
+        return self._options
+
+    @options.setter
+    def options(self, value: dict[str, OptionResult]):
+        if self._record is not None:
+            self._fill()
+        self._options = value
+
+    @property
+    def subcommands(self) -> dict[str, SubcommandResult]:
+        if self._record is not None:
+            self._fill()
+        return self._subcommands
+
+    @subcommands.setter
+    def subcommands(self, value: dict[str, SubcommandResult]):
+        if self._record is not None:
+            self._fill()
+        self._subcommands = value
+
+    @property
+    def other_args(self) -> dict[str, Any]:
+        if self._other_args is None:
+            self._other_args = {}
+            self.unpack()
+        return self._other_args
+
+    @other_args.setter
+    def other_args(self, value: dict[str, Any]):
+        self._other_args = value
+
+    def _require(self, path: QueryPath) -> tuple[dict[str, Any] | OptionResult | SubcommandResult | None, str]:
+        if self._record is not None and len(path.parts) == 1:
+            part = path.parts[0]
+            # 单个名称的查询不存在时无需构建, 例如每次解析后对内置选项的路由
+            if not (
+                part in _FIELDS or part == "args" or part in self.main_args
+                or part in self.context or self._record.mentions(part)
+            ):
+                return None, part
+        return super()._require(path)
+
+    @property
+    def non_component(self) -> bool:
+        if self._record is not None:
+            # 默认值只会增加组件, 存在组件时无需构建
+            record = self._record
+            if record.options_result or record.subcommands_result:
+                return False
+        return not self.subcommands and not self.options
+
+    def __getstate__(self):
+        if self._record is not None:
+            self._fill()
+        _ = self.other_args
+        return super().__getstate__()
+
+
 @dataclass(init=True, unsafe_hash=True, repr=True)
 class ArparmaBehavior(metaclass=ABCMeta):
     """解析结果行为器的基类, 对应一个对解析结果的操作行为
@@ -444,7 +694,7 @@ class ArparmaBehavior(metaclass=ABCMeta):
             else:
                 setattr(src, ep, val)
 
-        source, end = interface.__require__(path.split("."))
+        source, end = interface._require(_query_path(path))
         if source is None:
             return
         if end:
@@ -3,15 +3,17 @@ from __future__ import annotations
 
 import re
 from dataclasses import replace, dataclass, field, asdict, fields
-from typing import Any, Iterable, Sequence, overload, Literal, TypedDict
+from typing import Any, Callable, Iterable, Sequence, overload, Literal, TypedDict
 
-from nepattern import TPattern
+from nepattern import BasePattern
 from typing_extensions import Self
 
-from tarina import Empty, lang
+from tarina import LRU, Empty, lang
 
+from ._trie import CharTrie
 from .action import Action, store
 from .args import ARGS_PARAM, Arg, ArgsBase, ArgsMeta, ArgsBuilder, _Args, handle_args
+from .dispatch import literal_pattern
 from .exceptions import InvalidArgs
 from .typing import Unset, UNSET
 
@@ -98,30 +100,106 @@ class HeadResult:
         self.matched = matched
 
 
+class HeaderMatcher:
+    """命令前缀的匹配器
+
+    字符串前缀存储于字符前缀树中, 一次遍历即可得到所有可能的前缀; 元素前缀则逐个比较.
+    相同前缀列表的命令共享同一个匹配器.
+    """
+
+    __slots__ = ("trie", "elements")
+
+    def __init__(self, prefixes: Sequence[Any]):
+        self.trie: CharTrie[str] = CharTrie()
+        self.elements: list[Any] = []
+        for prefix in prefixes or [""]:
+            if isinstance(prefix, str):
+                self.trie.insert(prefix, prefix)
+            else:
+                self.elements.append(prefix)
+
+    def match_text(self, text: str, command: str, compact: bool) -> int:
+        """匹配 `前缀 + 命令` 形式的字符串
+
+        Args:
+            text (str): 待匹配的字符串
+            command (str): 命令名
+            compact (bool): 是否允许命令名后紧随其他内容
+
+        Returns:
+            int: 匹配到的头部长度, 未匹配时返回 -1
+        """
+        size = len(text) - len(command)
+        if size < 0:
+            return -1
+        # 前缀越长, 越先尝试
+        for end in reversed(self.trie.ends(text)):
+            if end > size:
+                continue
+            if not compact:
+                return len(text) if end == size and text.endswith(command) else -1
+            if text.startswith(command, end):
+                return end + len(command)
+        return -1
+
+    def match_element(self, element: Any) -> bool:
+        """匹配元素前缀"""
+        for prefix in self.elements:
+            if isinstance(prefix, type):
+                if isinstance(element, prefix):
+                    return True
+            elif isinstance(prefix, BasePattern):
+                if prefix.validate(element).flag == "valid":
+                    return True
+            elif element == prefix:
+                return True
+        return False
+
+
+_matchers: LRU[tuple[Any, ...], HeaderMatcher] = LRU(256)
+"""前缀列表 -> 匹配器; 命令自身持有其匹配器, 因此被淘汰只会使之后的命令不再共享"""
+
+
+def header_matcher(prefixes: Sequence[Any]) -> HeaderMatcher:
+    """获取前缀列表对应的匹配器, 相同前缀列表的命令共享同一个匹配器"""
+    key = tuple(prefixes)
+    try:
+        if (matcher := _matchers.get(key)) is None:
+            matcher = _matchers[key] = HeaderMatcher(prefixes)
+        return matcher
+    except TypeError:  # unhashable element prefix
+        return HeaderMatcher(prefixes)
+
+
 class Header:
     """命令头部的匹配表达式"""
 
-    __slots__ = ("origin", "content", "mapping", "compact", "compact_pattern")
+    __slots__ = ("origin", "content", "compact", "matcher", "charset", "compact_pattern")
 
     def __init__(
         self,
-        origin: tuple[str, list[str]],
+        origin: tuple[str, list[Any]],
         content: set[str],
         compact: bool,
-        compact_pattern: TPattern,
+        matcher: HeaderMatcher,
+        compact_pattern: re.Pattern[str] | None = None,
     ):
         self.origin = origin  # type: ignore
         self.content = content  # type: ignore
         self.compact = compact
-        self.compact_pattern = compact_pattern  # type: ignore
+        self.matcher = matcher
+        self.compact_pattern = compact_pattern
+        """命令名不是字面量的紧凑头部, 仍按 `^(?:前缀)命令名` 的正则表达式匹配"""
+        self.charset: frozenset[str] | None = None if compact_pattern else frozenset("".join(content))
+        """所有字符串头部中出现的字符, 用于判断头部是否可能跨越分隔符; 为 None 时总是可能跨越"""
 
     def __repr__(self):
         if not self.origin[1]:
             return self.origin[0]
+        prefixes = "│".join(map(str, self.origin[1]))
         if self.origin[0]:
-            return f"[{'│'.join(self.origin[1])}]{self.origin[0]}" if len(
-                self.content) > 1 else f"{next(iter(self.content))}"  # noqa: E501
-        return '│'.join(self.origin[1])
+            return f"[{prefixes}]{self.origin[0]}" if len(set(map(str, self.origin[1]))) > 1 else f"{self.origin[1][0]}{self.origin[0]}"
+        return prefixes
 
     def is_intersect(self, header: Header) -> bool:
         """判断是否与另一个头部有交集
@@ -134,18 +212,53 @@ class Header:
         """
         return bool(self.content & header.content)
 
+    def match(self, text: str) -> int:
+        """匹配字符串头部
+
+        Returns:
+            int: 匹配到的头部长度, 未匹配时返回 -1
+        """
+        if self.compact_pattern is not None:
+            if text in self.content:
+                return len(text)
+            return len(mat[0]) if (mat := self.compact_pattern.match(text)) else -1
+        return self.matcher.match_text(text, self.origin[0], self.compact)
+
+    def match_element(self, element: Any, text: str) -> int:
+        """匹配 `元素前缀` 与其后随的命令名
+
+        Returns:
+            int: 匹配到的命令名长度, 未匹配时返回 -1
+        """
+        if not self.matcher.elements or not self.matcher.match_element(element):
+            return -1
+        command = self.origin[0]
+        if text == command:
+            return len(command)
+        if self.compact_pattern is not None:
+            return len(mat[0]) if (mat := re.match(command, text)) else -1
+        if self.compact and text.startswith(command):
+            return len(command)
+        return -1
+
     @classmethod
     def generate(
         cls,
         command: str,
-        prefixes: list[str],
+        prefixes: list[Any],
         compact: bool,
     ):
-        if not prefixes:
-            return cls((command, prefixes), {command}, compact, re.compile(f"^{command}"))
-        prf = "|".join(re.escape(h) for h in prefixes)
-        compp = re.compile(f"^(?:{prf}){command}")
-        return cls((command, prefixes), {f"{h}{command}" for h in prefixes}, compact, compp)
+        content = {command} if not prefixes else {f"{h}{command}" for h in prefixes if isinstance(h, str)}
+        pattern = None
+        if compact and command.__class__ is str and literal_pattern(command) != command:
+            if not prefixes:
+                pattern = re.compile(f"^{command}")
+            elif texts := [h for h in prefixes if isinstance(h, str)]:
+                pattern = re.compile(f"^(?:{'|'.join(map(re.escape, texts))}){command}")
+            else:
+                # 只有元素前缀, 字符串头部不可能匹配
+                pattern = re.compile("(?!)")
+        return cls((command, prefixes), content, compact, header_matcher(prefixes), pattern)
 
 
 def _handle_default(node: CommandNode):
@@ -588,6 +701,22 @@ class Config:
     "命令是否严格匹配，若为 False 则未知参数将作为名为 $extra 的参数"
     context_style: Unset[Literal["bracket", "parentheses"] | None] = field(default=UNSET, metadata={"default": None})
     "命令上下文插值的风格，None 为关闭，bracket 为 {...}，parentheses 为 $(...)"
+    offload_parse: Unset[bool] = field(default=UNSET, metadata={"default": False})
+    "异步解析时是否将解析过程放入线程中执行，适用于 to_text、converter 等钩子可能阻塞的情况"
+    compiler: Unset[Callable[[Any], None] | None] = field(default=UNSET, metadata={"default": None})
+    "命令的编译方法，None 为默认的编译方法，可使用 codegen_compiler 为命令生成专用的解析函数"
+    backend: Unset[Literal["ingedia", "sistana"]] = field(default=UNSET, metadata={"default": "ingedia"})
+    "命令的解析后端，sistana 会将命令编译至 Sistana 解析，不受支持的命令或消息仍由 ingedia 解析"
+    lazy_result: Unset[bool] = field(default=UNSET, metadata={"default": False})
+    "解析结果是否惰性构建，开启后填充默认值的选项与子命令、other_args 等只在首次访问时构建"
+    failure_cache: Unset[int] = field(default=UNSET, metadata={"default": 0})
+    "命令缓存的解析失败结果的最大数量，0 为关闭；需要启用消息缓存，相同的消息再次解析失败时直接返回缓存的结果"
+    record_budget: Unset[int] = field(default=UNSET, metadata={"default": 0})
+    "命令独立的解析结果记录的近似字节预算，0 为使用命令管理器共享的记录；在命名空间的配置中设置时，其下的每个命令各自拥有独立的记录"
+    record_compact: Unset[bool] = field(default=UNSET, metadata={"default": False})
+    "记录解析结果时是否只保留重放所需的数据，丢弃原始消息、上下文与错误数据；此时 Arparma.token 不再可用"
+    probe_header: Unset[bool] = field(default=UNSET, metadata={"default": False})
+    "解析前是否先用消息的前一到两个元素探测命令头，适用于单独解析大量不匹配消息的命令；命令管理器分发消息时总是会探测"
     extra: dict[str, Any] = field(default_factory=dict, hash=False)
     "命令的自定义额外配置"
 
@@ -5,7 +5,7 @@ from typing import Any, Callable, overload
 
 from tarina import Empty
 
-from .arparma import Arparma, ArparmaBehavior
+from .arparma import Arparma, ArparmaBehavior, query_path
 from .config import lang
 from .exceptions import BehaveCancelled
 from .base import OptionResult, SubcommandResult
@@ -28,7 +28,7 @@ class ConflictWith(ArparmaBehavior):
         return lang.require("builtin", "conflict.arg")
 
     def operate(self, interface: Arparma):
-        if (s_r := interface.query(self.source, Empty)) is not Empty and (t_r := interface.query(self.target, Empty)) is not Empty:
+        if (s_r := interface.get(query_path(self.source), Empty)) is not Empty and (t_r := interface.get(query_path(self.target), Empty)) is not Empty:  # noqa: E501
             source_type = self.get_type(s_r)
             target_type = self.get_type(t_r)
             if self.source_limiter and not self.source_limiter(s_r):
@@ -88,7 +88,7 @@ class _SetDefault(ArparmaBehavior):
             interface.behave_cancel()
         else:
             def_val = self.default
-            if not interface.query(self.path):
+            if not interface.get(query_path(self.path)):
                 self.update(interface, self.path, def_val)
 
 
@@ -113,7 +113,8 @@ class CompSession:
         Raises:
             ValueError: 当前没有可用的补全选项, 或者当前补全选项不可用。
         """
-        argv = command_manager.require(self.source.command).argv
+        state = self.source.acquire()
+        argv = state.argv
         argv.raw_data = self.raw_data.copy()
         argv.bak_data = self.bak_data.copy()
         argv.current_index = self.current_index
@@ -143,19 +144,19 @@ class CompSession:
         argv.origin = argv.converter(argv.raw_data)
         if argv.message_cache:
             argv.token = argv.generate_token(argv.raw_data)
-            if res := command_manager.get_record(argv.token):
+            if (res := command_manager.replay(self.source.command, argv)) is not None:
                 self.exit()
                 return EnterResult(res)
-        if exc := self.source.process(argv):
+        if exc := self.source.process(state):
             if isinstance(exc, ParamsUnmatched):
                 self.exit()
-                return EnterResult(self.source.export(argv, True, exc))
+                return EnterResult(self.source.export(state, True, exc))
             if isinstance(exc, PauseTriggered):
                 self.fresh(exc)
                 return EnterResult(exception=self.trigger if isinstance(self.trigger, InvalidParam) else None)
             return EnterResult(exception=exc)
         self.exit()
-        return EnterResult(self.source.export(argv))  # noqa # type: ignore
+        return EnterResult(self.source.export(state))  # noqa # type: ignore
 
     def push(self, *suggests: Prompt):
         """添加补全选项。
@@ -173,7 +174,6 @@ class CompSession:
         """清空补全选项。"""
         self.index = 0
         self.prompts.clear()
-        self.source.reset()
         self.raw_data = []
         self.bak_data = []
         self.current_index = 0
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Any, Callable, ContextManager, Literal, TypedDict
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Hashable, Literal, TypedDict
 
 from .i18n import lang as lang
 from .base import Config
@@ -37,6 +37,8 @@ class Namespace:
     """默认的选项转文本函数"""
     converter: Callable[[str | list], DataCollection[Any]] | None = field(default=lambda x: x)
     """默认的文本转选项函数"""
+    fingerprints: dict[type, Callable[[Any], Hashable]] = field(default_factory=dict)
+    """命令元素类型 -> 指纹函数, 用于生成消息缓存的 token; 未注册的元素类型使用其 `__hash__` 或 `repr`"""
 
     def __eq__(self, other):
         return isinstance(other, Namespace) and other.name == self.name
@@ -98,6 +100,8 @@ class _AlconnaConfig:
 
     command_max_count: int = 200
     """最大命令数量"""
+    executor_concurrency: int = 16
+    """异步解析时, 同时执行的命令执行器的最大数量"""
     _default_namespace = "Alconna"
     """默认命名空间名称"""
     remainders: set[str] = {"--"}
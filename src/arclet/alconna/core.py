@@ -1,26 +1,29 @@
 """Alconna 主体"""
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import warnings
 import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable, Generic, Literal, Sequence, TypeVar, cast, overload, TYPE_CHECKING
+from typing import Any, Callable, Generic, Iterable, Iterator, Literal, Sequence, TypeVar, cast, overload, TYPE_CHECKING
 
 from typing_extensions import Self
 from weakref import WeakSet
 
 from nepattern import TPattern
-from tarina import init_spec, lang, Empty
+from tarina import init_spec, is_awaitable, lang, Empty
 
-from .ingedia._analyser import Analyser, TCompile
-from .ingedia._handlers import handle_head_fuzzy, analyse_header
-from .ingedia._argv import Argv, __argv_type__
+from .ingedia._analyser import Analyser, ParseState, TCompile
+from .ingedia._handlers import handle_head_fuzzy, analyse_header, probe_header
+from .ingedia._argv import Argv, __argv_type__, __argv_current__
 from .args import Arg, ArgsBuilder, ArgsBase, Args, ArgsMeta, handle_args
-from .arparma import Arparma, ArparmaBehavior, requirement_handler
+from .arparma import Arparma, ArparmaBehavior, QueryPath, query_path, requirement_handler
 from .base import Completion, Help, Option, OptionResult, Shortcut, Subcommand, Header, SPECIAL_OPTIONS, Config, Metadata
 from .config import Namespace, global_config
-from .constraint import SHORTCUT_ARGS, SHORTCUT_REGEX_MATCH, SHORTCUT_REST, SHORTCUT_TRIGGER
+from .dispatch import ProbeStats
+from .constraint import ARGV_OVERRIDES, SHORTCUT_ARGS, SHORTCUT_REGEX_MATCH, SHORTCUT_REST, SHORTCUT_TRIGGER
 from .exceptions import (
     AlconnaException,
     AnalyseException,
@@ -32,7 +35,7 @@ from .exceptions import (
 from .shortcut import wrap_shortcut, InnerShortcutArgs, ShortcutRegWrapper
 from .completion import prompt, comp_ctx
 from .formatter import TextFormatter
-from .manager import ShortcutArgs, command_manager
+from .manager import CacheStats, ShortcutArgs, command_manager
 from .typing import TDC
 
 T = TypeVar("T")
@@ -54,7 +57,7 @@ def add_builtin_options(options: list[Option | Subcommand], router: Router, conf
 
         @router.route("$help")
         def _(command: Alconna, arp: Arparma):
-            argv = command_manager.require(command).argv
+            argv = __argv_current__.get()
             _help_param = [str(i) for i in argv.release(recover=True) if str(i) not in conf.builtin_option_name["help"]]
             arp.output = command.formatter.format_node(_help_param)
             return True
@@ -95,7 +98,7 @@ def add_builtin_options(options: list[Option | Subcommand], router: Router, conf
 
         @router.route("$completion")
         def _(command: Alconna, arp: Arparma):
-            argv = command_manager.require(command).argv
+            argv = __argv_current__.get()
             rest = argv.release()
             trigger = None
             if rest and isinstance(rest[-1], str) and rest[-1] in conf.builtin_option_name["completion"]:
@@ -151,17 +154,18 @@ class ArparmaExecutor(Generic[T]):
 
 class Router:
     def __init__(self):
-        self._routes = {}
+        self._routes: dict[str, tuple[QueryPath, Callable[[Alconna, Arparma], Any]]] = {}
+        """路径 -> (编译后的查询路径, 目标函数)"""
 
     def route(self, path: str):
         def wrapper(target: Callable[[Alconna, Arparma], Any]):
-            self._routes[path] = target
+            self._routes[path] = (query_path(path), target)
             return target
         return wrapper
 
     def execute(self, cmd: Alconna, arp: Arparma):
-        for route, target in self._routes.items():
-            if arp.query(route, Empty) is not Empty:
+        for route, target in self._routes.values():
+            if arp.get(route, Empty) is not Empty:
                 try:
                     res = target(cmd, arp)
                     if res is True:
@@ -169,6 +173,18 @@ class Router:
                 except Exception as e:
                     return e
 
+    async def aexecute(self, cmd: Alconna, arp: Arparma):
+        for route, target in self._routes.values():
+            if arp.get(route, Empty) is not Empty:
+                try:
+                    res = target(cmd, arp)
+                    if is_awaitable(res):
+                        res = await res
+                    if res is True:
+                        return
+                except Exception as e:
+                    return e
+
 
 class Alconna(Subcommand):
     """
@@ -191,8 +207,8 @@ class Alconna(Subcommand):
         >>> alc.parse("name opt opt_arg")
     """
 
-    prefixes: list[str]
-    """命令前缀"""
+    prefixes: list[str | Any]
+    """命令前缀, 可以为字符串或元素"""
     command: str | Any
     """命令名"""
     _header: Header
@@ -215,7 +231,7 @@ class Alconna(Subcommand):
         else:
             argv_type: type[Argv] = __argv_type__.get()
         argv = argv_type(self.config, self.namespace_config, self.separators)
-        return Analyser(self, argv, compiler)
+        return Analyser(self, argv, compiler or self.config.compiler)
 
     def __init__(
         self,
@@ -255,7 +271,7 @@ class Alconna(Subcommand):
         self.formatter = (formatter_type or ns_config.formatter_type or TextFormatter)()
         self.meta = next((i for i in args if isinstance(i, Metadata)), Metadata())
         if self.meta.example:
-            self.meta.example = self.meta.example.replace("$", self.prefixes[0] if self.prefixes else "")
+            self.meta.example = self.meta.example.replace("$", str(self.prefixes[0]) if self.prefixes else "")
         self.config = Config.merge(next((i for i in args if isinstance(i, Config)), Config()), ns_config.config)
         self._header = Header.generate(self.command, self.prefixes, bool(self.config.compact))
         options = [i for i in args if isinstance(i, (Option, Subcommand))]
@@ -426,18 +442,99 @@ class Alconna(Subcommand):
         """添加子命令"""
         return self.add(sub)
 
-    def _parse(self, message: TDC, ctx: dict[str, Any] | None = None) -> Arparma[TDC]:
+    def _parse(self, message: TDC, ctx: dict[str, Any] | None = None, state: ParseState | None = None) -> Arparma[TDC]:
         if self.union:
             for alc in self.union:
                 if (res := alc._parse(message, ctx)).matched:
                     return res
         analyser = command_manager.require(self)
+        # 探测对匹配的消息是额外的开销, 因此默认关闭
+        if self.config.probe_header and (exc := self._probe(analyser, message, ctx)) is not None:
+            return self._reject(analyser, state, message, ctx, exc)
+        # 已知不受 Sistana 支持的命令 (编译结果为 None) 直接交由默认流程处理
+        if self.config.backend == "sistana" and analyser.compiled.get("sistana", True) is not None:
+            from ._stargazing.compiler import parse_sistana
+
+            if (res := parse_sistana(self, analyser, message, ctx)) is not None:
+                return res
+        if state is not None:
+            return self._analyse(analyser, state, message, ctx)
+        with analyser.borrow() as state:
+            return self._analyse(analyser, state, message, ctx)
+
+    def _probe(self, analyser: Analyser, message: TDC, ctx: dict[str, Any] | None = None) -> InvalidHeader | None:
+        """在完整构建命令行参数之前, 只依据消息的前两个元素判断命令头是否必然不匹配
+
+        快捷指令与模糊匹配可能使不匹配的命令头最终解析成功, 此时探测总是命中
+        """
+        argv = analyser.argv
+        if argv.fuzzy_match or (ctx and ARGV_OVERRIDES in ctx):
+            return
+        try:
+            exc = probe_header(self._header, argv, message)
+        except Exception:
+            # 交由完整的解析处理
+            return
+        if exc is not None:
+            trigger = exc.context_node
+            if not (trigger.__class__ is str and trigger and command_manager.may_shortcut(self, trigger)):
+                analyser.probe_stats.misses += 1
+                return exc
+        analyser.probe_stats.hits += 1
+
+    def _reject(self, analyser: Analyser, state: ParseState | None, message: TDC, ctx: dict[str, Any] | None, exc: InvalidHeader):
         argv = analyser.argv
+        origin = argv.converter(message) if argv.checker and not argv.checker(message) else message  # type: ignore
+
+        def error_data():
+            _argv = argv.fork()
+            _argv.message_cache = False
+            _argv.build(message)
+            with contextlib.suppress(InvalidHeader):
+                analyse_header(self._header, _argv)
+            return _argv.release()
+
+        if state is not None:
+            return analyser.reject(state, origin, ctx, exc, error_data)
+        with analyser.borrow() as state:
+            return analyser.reject(state, origin, ctx, exc, error_data)
+
+    def _analyse(self, analyser: Analyser, state: ParseState, message: TDC, ctx: dict[str, Any] | None = None) -> Arparma[TDC]:
+        argv = state.argv
         argv.enter(ctx).build(message)
-        if argv.message_cache and (res := command_manager.get_record(argv.token)):
-            return res
-        if not (exc := analyser.process(argv)):
-            return analyser.export(argv)
+        failures = None
+        if argv.message_cache:
+            if (res := command_manager.replay(self, argv)) is not None:
+                analyser.cache_stats.hits += 1
+                return res
+            token = argv.token
+            # 上下文与补全会话都可能改变解析的结果, 此时不使用失败结果的缓存
+            if analyser.failures is not None and not ctx and not comp_ctx.get(None):
+                failures = analyser.failures
+                with analyser.cache_lock:
+                    res = failures.get(token)
+                if res is not None:
+                    analyser.cache_stats.hits += 1
+                    argv.exit()
+                    return res
+            analyser.cache_stats.misses += 1
+        if not (exc := self._process(analyser, state)):
+            res = analyser.export(state)
+        elif isinstance(exc, PauseTriggered):
+            raise exc
+        else:
+            res = analyser.export(state, True, exc)
+        if failures is not None and not res.matched:
+            # 快捷指令会改写 argv.token, 因此使用构建时的 token
+            with analyser.cache_lock:
+                failures[token] = res
+        return res
+
+    def _process(self, analyser: Analyser, state: ParseState) -> Exception | None:
+        """解析已经构建好的命令行参数, 命令头不匹配时尝试快捷指令, 返回解析失败时的异常"""
+        argv = state.argv
+        if not (exc := analyser.process(state)):
+            return
         if isinstance(exc, InvalidHeader):
             trigger = exc.context_node
             if trigger.__class__ is str and trigger:
@@ -451,22 +548,58 @@ class Alconna(Subcommand):
                     argv.reset()
                     argv.origin = _origin
                     argv.addon(wrap_shortcut(rest, short, mat, argv.context), merge_str=False)
-                    analyser.header_result = analyse_header(self._header, argv)
-                    analyser.header_result.origin = key
-                    if not (exc := analyser.process(argv)):
-                        return analyser.export(argv)
+                    state.header_result = analyse_header(self._header, argv)
+                    state.header_result.origin = key
+                    if not (exc := analyser.process(state)):
+                        return
                 except ValueError:
                     if argv.fuzzy_match and (res := handle_head_fuzzy(self._header, trigger, argv.fuzzy_threshold)):
                         exc = FuzzyMatchSuccess(res)
                 except AlconnaException as e:
                     exc = e
-        if isinstance(exc, PauseTriggered):
-            raise exc
-        return analyser.export(argv, True, exc)
+        return exc
+
+    def matches(self, message: TDC, ctx: dict[str, Any] | None = None) -> tuple[bool, str]:
+        """仅判断消息是否匹配该命令, 不构建解析结果
+
+        不会执行行为器、执行器与内置选项的路由, 也不会生成 token 或记录解析结果
+
+        Args:
+            message (TDC): 命令消息
+            ctx (dict[str, Any], optional): 上下文信息
+        Returns:
+            tuple[bool, str]: 是否匹配, 以及进入的最深一层子命令的路径 (以 `.` 分隔, 未进入子命令时为空字符串)
+        Raises:
+            NullMessage: 传入的消息为空时抛出
+        """
+        if self.union:
+            for alc in self.union:
+                if (res := alc.matches(message, ctx))[0]:
+                    return res
+        analyser = command_manager.require(self)
+        if self._probe(analyser, message, ctx) is not None:
+            return False, ""
+        with analyser.borrow() as state:
+            argv = state.argv
+            cache = argv.message_cache
+            argv.message_cache = False
+            token = __argv_current__.set(argv)
+            try:
+                argv.enter(ctx).build(message)
+                exc = self._process(analyser, state)
+                matched = exc is None and argv.error is None
+                endpoint = state.endpoint() if matched else ""
+                argv.exit()
+            finally:
+                __argv_current__.reset(token)
+                argv.message_cache = cache
+        return matched, endpoint
 
     def parse(self, message: TDC, ctx: dict[str, Any] | None = None) -> Arparma[TDC]:
         """命令分析功能, 传入字符串或消息链, 返回一个特定的数据集合类
 
+        该方法是可重入且线程安全的: 每次调用都会从解析器的状态池中取出独立的解析状态
+
         Args:
             message (TDC): 命令消息
             ctx (dict[str, Any], optional): 上下文信息
@@ -475,16 +608,107 @@ class Alconna(Subcommand):
         Raises:
             NullMessage: 传入的消息为空时抛出
         """
-        arp = self._parse(message, ctx)
+        analyser = command_manager.require(self)
+        with analyser.borrow() as state:
+            token = __argv_current__.set(state.argv)
+            try:
+                return self._execute(self._parse(message, ctx, state))
+            finally:
+                __argv_current__.reset(token)
+
+    def _execute(self, arp: Arparma[TDC]) -> Arparma[TDC]:
+        """执行行为器, 执行器与内置选项的路由"""
         if arp.matched:
             arp = arp.execute(self.behaviors)
         if arp.matched and self._executors:
             for ext in self._executors:
                 self._executors[ext] = arp.call(ext.target)
         if err := self.router.execute(self, arp):
-            return arp.fail(err)
+            arp = arp.fail(err)
         return arp
 
+    def iter_parse(self, messages: Iterable[TDC], ctx: dict[str, Any] | None = None) -> Iterator[Arparma[TDC]]:
+        """批量分析命令, 逐条惰性地返回解析结果
+
+        结果与逐条调用 `parse` 相同, 但整个过程只获取一次解析器, 并复用同一个解析状态
+
+        Args:
+            messages (Iterable[TDC]): 命令消息
+            ctx (dict[str, Any], optional): 上下文信息, 对所有消息生效
+        Yields:
+            Arparma[TDC]: 解析结果
+        Raises:
+            NullMessage: 传入的消息为空时抛出
+        """
+        analyser = command_manager.require(self)
+        # 提前结束迭代 (break、close) 时, 生成器在 yield 处收到 GeneratorExit, 状态同样会被放回
+        with analyser.borrow() as state:
+            argv = state.argv
+            for message in messages:
+                token = __argv_current__.set(argv)
+                try:
+                    arp = self._execute(self._parse(message, ctx, state))
+                finally:
+                    __argv_current__.reset(token)
+                state.reset()
+                yield arp
+
+    def parse_many(self, messages: Iterable[TDC], ctx: dict[str, Any] | None = None) -> list[Arparma[TDC]]:
+        """批量分析命令, 返回所有解析结果
+
+        Args:
+            messages (Iterable[TDC]): 命令消息
+            ctx (dict[str, Any], optional): 上下文信息, 对所有消息生效
+        Returns:
+            list[Arparma[TDC]]: 解析结果, 与传入的消息一一对应
+        """
+        return list(self.iter_parse(messages, ctx))
+
+    async def aparse(self, message: TDC, ctx: dict[str, Any] | None = None, *, concurrency: int | None = None) -> Arparma[TDC]:
+        """异步的命令分析功能, 允许异步的行为器与执行器
+
+        若命令配置了 `offload_parse`, 解析过程会在线程中进行, 从而不会因耗时的 `to_text`、`converter` 等钩子阻塞事件循环
+
+        Args:
+            message (TDC): 命令消息
+            ctx (dict[str, Any], optional): 上下文信息
+            concurrency (int, optional): 同时执行的执行器的最大数量, 默认为 `global_config.executor_concurrency`
+        Returns:
+            Arparma[TDC]: 解析结果
+        Raises:
+            NullMessage: 传入的消息为空时抛出
+        """
+        return await self._aparse(message, ctx, asyncio.Semaphore(concurrency or global_config.executor_concurrency))
+
+    async def _aparse(self, message: TDC, ctx: dict[str, Any] | None, semaphore: asyncio.Semaphore) -> Arparma[TDC]:
+        analyser = command_manager.require(self)
+        with analyser.borrow() as state:
+            token = __argv_current__.set(state.argv)
+            try:
+                if self.config.offload_parse:
+                    arp = await asyncio.to_thread(self._parse, message, ctx, state)
+                else:
+                    arp = self._parse(message, ctx, state)
+                if arp.matched:
+                    arp = await arp.aexecute(self.behaviors)
+                if arp.matched and self._executors:
+                    await self._aexecute(arp, semaphore)
+                if err := await self.router.aexecute(self, arp):
+                    arp = arp.fail(err)
+            finally:
+                __argv_current__.reset(token)
+        return arp
+
+    async def _aexecute(self, arp: Arparma, semaphore: asyncio.Semaphore):
+        """并发地执行命令执行器"""
+
+        async def _run(ext: ArparmaExecutor):
+            async with semaphore:
+                res = arp.call(ext.target)
+                self._executors[ext] = (await res) if is_awaitable(res) else res
+
+        await asyncio.gather(*(_run(ext) for ext in self._executors))
+
     def bind(self, active: bool = True):
         """绑定命令执行器
 
@@ -500,6 +724,16 @@ class Alconna(Subcommand):
 
         return wrapper
 
+    @property
+    def cache_stats(self) -> CacheStats:
+        """消息缓存的统计信息, 在命令更新后重新计数"""
+        return command_manager.require(self).cache_stats
+
+    @property
+    def probe_stats(self) -> ProbeStats:
+        """完整解析之前的头部探测的统计信息, 在命令更新后重新计数"""
+        return command_manager.require(self).probe_stats
+
     @property
     def exec_result(self) -> dict[str, Any]:
         return {ext.target.__name__: res for ext, res in self._executors.items() if res is not None}
@@ -528,6 +762,7 @@ class Alconna(Subcommand):
 
     def __or__(self, other: Alconna) -> Self:
         self.union.add(other)
+        command_manager._reindex(self)
         return self
 
     def _calc_hash(self):
@@ -0,0 +1,274 @@
+"""Alconna 多命令分发相关"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Hashable
+
+from ._trie import CharTrie
+
+if TYPE_CHECKING:
+    from .core import Alconna
+    from .ingedia._argv import Argv
+    from .shortcut import InnerShortcutArgs
+
+_REGEX_META = frozenset(".^$*+?{}[]|()")
+
+
+def literal_pattern(pattern: str, flags: int = 0) -> str | None:
+    """若正则表达式只能匹配某个字面量, 则返回该字面量, 否则返回 None"""
+    if flags:
+        return None
+    result = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == "\\":
+            if (char := next(chars, None)) is None or char.isalnum():
+                return None
+        elif char in _REGEX_META:
+            return None
+        result.append(char)
+    return "".join(result)
+
+
+class ProbeStats:
+    """头部探测的统计信息
+
+    探测只依据消息的前一两个元素判断其是否可能匹配命令头; 命中时消息会交由完整的解析, 未命中时则直接被拒绝
+    """
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        """可能匹配而继续解析的次数"""
+        self.misses = 0
+        """在完整构建之前被拒绝的次数"""
+
+    @property
+    def total(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def miss_rate(self) -> float:
+        """被拒绝的消息所占的比例"""
+        return self.misses / total if (total := self.hits + self.misses) else 0.0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"ProbeStats(hits={self.hits}, misses={self.misses})"
+
+
+class HeaderIndex:
+    """同一分词方式下的命令头部索引
+
+    同一组内的命令共享命名空间、分隔符与 `Argv` 类型, 因此一条消息只需要分词一次
+    """
+
+    __slots__ = ("argvs", "exact", "compact", "elements", "compact_elements", "fallback", "paths")
+
+    def __init__(self):
+        self.argvs: dict[int, Argv] = {}
+        """组内命令对应的 Argv, 用于分词"""
+        self.exact: dict[str, set[int]] = {}
+        """完整头部 -> 命令"""
+        self.compact: CharTrie[int] = CharTrie()
+        """允许紧凑的头部 -> 命令"""
+        self.elements: dict[str, set[int]] = {}
+        """使用元素前缀的命令名 -> 命令"""
+        self.compact_elements: CharTrie[int] = CharTrie()
+        """使用元素前缀且允许紧凑的命令名 -> 命令"""
+        self.fallback: set[int] = set()
+        """无法索引, 需要始终尝试的命令"""
+        self.paths: dict[str, set[int]] = {}
+        """命令路径 -> 命令, 用于关联快捷指令"""
+
+    def add(self, command: Alconna, argv: Argv) -> tuple[list[str], str | None]:
+        """添加命令, 返回其被索引的头部与元素前缀后的命令名"""
+        cmd_hash = command._hash
+        self.argvs[cmd_hash] = argv
+        self.paths.setdefault(command.path, set()).add(cmd_hash)
+        header = command._header
+        name = header.origin[0]
+        if getattr(command, "union", None) or name.__class__ is not str or header.compact_pattern is not None:
+            # 正则表达式形式的紧凑头部无法放入索引
+            self.fallback.add(cmd_hash)
+            return [], None
+        for key in header.content:
+            self.exact.setdefault(key, set()).add(cmd_hash)
+            if header.compact:
+                self.compact.insert(key, cmd_hash)
+        if not header.matcher.elements:
+            return list(header.content), None
+        self.elements.setdefault(name, set()).add(cmd_hash)
+        if header.compact:
+            self.compact_elements.insert(name, cmd_hash)
+        return list(header.content), name
+
+    def remove(self, cmd_hash: int, path: str, keys: list[str], element_key: str | None):
+        self.argvs.pop(cmd_hash, None)
+        self.fallback.discard(cmd_hash)
+        if (hashes := self.paths.get(path)) is not None:
+            hashes.discard(cmd_hash)
+            if not hashes:
+                del self.paths[path]
+        for key in keys:
+            if (hashes := self.exact.get(key)) is not None:
+                hashes.discard(cmd_hash)
+                if not hashes:
+                    del self.exact[key]
+            self.compact.discard(key, cmd_hash)
+        if element_key is not None:
+            if (hashes := self.elements.get(element_key)) is not None:
+                hashes.discard(cmd_hash)
+                if not hashes:
+                    del self.elements[element_key]
+            self.compact_elements.discard(element_key, cmd_hash)
+
+    def lookup(self, message: Any, dispatcher: CommandDispatcher) -> set[int]:
+        """获取组内可能匹配消息的命令"""
+        argv = next(iter(self.argvs.values()))
+        try:
+            tokens = argv.head(message)
+        except Exception:
+            return set(self.argvs)
+        if not tokens:
+            # 交由命令自身抛出 NullMessage
+            return set(self.argvs)
+        head, _str = tokens[0]
+        may_cmd, _m_str = tokens[1] if len(tokens) > 1 else ("", True)
+        texts = []
+        if _str:
+            texts.append(head)
+        if _m_str:
+            texts.append(f"{head}{argv.separators[0]}{may_cmd}")
+        result = set(self.fallback)
+        if not _str and _m_str and self.elements:
+            if hashes := self.elements.get(may_cmd):
+                result.update(hashes)
+            if self.compact_elements:
+                for _, hashes in self.compact_elements.prefixes(may_cmd):
+                    result.update(hashes)
+        for text in texts:
+            if hashes := self.exact.get(text):
+                result.update(hashes)
+            if self.compact:
+                for _, hashes in self.compact.prefixes(text):
+                    result.update(hashes)
+        # 与 `analyse_header` 抛出的 InvalidHeader 所携带的触发词保持一致
+        trigger = head if _str else texts[-1] if _m_str and may_cmd else None
+        if trigger:
+            for path in dispatcher.shortcut_paths(trigger):
+                result.update(self.paths.get(path, ()))
+        return result
+
+
+class CommandDispatcher:
+    """命令分发器
+
+    以命令头部、紧凑前缀与快捷指令的触发词建立索引, 从而只将消息交给可能匹配的命令
+    """
+
+    def __init__(self):
+        self.groups: dict[Hashable, HeaderIndex] = {}
+        self.entries: dict[int, tuple[Hashable, str, list[str], str | None]] = {}
+        self.order: dict[int, int] = {}
+        self.shortcuts: CharTrie[str] = CharTrie()
+        """快捷指令触发词的首段 -> 命令路径"""
+        self.shortcut_keys: dict[str, list[str]] = {}
+        self.shortcut_any: set[str] = set()
+        """存在非字面量快捷指令的命令路径"""
+        self.stats = ProbeStats()
+        """分发时头部探测的统计信息"""
+        self._count = 0
+
+    @staticmethod
+    def group_key(command: Alconna, argv: Argv) -> Hashable:
+        return command.namespace, command.separators, argv.__class__, argv.filter_crlf
+
+    def add(self, command: Alconna, argv: Argv):
+        """添加或更新命令的索引"""
+        self.remove(command)
+        key = self.group_key(command, argv)
+        keys, element_key = self.groups.setdefault(key, HeaderIndex()).add(command, argv)
+        self.entries[command._hash] = (key, command.path, keys, element_key)
+        self.order[command._hash] = self._count
+        self._count += 1
+
+    def remove(self, command: Alconna):
+        """移除命令的索引"""
+        cmd_hash = command._hash
+        if (entry := self.entries.pop(cmd_hash, None)) is None:
+            return
+        self.order.pop(cmd_hash, None)
+        key, path, keys, element_key = entry
+        group = self.groups[key]
+        group.remove(cmd_hash, path, keys, element_key)
+        if not group.argvs:
+            del self.groups[key]
+
+    def set_shortcuts(self, path: str, table: dict[str, InnerShortcutArgs] | None):
+        """更新某个命令路径下的快捷指令索引"""
+        separators = next((key[1] for key, group in self.groups.items() if path in group.paths), " ")  # type: ignore
+        for head in self.shortcut_keys.pop(path, []):
+            self.shortcuts.discard(head, path)
+        self.shortcut_any.discard(path)
+        if not table:
+            return
+        heads = []
+        for key, short in table.items():
+            if not (literal := literal_pattern(key, short.flags)):
+                self.shortcut_any.add(path)
+                continue
+            # 快捷指令的查询词由触发词逐个拼接而成, 因此键在第一个分隔符之前的部分必然是触发词的前缀
+            end = next((i for i, char in enumerate(literal) if char in separators), len(literal))
+            if not (head := literal[:end]):
+                self.shortcut_any.add(path)
+                continue
+            heads.append(head)
+            self.shortcuts.insert(head, path)
+        self.shortcut_keys[path] = heads
+
+    def defer_shortcuts(self, path: str):
+        """标记某个命令路径下的快捷指令尚未加载, 此时该路径下的命令总是会被尝试"""
+        for head in self.shortcut_keys.pop(path, []):
+            self.shortcuts.discard(head, path)
+        self.shortcut_any.add(path)
+
+    def may_shortcut(self, path: str, trigger: str) -> bool:
+        """判断某个命令路径下是否可能存在由 `trigger` 触发的快捷指令"""
+        if path in self.shortcut_any:
+            return True
+        if self.shortcuts:
+            return any(path in paths for _, paths in self.shortcuts.prefixes(trigger))
+        return False
+
+    def shortcut_paths(self, trigger: str) -> set[str]:
+        result = set(self.shortcut_any)
+        if self.shortcuts:
+            for _, paths in self.shortcuts.prefixes(trigger):
+                result.update(paths)
+        return result
+
+    def dispatch(self, message: Any, namespace: str = "") -> list[int]:
+        """获取可能匹配消息的命令, 按注册顺序排列"""
+        result: set[int] = set()
+        for key, group in self.groups.items():
+            if namespace and key[0] != namespace:  # type: ignore
+                continue
+            result |= group.lookup(message, self)
+        if result:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+        return sorted(result, key=self.order.__getitem__)
+
+    def clear(self):
+        self.groups.clear()
+        self.entries.clear()
+        self.order.clear()
+        self.shortcuts.clear()
+        self.shortcut_keys.clear()
+        self.shortcut_any.clear()
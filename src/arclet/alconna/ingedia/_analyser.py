@@ -1,16 +1,20 @@
 from __future__ import annotations
 
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Any, Callable
-from typing_extensions import Self, TypeAlias
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+from typing_extensions import TypeAlias
 
-from tarina import Empty, lang
+from tarina import LRU, Empty, lang
 
+from .._trie import CharTrie
 from ..action import Action
 from ..args import _Args
-from ..arparma import Arparma
+from ..arparma import Arparma, LazyArparma
 from ..base import Option, Subcommand, HeadResult, OptionResult, SubcommandResult
 from ..completion import comp_ctx, prompt
+from ..dispatch import ProbeStats, literal_pattern
 from ..exceptions import (
     ArgumentMissing,
     AnalyseException,
@@ -20,7 +24,8 @@ from ..exceptions import (
     ParamsUnmatched,
     PauseTriggered,
 )
-from ..manager import command_manager
+from ..manager import CacheStats, command_manager
+from ..record import BUDGETED_STORE_SIZE, RecordStore, register_size, shared
 from ..typing import TDC
 from ._handlers import (
     analyse_header,
@@ -28,7 +33,7 @@ from ._handlers import (
     analyse_param,
     handle_opt_default,
 )
-from ._util import levenshtein
+from ._util import fuzzy_match, scope_table
 
 if TYPE_CHECKING:
     from ..core import Alconna
@@ -58,6 +63,29 @@ def default_compiler(analyser: SubAnalyser):
                 analyser.compact_params.append(sub)
             if sub.command.default is not Empty:
                 analyser.default_sub_result[opts.dest] = sub.command.default
+    for index, param in enumerate(analyser.compact_params):
+        if isinstance(param, Option):
+            # 紧凑选项的别名会被当作正则表达式匹配, 只有字面量别名可以放入前缀树
+            aliases = [literal_pattern(alias) for alias in param.aliases] if param.compact else list(param.aliases)
+        else:
+            aliases = list(param.command.aliases)
+        if not all(aliases):
+            analyser.compact_any.append(index)
+            continue
+        for alias in aliases:
+            analyser.compact_trie.insert(alias, index)  # type: ignore
+
+
+def compile_scope(analyser: SubAnalyser, parent: dict[str, tuple[Option | SubAnalyser, bool]] | None = None):
+    """为解析器及其子解析器预先计算展开后的作用域表
+
+    _Args:
+        analyser (SubAnalyser): 任意子解析器
+        parent (dict[str, tuple[Option | SubAnalyser, bool]] | None, optional): 上级作用域的作用域表
+    """
+    analyser.scope_params = scope_table(analyser.compile_params, parent)
+    for sub in {id(param): param for param in analyser.compile_params.values() if isinstance(param, SubAnalyser)}.values():
+        compile_scope(sub, analyser.scope_params)
 
 
 @dataclass
@@ -74,18 +102,14 @@ class SubAnalyser:
     """编译的节点"""
     compact_params: list[Option | SubAnalyser] = field(default_factory=list)
     """可能紧凑的需要逐个解析的节点"""
+    compact_trie: CharTrie[int] = field(default_factory=CharTrie)
+    """紧凑节点名称的前缀树, 值为节点在 compact_params 中的位置"""
+    compact_any: list[int] = field(default_factory=list)
+    """名称无法放入前缀树, 需要始终尝试的紧凑节点的位置"""
+    scope_params: dict[str, tuple[Option | SubAnalyser, bool]] | None = field(default=None)
+    """展开后的作用域表, 即解析时可见的节点及其是否为软关键字; 为 None 时在进入时计算"""
     self_args: _Args = field(init=False)
     """命令自身参数"""
-    subcommands_result: dict[str, SubcommandResult] = field(init=False)
-    """子命令的解析结果"""
-    options_result: dict[str, OptionResult] = field(init=False)
-    """选项的解析结果"""
-    args_result: dict[str, Any] = field(init=False)
-    """参数的解析结果"""
-    header_result: HeadResult | None = field(init=False)
-    """头部的解析结果"""
-    value_result: Any = field(init=False)
-    """值的解析结果"""
     default_opt_result: dict[str, tuple[OptionResult, Action]] = field(default_factory=dict)
     """默认选项的解析结果"""
     default_sub_result: dict[str, SubcommandResult] = field(default_factory=dict)
@@ -95,14 +119,12 @@ class SubAnalyser:
     soft_keyword: bool = field(default=False)
 
     def _clr(self):
-        """清除自身的解析结果"""
-        self.reset()
+        """清除自身的编译结果"""
         ks = list(self.__dict__.keys())
         for k in ks:
             delattr(self, k)
 
     def __post_init__(self):
-        self.reset()
         self.soft_keyword = self.command.soft_keyword
         self.__calc_args__()
 
@@ -114,63 +136,45 @@ class SubAnalyser:
         if _de_count and _de_count == self.command.nargs:
             self.default_main_only = True
 
-    def result(self) -> SubcommandResult:
-        """生成子命令解析结果
+    def new_state(self) -> SubState:
+        """创建一次解析所用的解析状态"""
+        return SubState(self)
 
-        Returns:
-            SubcommandResult: 子命令解析结果
-        """
-        if self.default_opt_result:
-            handle_opt_default(self.default_opt_result, self.options_result)
-        if self.default_sub_result:
-            for k, v in self.default_sub_result.items():
-                if k not in self.subcommands_result:
-                    self.subcommands_result[k] = v
-        res = SubcommandResult(self.value_result, self.args_result, self.options_result, self.subcommands_result)
-        self.reset()
-        return res
-
-    def reset(self):
-        """重置解析器"""
-        self.args_result = {}
-        self.options_result = {}
-        self.subcommands_result = {}
-        self.value_result = None
-        self.header_result = None
-
-    def process(self, argv: Argv, name_validated: bool = True) -> Self:
+    def process(self, argv: Argv, name_validated: bool = True, state: SubState | None = None) -> SubState:
         """处理传入的参数集合
 
         _Args:
             argv (Argv): 命令行参数
             name_validated (bool, optional): 是否已经验证过名称. Defaults to True.
+            state (SubState | None, optional): 解析状态, 不传入则新建一个
 
         Returns:
-            Self: 自身
+            SubState: 本次解析的解析状态
 
         Raises:
             ParamsUnmatched: 名称不匹配
             FuzzyMatchSuccess: 模糊匹配成功
         """
         sub = self.command
+        if state is None:
+            state = SubState(self)
         if not name_validated:
             name, _ = argv.next(sub.separators)
             if name not in sub.aliases:
                 argv.rollback(name)
                 if not argv.fuzzy_match:
                     raise InvalidParam(lang.require("subcommand", "name_error").format(source=sub.dest, target=name), sub)
-                for al in sub.aliases:
-                    if levenshtein(name, al) >= argv.fuzzy_threshold:
-                        raise FuzzyMatchSuccess(lang.require("fuzzy", "matched").format(source=al, target=name), sub)
+                if name.__class__ is str and (al := fuzzy_match(sub.aliases, name, argv.fuzzy_threshold)):
+                    raise FuzzyMatchSuccess(lang.require("fuzzy", "matched").format(source=al, target=name), sub)
                 raise InvalidParam(lang.require("subcommand", "name_error").format(source=sub.dest, target=name), sub)
 
         # self.value_result = sub.action.value
-        argv.stack_params.enter(self.compile_params)
-        while analyse_param(self, argv, self.command.separators) and argv.current_index != argv.ndata:
+        argv.stack_params.enter(self.compile_params, self.scope_params)
+        while analyse_param(state, argv, self.command.separators) and argv.current_index != argv.ndata:
             pass
-        if self.default_main_only and not self.args_result:
-            self.args_result = analyse_args(argv, self.self_args)
-        if not self.args_result and self.need_main_args:
+        if self.default_main_only and not state.args_result:
+            state.args_result = analyse_args(argv, self.self_args)
+        if not state.args_result and self.need_main_args:
             raise ArgumentMissing(
                 self.self_args.data[0].field.get_missing_tips(
                     lang.require("subcommand", "args_missing").format(name=self.command.dest)
@@ -178,16 +182,139 @@ class SubAnalyser:
                 sub
             )
         argv.stack_params.leave()
-        return self
+        return state
+
+
+register_size(SubAnalyser, shared)
+
+
+class SubState:
+    """子解析器的单次解析状态
+
+    编译后的解析器本身不再保存解析结果, 因此同一个解析器可以同时进行多次解析
+    """
+
+    __slots__ = ("analyser", "args_result", "options_result", "subcommands_result", "value_result")
+
+    def __init__(self, analyser: SubAnalyser):
+        self.analyser = analyser
+        self.reset()
+
+    def reset(self):
+        """重置解析状态"""
+        self.args_result: dict[str, Any] = {}
+        """参数的解析结果"""
+        self.options_result: dict[str, OptionResult] = {}
+        """选项的解析结果"""
+        self.subcommands_result: dict[str, SubcommandResult] = {}
+        """子命令的解析结果"""
+        self.value_result: Any = None
+        """值的解析结果"""
+
+    def fill_default(self):
+        """填充默认的选项与子命令结果"""
+        analyser = self.analyser
+        if analyser.default_opt_result:
+            handle_opt_default(analyser.default_opt_result, self.options_result)
+        if analyser.default_sub_result:
+            for k, v in analyser.default_sub_result.items():
+                if k not in self.subcommands_result:
+                    self.subcommands_result[k] = v
+
+    def endpoint(self) -> str:
+        """本次解析进入的最深一层子命令的路径, 以 `.` 分隔; 不包括仅由默认值填充的子命令"""
+        analyser = self.analyser
+        subs = self.subcommands_result
+        parts = []
+        while subs:
+            defaults = analyser.default_sub_result
+            for dest, sub in subs.items():
+                if defaults.get(dest) is not sub:
+                    break
+            else:
+                break
+            parts.append(dest)
+            analyser = next(
+                param for param in analyser.compile_params.values()
+                if isinstance(param, SubAnalyser) and param.command.dest == dest
+            )
+            subs = sub.subcommands
+        return ".".join(parts)
+
+    def result(self) -> SubcommandResult:
+        """生成子命令解析结果
+
+        Returns:
+            SubcommandResult: 子命令解析结果
+        """
+        self.fill_default()
+        return SubcommandResult(self.value_result, self.args_result, self.options_result, self.subcommands_result)
+
+
+class ResultRecord:
+    """惰性解析结果所保存的原始解析数据, 在首次访问时填充默认的选项与子命令结果"""
+
+    __slots__ = ("analyser", "options_result", "subcommands_result")
+
+    def __init__(self, analyser: SubAnalyser, options_result: dict[str, OptionResult], subcommands_result: dict[str, SubcommandResult]):  # noqa: E501
+        self.analyser = analyser
+        self.options_result = options_result
+        self.subcommands_result = subcommands_result
+
+    fill_default = SubState.fill_default
+
+    def mentions(self, name: str) -> bool:
+        """在不填充默认值的情况下, 判断 `name` 是否为选项、子命令或其参数的名称"""
+        analyser = self.analyser
+        if (
+            name in self.options_result or name in analyser.default_opt_result
+            or name in self.subcommands_result or name in analyser.default_sub_result
+        ):
+            return True
+        if any(name in opt.args for opt in self.options_result.values()):
+            return True
+        if any(name in opt.args for opt, _ in analyser.default_opt_result.values()):
+            return True
+        return any(
+            _sub_mentions(sub, name)
+            for subs in (self.subcommands_result, analyser.default_sub_result) for sub in subs.values()
+        )
+
+
+def _sub_mentions(sub: SubcommandResult, name: str) -> bool:
+    if name in sub.args or any(name in opt.args for opt in sub.options.values()):
+        return True
+    return any(_sub_mentions(_sub, name) for _sub in sub.subcommands.values())
+
+
+class ParseState(SubState):
+    """命令的单次解析状态, 由 `Analyser` 的状态池提供"""
+
+    __slots__ = ("argv", "header_result")
+
+    def __init__(self, analyser: Analyser, argv: Argv):
+        super().__init__(analyser)
+        self.argv = argv
+        """本次解析独占的命令行参数"""
+
+    def reset(self):
+        super().reset()
+        self.header_result: HeadResult | None = None
+        """头部的解析结果"""
 
 
 class Analyser(SubAnalyser):
-    """命令解析器"""
+    """命令解析器
+
+    解析器只保存编译结果; 每次解析所需的命令行参数与解析结果由状态池中的 `ParseState` 提供
+    """
 
     command: Alconna
     """命令实例"""
     argv: Argv
-    """命令行参数"""
+    """命令行参数模板, 解析时使用其副本"""
+    pool_size: int = 16
+    """状态池的最大容量"""
 
     def __init__(self, alconna: Alconna, argv: Argv, compiler: TCompile | None = None):
         """初始化解析器
@@ -200,22 +327,74 @@ class Analyser(SubAnalyser):
         super().__init__(alconna)
         self.argv = argv
         self.extra_allow = not self.command.config.strict
+        self.compiled: dict[str, Any] = {}
+        """编译器或其他解析后端的编译结果, 随解析器一同在命令更新时失效"""
+        self.probe_stats = ProbeStats()
+        """完整解析之前的头部探测的统计信息"""
+        self.failures: LRU[int, Arparma] | None = LRU(size) if (size := self.command.config.failure_cache) else None
+        """以消息的 token 为键的解析失败结果, 随解析器一同在命令更新时失效"""
+        self.cache_lock = threading.Lock()
+        """保护解析失败结果的缓存, 使其可在多个线程中共享"""
+        self.cache_stats = CacheStats()
+        """消息缓存 (包括解析失败结果的缓存) 的统计信息"""
+        self.records: RecordStore | None = None
+        """命令独立的解析结果记录, 为 None 时使用命令管理器共享的记录"""
+        if budget := self.command.config.record_budget:
+            self.records = RecordStore(BUDGETED_STORE_SIZE, budget)
         (compiler or default_compiler)(self)
-        self.argv.stack_params.base = self.compile_params
+        compile_scope(self)
+        self.argv.stack_params.set_base(self.compile_params, self.scope_params)
+        self._pool: list[ParseState] = []
 
     def __repr__(self):
         return f"<{self.__class__.__name__} of {self.command.path}>"
 
-    def process(self, argv: Argv, name_validated: bool = True) -> Exception | None:
+    def acquire(self) -> ParseState:
+        """从状态池中取出一个解析状态"""
+        try:
+            state = self._pool.pop()
+        except IndexError:
+            return ParseState(self, self.argv.fork())
+        state.reset()
+        return state
+
+    def release(self, state: ParseState):
+        """将解析状态放回状态池
+
+        被上下文覆写过配置的命令行参数不会被复用
+        """
+        if state.argv.overridden or len(self._pool) >= self.pool_size:
+            return
+        self._pool.append(state)
+
+    @contextmanager
+    def borrow(self) -> Iterator[ParseState]:
+        """取出一个解析状态, 用毕后 (包括抛出异常时) 放回状态池
+
+        抛出 `PauseTriggered` 时, 补全会话仍引用该状态的命令行参数, 因此不放回
+        """
+        state = self.acquire()
+        try:
+            yield state
+        except PauseTriggered:
+            raise
+        except BaseException:
+            state.argv.exit()
+            self.release(state)
+            raise
+        self.release(state)
+
+    def process(self, state: ParseState, name_validated: bool = True) -> Exception | None:  # type: ignore[override]
         """主体解析函数, 应针对各种情况进行解析
 
         _Args:
-            argv (Argv): 命令行参数
+            state (ParseState): 解析状态
             name_validated (bool, optional): 是否已经验证过名称. Defaults to True.
         """
-        if not self.header_result or not name_validated:
+        argv = state.argv
+        if not state.header_result or not name_validated:
             try:
-                self.header_result = analyse_header(self.command._header, argv)
+                state.header_result = analyse_header(self.command._header, argv)
             except InvalidHeader as e:
                 return e
             except RuntimeError:
@@ -223,7 +402,7 @@ class Analyser(SubAnalyser):
                 return exc
 
         try:
-            while analyse_param(self, argv) and argv.current_index != argv.ndata:
+            while analyse_param(state, argv) and argv.current_index != argv.ndata:
                 pass
         except FuzzyMatchSuccess as e:
             return e
@@ -232,15 +411,15 @@ class Analyser(SubAnalyser):
                 if isinstance(e1, InvalidParam):
                     argv.free(e1.context_node.separators if e1.context_node else None)
                 return PauseTriggered(
-                    prompt(self.command, argv, [*self.args_result.keys()], [*self.options_result.keys(), *self.subcommands_result.keys()], e1.context_node),
+                    prompt(self.command, argv, [*state.args_result.keys()], [*state.options_result.keys(), *state.subcommands_result.keys()], e1.context_node),
                     e1,
                     argv
                 )
             return e1
 
-        if self.default_main_only and not self.args_result:
+        if self.default_main_only and not state.args_result:
             try:
-                self.args_result = analyse_args(argv, self.self_args)
+                state.args_result = analyse_args(argv, self.self_args)
             except FuzzyMatchSuccess as e1:
                 return e1
             except AnalyseException as e2:
@@ -248,7 +427,7 @@ class Analyser(SubAnalyser):
                 if not argv.error:
                     argv.error = e2
 
-        if argv.current_index == argv.ndata and (not self.need_main_args or self.args_result):
+        if argv.current_index == argv.ndata and (not self.need_main_args or state.args_result):
             return
 
         rest = argv.release()
@@ -260,7 +439,7 @@ class Analyser(SubAnalyser):
             )
             if comp_ctx.get(None):
                 return PauseTriggered(
-                    prompt(self.command, argv, [*self.args_result.keys()], [*self.options_result.keys(), *self.subcommands_result.keys()]),
+                    prompt(self.command, argv, [*state.args_result.keys()], [*state.options_result.keys(), *state.subcommands_result.keys()]),
                     exc,
                     argv
                 )
@@ -268,21 +447,23 @@ class Analyser(SubAnalyser):
 
     def export(
         self,
-        argv: Argv[TDC],
+        state: ParseState,
         fail: bool = False,
         exception: Exception | None = None,
     ) -> Arparma[TDC]:
         """创建 `Arparma` 解析结果, 其一定是一次解析的最后部分
 
         _Args:
-            argv (Argv[TDC]): 命令行参数
+            state (ParseState): 解析状态
             fail (bool, optional): 是否解析失败. Defaults to False.
             exception (Exception | None, optional): 解析失败时的异常. Defaults to None.
         """
+        argv = state.argv
         if argv.error:
             fail = True
             exception = argv.error
-        result = Arparma(self.command._hash, argv.origin, not fail, self.header_result, ctx=argv.exit())
+        lazy = self.command.config.lazy_result
+        result = (LazyArparma if lazy else Arparma)(self.command._hash, argv.origin, not fail, state.header_result, ctx=argv.exit())  # noqa: E501
         if fail:
             if self.command.config.raise_exception and not isinstance(exception, FuzzyMatchSuccess):
                 raise exception
@@ -290,21 +471,48 @@ class Analyser(SubAnalyser):
             result.error_data = argv.release()
             if isinstance(exception, FuzzyMatchSuccess):
                 result.output = str(exception)
-
-        if self.default_opt_result:
-            handle_opt_default(self.default_opt_result, self.options_result)
-        if self.default_sub_result:
-            for k, v in self.default_sub_result.items():
-                if k not in self.subcommands_result:
-                    self.subcommands_result[k] = v
-        result.main_args = self.args_result
-        result.options = self.options_result
-        result.subcommands = self.subcommands_result
-        result.unpack()
+        self._complete(result, state, lazy)
         if not fail and argv.message_cache:
             command_manager.record(argv.token, result)
-        self.reset()
         return result  # type: ignore
 
+    def reject(
+        self,
+        state: ParseState,
+        origin: TDC,
+        ctx: dict[str, Any] | None,
+        exception: InvalidHeader,
+        error_data: Callable[[], list[Any]],
+    ) -> Arparma[TDC]:
+        """创建头部探测未命中时的解析结果, 其与完整解析后 `export` 创建的结果一致
+
+        此时消息并未被完整构建, 因此错误数据会在首次访问时才计算
+
+        _Args:
+            state (ParseState): 解析状态
+            origin (TDC): 经过转换的原始数据
+            ctx (dict[str, Any] | None): 上下文信息
+            exception (InvalidHeader): 探测得到的异常
+            error_data (Callable[[], list[Any]]): 计算错误数据的函数
+        """
+        if self.command.config.raise_exception:
+            raise exception
+        lazy = self.command.config.lazy_result
+        result = (LazyArparma if lazy else Arparma)(self.command._hash, origin, False, ctx=ctx)
+        result.error_info = exception
+        result.defer_error(error_data)
+        self._complete(result, state, lazy)
+        return result  # type: ignore
+
+    def _complete(self, result: Arparma, state: ParseState, lazy: bool):
+        result.main_args = state.args_result
+        if lazy:
+            result.defer(ResultRecord(self, state.options_result, state.subcommands_result))  # type: ignore
+        else:
+            state.fill_default()
+            result.options = state.options_result
+            result.subcommands = state.subcommands_result
+            result.unpack()
+
 
 TCompile: TypeAlias = Callable[[SubAnalyser], None]
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import InitVar, dataclass, field, fields
-from typing import Any, Callable, ClassVar, Generic, Iterable, Literal, TYPE_CHECKING
+from typing import Any, Callable, ClassVar, Generic, Hashable, Iterable, Literal, TYPE_CHECKING
 from typing_extensions import Self
 from contextvars import ContextVar
+from copy import copy
+import re
 from tarina import lang, split, split_once
 
 from ..base import Option, Config
@@ -16,6 +18,22 @@ from ._util import ChainMap
 if TYPE_CHECKING:
     from ._analyser import SubAnalyser
 
+_SPAN = getattr(split_once, "__module__", "") != "tarina._string_py"
+"""片段模式与 tarina 编译后的 `split_once` 的行为保持一致, 因此只在其可用时启用"""
+_QUOTES = frozenset("\"'")
+_IDENTITY_HASH = (object.__hash__, None)
+_span_tables: dict[str, tuple[re.Pattern[str], re.Pattern[str]]] = {}
+
+
+def span_tables(separators: str) -> tuple[re.Pattern[str], re.Pattern[str]]:
+    """获取分隔符对应的 (分隔符或引号, 非分隔符) 匹配式"""
+    try:
+        return _span_tables[separators]
+    except KeyError:
+        chars = "".join(map(re.escape, separators))
+        res = _span_tables[separators] = (re.compile(f"[{chars}\"']"), re.compile(f"[^{chars}]"))
+        return res
+
 
 @dataclass(repr=True)
 class Argv(Generic[TDC]):
@@ -42,6 +60,8 @@ class Argv(Generic[TDC]):
     """将命令元素转换为文本, 或者返回None以跳过该元素"""
     converter: Callable[[str | list], TDC] = field(default=lambda x: x)
     """将字符串或列表转为目标命令类型"""
+    fingerprints: dict[type, Callable[[Any], Hashable]] = field(default_factory=dict)
+    """命令元素类型 -> 指纹函数, 用于生成命令的 token"""
     filter_crlf: bool = field(init=False)
     """是否过滤掉换行符"""
     message_cache: bool = field(init=False)
@@ -55,18 +75,30 @@ class Argv(Generic[TDC]):
     error: Exception | None = field(init=False)
     ndata: int = field(init=False)
     """原始数据的长度"""
-    bak_data: list[str | Any] = field(init=False)
-    """备份的原始数据"""
-    raw_data: list[str | Any] = field(init=False)
-    """原始数据"""
     token: int = field(init=False)
     """命令的token"""
     origin: TDC = field(init=False)
     """原始命令"""
     context: dict[str, Any] = field(init=False, default_factory=dict)
+    overridden: bool = field(init=False, default=False)
+    """是否被上下文覆写过配置"""
     _sep: str | None = field(init=False)
+    _bak: list[str | Any] | None = field(init=False, repr=False)
+    """显式设置或已还原的备份数据; 为 None 时由撤销日志按需还原"""
+    _log: list[tuple[int, Any]] = field(init=False, repr=False)
+    """撤销日志, 记录自 `build` 以来对原始数据的修改 (位置, 修改前的值)
+
+    位置为 -1 时记录的是整个列表与数据长度, 为 -2 时记录的是检查点处的片段位置
+    """
+    _raw: list[str | Any] = field(init=False, repr=False)
+    _pos: int = field(init=False, repr=False)
+    """片段模式下, 当前字符串中尚未解析部分的起始位置"""
+    _span: tuple[str, int, int] | None = field(init=False, repr=False)
+    """片段模式下, 上一个取出的数据及其起止位置"""
 
     _cache: ClassVar[dict[type, dict[str, Any]]] = {}
+    span_threshold: ClassVar[int] = 256
+    """字符串长度达到该值时使用片段模式: 只移动位置而不切分、拼接剩余的字符串, 仅在取出数据时创建子串"""
 
     def __post_init__(self, conf: Config):
         self.reset()
@@ -77,12 +109,14 @@ class Argv(Generic[TDC]):
             self.to_text = __cache.get("to_text") or self.to_text
             self.checker = __cache.get("checker") or self.checker
             self.converter = __cache.get("converter") or self.converter
+            self.fingerprints.update(__cache.get("fingerprints") or {})
 
     def compile(self, conf: Config):
         self.fuzzy_match = bool(conf.fuzzy_match)
         self.fuzzy_threshold = conf.fuzzy_threshold  # type: ignore
         self.to_text = self.namespace.to_text
         self.converter = self.namespace.converter or self.converter  # type: ignore
+        self.fingerprints = {**self.namespace.fingerprints}
         self.message_cache = bool(conf.enable_message_cache)
         self.filter_crlf = not conf.keep_crlf
         self.context_style = conf.context_style  # type: ignore
@@ -91,18 +125,102 @@ class Argv(Generic[TDC]):
         """重置命令行参数"""
         self.current_index = 0
         self.ndata = 0
-        self.bak_data = []
         self.raw_data = []
+        self._bak = None
+        self._log = []
         self.error = None
-        self.stack_params.stack = []
+        self.stack_params.clear()
         self.token = 0
         self.origin = "None"  # type: ignore
         self._sep = None
 
-    @staticmethod
-    def generate_token(data: list) -> int:
-        """命令的`token`的生成函数"""
-        return hash(repr(data))
+    def fork(self) -> Self:
+        """复制出一个共享配置, 但拥有独立解析数据的命令行参数"""
+        argv = copy(self)
+        argv.stack_params = ChainMap()
+        argv.stack_params.set_base(self.stack_params.base, self.stack_params.root)
+        argv.context = {}
+        argv.overridden = False
+        argv.reset()
+        return argv
+
+    def fingerprint(self, unit: Any) -> int:
+        """命令元素的指纹
+
+        字符串直接取其哈希; 其他元素优先使用注册的指纹函数, 其次是自身定义的 `__hash__`.
+        只有基于对象标识的哈希时, 不同的消息可能因内存地址被复用而得到相同的指纹, 因此此时退回至 `repr`
+        """
+        if (cls := unit.__class__) is str:
+            return hash(unit)
+        if (func := self.fingerprints.get(cls)) is not None:
+            return hash((cls, func(unit)))
+        if cls.__hash__ not in _IDENTITY_HASH:
+            try:
+                return hash((cls, unit))
+            except TypeError:
+                pass
+        return hash((cls, repr(unit)))
+
+    def generate_token(self, data: list) -> int:
+        """命令的`token`的生成函数, 依次合并各个命令元素的指纹"""
+        token = 0
+        for unit in data:
+            token = hash((token, self.fingerprint(unit)))
+        return token
+
+    @property
+    def raw_data(self) -> list[str | Any]:
+        """原始数据"""
+        if self._pos:
+            self._settle()
+        return self._raw
+
+    @raw_data.setter
+    def raw_data(self, value: list[str | Any]):
+        self._raw = value
+        self._pos = 0
+        self._span = None
+
+    def _settle(self):
+        """将片段模式下的当前字符串切分为尚未解析的部分"""
+        index = self.current_index
+        data = self._raw[index]
+        self._log.append((index, data))
+        self._raw[index] = data[self._pos:]
+        self._pos = 0
+        self._span = None
+
+    def peek(self, limit: int) -> str | Any:
+        """在不改变自身状态的情况下, 获取当前的数据; 若其为字符串, 则只获取前 `limit` 个字符"""
+        if self.current_index == self.ndata:
+            return None
+        data = self._raw[self.current_index]
+        if data.__class__ is str:
+            return data[self._pos:self._pos + limit]
+        return data
+
+    @property
+    def bak_data(self) -> list[str | Any]:
+        """备份的原始数据, 即 `build` 或 `addon` 之后的原始数据
+
+        解析过程中不再复制原始数据, 而是在需要时根据撤销日志还原
+        """
+        if self._bak is None:
+            data = self._raw.copy()
+            for index, value in reversed(self._log):
+                if index == -2:
+                    continue
+                if index == -1:
+                    data = value[0].copy()
+                else:
+                    data[index] = value
+            self._bak = data
+        return self._bak
+
+    @bak_data.setter
+    def bak_data(self, value: list[str | Any]):
+        self._bak = value
+        self._log.clear()
 
     @property
     def done(self) -> bool:
@@ -131,6 +249,9 @@ class Argv(Generic[TDC]):
             data = [data]  # type: ignore
         i = 0
         raw_data = self.raw_data
+        # 在构建的同时合并元素的指纹, 除非子类重写了 token 的生成方式
+        incremental = self.message_cache and self.__class__.generate_token is Argv.generate_token
+        token = 0
         for unit in data:
             if (utype := unit.__class__) in self.filter_out:
                 continue
@@ -138,19 +259,59 @@ class Argv(Generic[TDC]):
                 unit = res
             if (text := self.to_text(unit)) is None:
                 raw_data.append(unit)
+                if incremental:
+                    token = hash((token, self.fingerprint(unit)))
             elif not (res := text.strip()):
                 continue
             else:
                 raw_data.append(res)
+                if incremental:
+                    token = hash((token, hash(res)))
             i += 1
         if i < 1:
             raise NullMessage(lang.require("argv", "null_message").format(target=data))
         self.ndata = i
-        self.bak_data = raw_data.copy()
-        if self.message_cache:
+        if incremental:
+            self.token = token
+        elif self.message_cache:
             self.token = self.generate_token(raw_data)
         return self
 
+    def head(self, data: TDC, limit: int = 2) -> list[tuple[str | Any, bool]]:
+        """在不改变自身状态的情况下, 取出命令的前几个数据
+
+        与 `build` 后连续调用 `next` 的结果一致, 但只处理所需的命令元素
+
+        Args:
+            data (TDC): 命令
+            limit (int, optional): 取出的数据数量
+
+        Returns:
+            list[tuple[str | Any, bool]]: 取出的数据, 以及其是否是字符串
+        """
+        if self.checker and not self.checker(data):
+            data = self.converter(data)  # type: ignore
+        if data.__class__ is str:
+            data = [data]  # type: ignore
+        result = []
+        filter_out, preprocessors, to_text = self.filter_out, self.preprocessors, self.to_text
+        for unit in data:
+            if (utype := unit.__class__) in filter_out:
+                continue
+            if preprocessors and (proc := preprocessors.get(utype)) and (res := proc(unit)):
+                unit = res
+            if (text := to_text(unit)) is None:
+                result.append((unit, False))
+            elif not (text := text.strip()):
+                continue
+            else:
+                while text and len(result) < limit:
+                    _text, text = split_once(text, self.separators, self.filter_crlf)
+                    result.append((_text, True))
+            if len(result) >= limit:
+                break
+        return result
+
     def addon(self, data: Iterable[str | Any], merge_str: bool = True) -> Self:
         """添加命令元素
 
@@ -173,7 +334,9 @@ class Argv(Generic[TDC]):
             else:
                 self.raw_data.append(d)
                 self.ndata += 1
-        self.bak_data = self.raw_data.copy()
+        # 备份数据以添加后的原始数据为准
+        self._bak = None
+        self._log.clear()
         if self.message_cache:
             self.token = self.generate_token(self.raw_data)
         return self
@@ -192,18 +355,51 @@ class Argv(Generic[TDC]):
         if self.current_index == self.ndata:
             return "", True
         separate = separate or self.separators
-        _current_data = self.raw_data[self.current_index]
+        _current_data = self._raw[self.current_index]
         if _current_data.__class__ is str:
+            if self._pos or (_SPAN and len(_current_data) >= self.span_threshold):
+                if (res := self._next_span(_current_data, separate)) is not None:
+                    return res
+                # 引号需要转义处理, 交由 split_once
+                if self._pos:
+                    self._settle()
+                    _current_data = self._raw[self.current_index]
             _text, _rest_text = split_once(_current_data, separate, self.filter_crlf)  # type: ignore
             if _rest_text:
                 self._sep = separate
-                self.raw_data[self.current_index] = _rest_text
+                self._log.append((self.current_index, _current_data))
+                self._raw[self.current_index] = _rest_text
             else:
                 self.current_index += 1
             return _text, True
         self.current_index += 1
         return _current_data, False
 
+    def _next_span(self, data: str, separate: str) -> tuple[str, bool] | None:
+        """片段模式下获取下个数据, 与 `split_once` 的结果一致; 遇到引号时返回 None"""
+        stop, skip = span_tables(separate + "\n\r" if self.filter_crlf else separate)
+        if (mat := skip.search(data, self._pos)) is None:
+            text = ""
+        else:
+            start = mat.start()
+            if (mat := stop.search(data, start)) is None:
+                text = data[start:]
+            else:
+                end = mat.start()
+                if data[end] in _QUOTES:
+                    return
+                text = data[start:end]
+                if (mat := skip.search(data, end)) is not None:
+                    self._pos = mat.start()
+                    self._span = (text, start, end)
+                    self._sep = separate
+                    return text, True
+        # 当前字符串已解析完毕, 与 split_once 一样保留最后的剩余部分
+        if self._pos:
+            self._settle()
+        self.current_index += 1
+        return text, True
+
     def rollback(self, data: str | Any, replace: bool = False):
         """把获取的数据放回 (实际只是`指针`移动)
 
@@ -214,35 +410,50 @@ class Argv(Generic[TDC]):
         if data == "" or data is None:
             return
         if self._sep:
-            _current_data = self.raw_data[self.current_index]
+            if self._pos:
+                # 放回的数据与取出时相同, 且其后只有一个分隔符时, 拼接的结果即为原字符串, 只需移动位置
+                if (span := self._span) and self._pos == span[2] + 1 and data == span[0]:
+                    if self._raw[self.current_index][span[2]] == self._sep[0]:
+                        self._pos = span[1]
+                        self._span = None
+                        return
+                self._settle()
+            _current_data = self._raw[self.current_index]
+            self._log.append((self.current_index, _current_data))
             if not _current_data:
-                self.raw_data[self.current_index] = data
+                self._raw[self.current_index] = data
             else:
                 if self._sep[0] in data and data[0] not in ("'", '"'):
                     data = f"\'{data}\'"
-                self.raw_data[self.current_index] = f"{data}{self._sep[0]}{_current_data}"
+                self._raw[self.current_index] = f"{data}{self._sep[0]}{_current_data}"
             return
+        if self._pos:
+            self._settle()
         if self.current_index >= 1:
             self.current_index -= 1
         if replace:
-            self.raw_data[self.current_index] = data
+            self._log.append((self.current_index, self._raw[self.current_index]))
+            self._raw[self.current_index] = data
 
     def free(self, separate: str | None = None):
         """将当前位置的数据释放"""
         separate = separate or self.separators
         if self.current_index == self.ndata:
             return
+        bak_data = self.bak_data
+        # 结构性的修改直接记录整个列表
+        self._log.append((-1, (self.raw_data.copy(), self.ndata)))
         _current_data = self.raw_data[self.current_index]
         if _current_data.__class__ is str:
             _text, _rest_text = split_once(_current_data, separate, self.filter_crlf)
             if _rest_text:
-                self.bak_data.insert(self.current_index + 1, _rest_text)
+                bak_data.insert(self.current_index + 1, _rest_text)
                 self.raw_data.insert(self.current_index + 1, _rest_text)
                 self.ndata += 1
-            self.bak_data[self.current_index] = self.bak_data[self.current_index][: -len(_current_data)].rstrip(separate)
+            bak_data[self.current_index] = bak_data[self.current_index][: -len(_current_data)].rstrip(separate)
             self.raw_data[self.current_index] = ""
         else:
-            self.bak_data.pop(self.current_index)
+            bak_data.pop(self.current_index)
             self.raw_data.pop(self.current_index)
 
     def release(self, separate: str | None = None, recover: bool = False, no_split: bool = False) -> list[str | Any]:
@@ -267,11 +478,33 @@ class Argv(Generic[TDC]):
                 _result.append(_data)
         return _result
 
-    def data_set(self):
-        return self.raw_data.copy(), self.current_index
+    def data_set(self) -> tuple[int, int]:
+        """记录当前的解析进度, 作为之后回溯的检查点
 
-    def data_reset(self, data: list[str | Any], index: int):
-        self.raw_data = data
+        Returns:
+            tuple[int, int]: 撤销日志的位置, 当前数据的索引
+        """
+        self._log.append((-2, self._pos))
+        return len(self._log) - 1, self.current_index
+
+    def data_reset(self, mark: int, index: int):
+        """回溯到 `data_set` 记录的检查点, 只撤销检查点之后发生的修改
+
+        Args:
+            mark (int): 撤销日志的位置
+            index (int): 当前数据的索引
+        """
+        log = self._log
+        raw_data = self._raw
+        while len(log) > mark:
+            _index, value = log.pop()
+            if _index == -2:
+                self._pos = value
+            elif _index == -1:
+                raw_data[:], self.ndata = value
+            else:
+                raw_data[_index] = value
+        self._span = None
         self.current_index = index
 
     def enter(self, ctx: dict[str, Any] | None = None) -> Self:
@@ -281,6 +514,7 @@ class Argv(Generic[TDC]):
             for k, v in ctx[ARGV_OVERRIDES].items():
                 if k in field_names:
                     setattr(self, k, v)
+                    self.overridden = True
         self.context = {} if ctx is None else ctx
         return self
 
@@ -292,6 +526,8 @@ class Argv(Generic[TDC]):
 
 
 __argv_type__: ContextVar[type[Argv]] = ContextVar("argv_type", default=Argv)
+__argv_current__: ContextVar[Argv] = ContextVar("argv_current")
+"""当前正在进行的解析所使用的命令行参数"""
 
 
 def set_default_argv_type(argv_type: type[Argv]):
@@ -306,6 +542,7 @@ def argv_config(
     filter_out: list[type] | None = None,
     checker: Callable[[Any], bool] | None = None,
     converter: Callable[[str | list], TDC] | None = None,
+    fingerprints: dict[type, Callable[[Any], Hashable]] | None = None,
 ):
     """配置命令行参数
 
@@ -316,6 +553,7 @@ def argv_config(
         filter_out (list[type] | None, optional): 需要过滤掉的命令元素.
         checker (Callable[[Any], bool] | None, optional): 检查传入命令.
         converter (Callable[[str | list], TDC] | None, optional): 将字符串或列表转为目标命令类型.
+        fingerprints (dict[type, Callable[[Any], Hashable]] | None, optional): 命令元素类型对应的指纹函数.
     """
     Argv._cache.setdefault(target or __argv_type__.get(), {}).update(
         {k: v for k, v in locals().items() if v is not None}
@@ -0,0 +1,411 @@
+"""代码生成编译器
+
+为命令的选项、子命令与参数结构生成专用的解析函数并执行, 以此替代对 `SubAnalyser` 结构的逐个解释:
+选项与子命令的名称、分隔符与默认值等静态数据会直接写入生成的代码中, 解析时不再需要按类型分派.
+"""
+
+from __future__ import annotations
+
+import linecache
+from typing import TYPE_CHECKING, Any
+
+from nepattern import ANY, STRING, AnyString
+from tarina import Empty, lang
+
+from ..base import Option, OptionResult
+from ..completion import comp_ctx, prompt
+from ..exceptions import (
+    AnalyseException,
+    ArgumentMissing,
+    FuzzyMatchSuccess,
+    InvalidHeader,
+    InvalidParam,
+    ParamsUnmatched,
+    PauseTriggered,
+)
+from ._analyser import Analyser, SubAnalyser, SubState, default_compiler
+from ._handlers import _validate, analyse_args, analyse_compact_params, analyse_header, analyse_option
+from ._util import fuzzy_match
+
+if TYPE_CHECKING:
+    from ..args import Arg, _Args
+
+_LITERALS = (str, int, float, bool, type(None))
+_INLINE_PARAMS = 8
+"""节点的选项与子命令不多于该数量时, 直接以条件分支匹配名称, 否则通过字典分派"""
+
+
+class _Generator:
+    """生成一个命令的全部解析函数"""
+
+    def __init__(self, analyser: Analyser):
+        self.analyser = analyser
+        self.lines: list[str] = []
+        self.args_lines: list[str] = []
+        """参数解析函数的代码, 可能在生成其他函数的途中产生, 因此单独存放"""
+        self.dispatch: list[tuple[str, dict[str, str]]] = []
+        self.env: dict[str, Any] = {
+            "ANY": ANY,
+            "STRING": STRING,
+            "AnyString": AnyString,
+            "Option": Option,
+            "OptionResult": OptionResult,
+            "SubState": SubState,
+            "AnalyseException": AnalyseException,
+            "ArgumentMissing": ArgumentMissing,
+            "FuzzyMatchSuccess": FuzzyMatchSuccess,
+            "InvalidHeader": InvalidHeader,
+            "InvalidParam": InvalidParam,
+            "ParamsUnmatched": ParamsUnmatched,
+            "PauseTriggered": PauseTriggered,
+            "lang": lang,
+            "comp_ctx": comp_ctx,
+            "prompt": prompt,
+            "fuzzy_match": fuzzy_match,
+            "_validate": _validate,
+            "analyse_args": analyse_args,
+            "analyse_compact_params": analyse_compact_params,
+            "analyse_header": analyse_header,
+            "analyse_option": analyse_option,
+        }
+        self.consts: dict[int, str] = {}
+        self.args_funcs: dict[int, str] = {}
+        self.nodes: list[tuple[SubAnalyser, str]] = []
+
+    def const(self, obj: Any, prefix: str) -> str:
+        """将对象放入生成代码的全局变量中, 返回其名称"""
+        if (name := self.consts.get(id(obj))) is None:
+            name = self.consts[id(obj)] = f"{prefix}_{len(self.consts)}"
+            self.env[name] = obj
+        return name
+
+    def literal(self, obj: Any, prefix: str) -> str:
+        """简单的常量直接写入代码, 其余对象放入全局变量中"""
+        if obj.__class__ in _LITERALS:
+            return repr(obj)
+        return self.const(obj, prefix)
+
+    def emit(self, indent: int, *lines: str, target: list[str] | None = None):
+        (self.lines if target is None else target).extend("    " * indent + line for line in lines)
+
+    def missing(self, indent: int, arg: Arg, name: str):
+        """参数缺失时的处理"""
+        if (default := arg.field.default) is not Empty:
+            self.emit(indent, f"result[{arg.name!r}] = {self.literal(default, 'DEFAULT')}", target=self.args_lines)
+        elif not arg.field.optional:
+            self.emit(
+                indent,
+                f"raise ArgumentMissing({name}.field.get_missing_tips("
+                f"lang.require('args', 'missing').format(key={arg.name!r})), {name})",
+                target=self.args_lines,
+            )
+        else:
+            self.emit(indent, "pass", target=self.args_lines)
+
+    def args(self, args: _Args) -> str:
+        """生成参数解析函数, 返回以 `argv` 调用它的表达式
+
+        含有可变参数、仅关键字参数或 `AllParam` 的参数仍使用通用的 `analyse_args`
+        """
+        if not args.plan.simple:
+            return f"analyse_args(argv, {self.const(args, 'ARGS')})"
+        if (func := self.args_funcs.get(id(args))) is not None:
+            return f"{func}(argv)"
+        func = self.args_funcs[id(args)] = f"args_{len(self.args_funcs)}"
+        self.const(args, "ARGS")
+        lines = self.args_lines
+        self.emit(0, f"def {func}(argv):", "    result = {}", "    stack = argv.stack_params", target=lines)
+        for arg in args.normal:
+            name = self.const(arg, "ARG")
+            value = arg.type_
+            self.emit(
+                1,
+                f"# {arg.name!r}",
+                f"may_arg, _str = argv.next({arg.field.seps!r})",
+                "if _str and stack.hard_keyword(may_arg):",
+                "    argv.rollback(may_arg)",
+                target=lines,
+            )
+            self.missing(2, arg, name)
+            self.emit(1, "elif may_arg is None or (_str and not may_arg):", target=lines)
+            self.missing(2, arg, name)
+            pattern = self.const(value, "PATTERN")
+            if value is ANY:
+                self.emit(
+                    1,
+                    "elif _str and argv.context_style:",
+                    f"    _validate(argv, {name}, {pattern}, result, may_arg, _str)",
+                    "else:",
+                    f"    result[{arg.name!r}] = may_arg",
+                    target=lines,
+                )
+            elif value is STRING:
+                self.emit(
+                    1,
+                    "elif _str and not argv.context_style:",
+                    f"    result[{arg.name!r}] = may_arg",
+                    "else:",
+                    f"    _validate(argv, {name}, {pattern}, result, may_arg, _str)",
+                    target=lines,
+                )
+            else:
+                self.emit(1, "else:", f"    _validate(argv, {name}, {pattern}, result, may_arg, _str)", target=lines)
+        self.emit(1, "return result", target=lines)
+        self.emit(0, "", target=lines)
+        return f"{func}(argv)"
+
+    def option(self, indent: int, opt: Option):
+        """选项名称匹配后的处理"""
+        name = self.const(opt, "OPT")
+        if opt.action.type != 0:
+            self.emit(indent, "try:", f"    analyse_option(state, argv, {name}, True)")
+        elif not opt.nargs:
+            # 无参数的 store 行为不会抛出异常, 重复出现时也只是覆盖
+            value = self.literal(opt.action.value, "VALUE")
+            self.emit(indent, f"state.options_result[{opt.dest!r}] = OptionResult({value})")
+            return
+        else:
+            call = self.args(opt.args)
+            self.emit(indent, "try:", f"    state.options_result[{opt.dest!r}] = OptionResult(None, {call})")
+        self.emit(indent, "except AnalyseException as e:", "    if not argv.error:", "        argv.error = e")
+
+    def subcommand(self, indent: int, sub: SubAnalyser, process: str):
+        """子命令名称匹配后的处理"""
+        name = self.const(sub, "SUB")
+        command = self.const(sub.command, "CMD")
+        dest = repr(sub.command.dest)
+        self.emit(
+            indent,
+            f"if {dest} not in state.subcommands_result:",
+            f"    sub = SubState({name})",
+            "    try:",
+            f"        {process}(argv, True, sub)",
+            "    except (FuzzyMatchSuccess, PauseTriggered):",
+            "        raise",
+            "    except InvalidParam as e:",
+            f"        if e.context_node is not {command}:",
+            f"            state.subcommands_result[{dest}] = sub.result()",
+            "        if not argv.error:",
+            "            argv.error = e",
+            "    except AnalyseException as e1:",
+            f"        state.subcommands_result[{dest}] = sub.result()",
+            "        if not argv.error:",
+            "            argv.error = e1",
+            "    else:",
+            f"        state.subcommands_result[{dest}] = sub.result()",
+            "    return True",
+        )
+
+    def param(self, analyser: SubAnalyser, index: int, root: bool):
+        """生成节点的单步解析函数, 对应 `analyse_param`"""
+        groups: dict[int, tuple[Option | SubAnalyser, list[str]]] = {}
+        for alias, param in analyser.compile_params.items():
+            groups.setdefault(id(param), (param, []))[1].append(alias)
+        # 先生成子命令的函数, 以免与当前函数的代码交错
+        handlers = []
+        for param, aliases in groups.values():
+            if param.__class__ is Option or param.__class__.__base__ is Option:
+                handlers.append((param, aliases, None))
+            else:
+                handlers.append((param, aliases, self.node(param)))  # type: ignore
+        inline = len(handlers) <= _INLINE_PARAMS
+        if not inline:
+            dispatch = {}
+            for i, (param, aliases, process) in enumerate(handlers):
+                func = f"param_{index}_{i}"
+                self.emit(0, f"def {func}(state, argv):")
+                if process is not None:
+                    self.subcommand(1, param, process)  # type: ignore
+                    self.emit(1, "return False")
+                else:
+                    self.option(1, param)  # type: ignore
+                    self.emit(1, "return True")
+                self.emit(0, "")
+                for alias in aliases:
+                    dispatch[alias] = func
+            table = f"DISPATCH_{index}"
+            self.dispatch.append((table, dispatch))
+        self.emit(0, f"def param_{index}(state, argv):")
+        self.emit(1, "_text, _str = argv.next()" if root else f"_text, _str = argv.next({analyser.command.separators!r})")
+        if handlers:
+            self.emit(1, "if _str and _text:")
+            if inline:
+                for param, aliases, process in handlers:
+                    if len(aliases) == 1:
+                        self.emit(2, f"if _text == {aliases[0]!r}:")
+                    else:
+                        self.emit(2, f"if _text in {{{', '.join(map(repr, sorted(aliases)))}}}:")
+                    if process is not None:
+                        # 子命令已解析过时, 与未命中时的处理相同
+                        self.subcommand(3, param, process)  # type: ignore
+                    else:
+                        self.option(3, param)  # type: ignore
+                        self.emit(3, "return True")
+            else:
+                self.emit(
+                    2, f"if (handler := {table}.get(_text)) is not None and handler(state, argv):", "    return True"
+                )
+        self.emit(1, "argv.rollback(_text)")
+        if analyser.compact_params:
+            self.emit(1, "if _str and _text and analyse_compact_params(state, argv):", "    return True")
+        if analyser.command.nargs:
+            self.emit(
+                1,
+                "if not state.args_result:",
+                f"    state.args_result = {self.args(analyser.self_args)}",
+                "    if state.args_result:",
+                "        return True",
+            )
+        self.emit(1, "if _str and _text and _text in argv.stack_params.parents():", "    return False")
+        if analyser.extra_allow:
+            self.emit(1, "state.args_result.setdefault('$extra', []).append(_text)", "argv.next()", "return True")
+        else:
+            self.emit(
+                1,
+                "if _str and _text and not argv.stack_params.stack:",
+                "    if not argv.error:",
+                "        argv.error = ParamsUnmatched(lang.require('analyser', 'param_unmatched').format(target=_text))",
+                "    argv.next()",
+                "    return True",
+                "return False",
+            )
+        self.emit(0, "")
+
+    def node(self, analyser: SubAnalyser) -> str:
+        """生成子命令的解析函数, 对应 `SubAnalyser.process`, 返回其名称"""
+        index = len(self.nodes)
+        func = f"process_{index}"
+        self.nodes.append((analyser, func))
+        self.param(analyser, index, False)
+        sub = analyser.command
+        name = self.const(analyser, "SUB")
+        command = self.const(sub, "CMD")
+        aliases = self.const(sub.aliases, "ALIASES")
+        dest = repr(sub.dest)
+        self.emit(
+            0,
+            f"def {func}(argv, name_validated=True, state=None):",
+            "    if state is None:",
+            f"        state = SubState({name})",
+            "    if not name_validated:",
+            f"        name, _ = argv.next({sub.separators!r})",
+            f"        if name not in {aliases}:",
+            "            argv.rollback(name)",
+            "            if not argv.fuzzy_match:",
+            f"                raise InvalidParam(lang.require('subcommand', 'name_error').format(source={dest}, target=name), {command})",
+            f"            if name.__class__ is str and (al := fuzzy_match({aliases}, name, argv.fuzzy_threshold)):",
+            f"                raise FuzzyMatchSuccess(lang.require('fuzzy', 'matched').format(source=al, target=name), {command})",
+            f"            raise InvalidParam(lang.require('subcommand', 'name_error').format(source={dest}, target=name), {command})",
+            f"    argv.stack_params.enter({self.const(analyser.compile_params, 'PARAMS')}, {name}.scope_params)",
+            f"    while param_{index}(state, argv) and argv.current_index != argv.ndata:",
+            "        pass",
+        )
+        if analyser.default_main_only:
+            self.emit(1, "if not state.args_result:", f"    state.args_result = {self.args(analyser.self_args)}")
+        if analyser.need_main_args:
+            first = self.const(analyser.self_args.data[0], "ARG")
+            self.emit(
+                1,
+                "if not state.args_result:",
+                f"    raise ArgumentMissing({first}.field.get_missing_tips("
+                f"lang.require('subcommand', 'args_missing').format(name={dest})), {command})",
+            )
+        self.emit(1, "argv.stack_params.leave()", "return state")
+        self.emit(0, "")
+        return func
+
+    def root(self):
+        """生成主命令的解析函数, 对应 `Analyser.process`"""
+        analyser = self.analyser
+        self.nodes.append((analyser, "process_0"))
+        self.param(analyser, 0, True)
+        command = self.const(analyser.command, "CMD")
+        self.emit(
+            0,
+            "def process_0(state, name_validated=True):",
+            "    argv = state.argv",
+            "    if not state.header_result or not name_validated:",
+            "        try:",
+            f"            state.header_result = analyse_header({command}._header, argv)",
+            "        except InvalidHeader as e:",
+            "            return e",
+            "        except RuntimeError:",
+            "            return InvalidParam(lang.require('header', 'error').format(target=argv.release(recover=True)[0]))",
+            "    try:",
+            "        while param_0(state, argv) and argv.current_index != argv.ndata:",
+            "            pass",
+            "    except FuzzyMatchSuccess as e:",
+            "        return e",
+            "    except (InvalidParam, ArgumentMissing) as e1:",
+            "        if comp_ctx.get(None):",
+            "            if isinstance(e1, InvalidParam):",
+            "                argv.free(e1.context_node.separators if e1.context_node else None)",
+            "            return PauseTriggered(",
+            f"                prompt({command}, argv, [*state.args_result.keys()], [*state.options_result.keys(), *state.subcommands_result.keys()], e1.context_node),",  # noqa: E501
+            "                e1,",
+            "                argv",
+            "            )",
+            "        return e1",
+        )
+        if analyser.default_main_only:
+            self.emit(
+                1,
+                "if not state.args_result:",
+                "    try:",
+                f"        state.args_result = {self.args(analyser.self_args)}",
+                "    except FuzzyMatchSuccess as e1:",
+                "        return e1",
+                "    except AnalyseException as e2:",
+                "        e2.context_node = None",
+                "        if not argv.error:",
+                "            argv.error = e2",
+            )
+        done = "argv.current_index == argv.ndata"
+        if analyser.need_main_args:
+            done += " and state.args_result"
+        self.emit(1, f"if {done}:", "    return", "rest = argv.release()", "if len(rest) > 0:")
+        self.emit(
+            2,
+            "return ParamsUnmatched(lang.require('analyser', 'param_unmatched').format(target=argv.next()[0]))",
+        )
+        args = self.const(analyser.self_args, "ARGS")
+        self.emit(
+            1,
+            f"exc = ArgumentMissing({args}.data[0].field.get_missing_tips(lang.require('analyser', 'param_missing')))",
+            "if comp_ctx.get(None):",
+            "    return PauseTriggered(",
+            f"        prompt({command}, argv, [*state.args_result.keys()], [*state.options_result.keys(), *state.subcommands_result.keys()]),",  # noqa: E501
+            "        exc,",
+            "        argv",
+            "    )",
+            "return exc",
+        )
+        self.emit(0, "")
+
+    def build(self) -> str:
+        self.root()
+        source = "\n".join(self.args_lines + self.lines)
+        filename = f"<alconna codegen {self.analyser.command.path}>"
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+        exec(compile(source, filename, "exec"), self.env)  # noqa: S102
+        for table, dispatch in self.dispatch:
+            self.env[table] = {alias: self.env[func] for alias, func in dispatch.items()}
+        for analyser, func in self.nodes:
+            analyser.process = self.env[func]  # type: ignore
+        return source
+
+
+def codegen_compiler(analyser: SubAnalyser):
+    """代码生成编译器, 可作为 `Alconna.compile` 或 `Config.compiler` 的编译方法
+
+    在默认编译的基础上, 为命令生成专用的解析函数, 并替换解析器与各子解析器的 `process` 方法.
+    生成的代码可以通过 `codegen_source` 查看.
+    """
+    default_compiler(analyser)
+    if isinstance(analyser, Analyser):
+        analyser.compiled["codegen"] = _Generator(analyser).build()
+
+
+def codegen_source(analyser: Analyser) -> str | None:
+    """获取解析器由代码生成编译器生成的代码"""
+    return analyser.compiled.get("codegen")
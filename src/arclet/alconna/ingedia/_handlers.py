@@ -8,6 +8,7 @@ from tarina import Empty, lang, safe_eval, split_once
 
 from ..action import Action
 from ..args import Arg, _Args
+from ..args import keyword_pattern as pat
 from ..base import Option, Header, HeadResult, OptionResult
 from ..config import global_config
 from ..exceptions import (
@@ -21,15 +22,15 @@ from ..exceptions import (
 )
 from ..typing import KWBool, _AllParamPattern
 
-from ._util import levenshtein
+from ._util import fuzzy_match
 
 if TYPE_CHECKING:
-    from ._analyser import SubAnalyser
+    from ._analyser import SubAnalyser, SubState
     from ._argv import Argv
 
-pat = re.compile("(?:-*no)?-*(?P<name>.+)")
 _bracket = re.compile(r"{(.+)}")
 _parentheses = re.compile(r"\$?\((.+)\)")
+_QUOTES = frozenset("\"'\\")
 
 
 def _context(argv: Argv, target: Arg[Any], _arg: str):
@@ -74,18 +75,19 @@ def _validate(argv: Argv, target: Arg[Any], value: BasePattern[Any, Any, Any], r
     result[target.name] = res._value  # noqa
 
 
-def step_varpos(argv: Argv, args: _Args, slot: tuple[int | Literal["+", "*", "str"], Arg], result: dict[str, Any]):
-    flag, arg = slot
+def step_varpos(argv: Argv, args: _Args, slot: tuple[int | Literal["+", "*", "str"], Arg, int], result: dict[str, Any]):
+    flag, arg, length = slot
     value = arg.type_
     key = arg.name
-    length = int(flag) if flag.__class__ is int else -1
     default_val = arg.field.default
     _result = []
-    kwonly_seps = "".join([arg.field.kw_sep for arg in args.keyword_only.values()])
+    plan = args.plan
+    kwonly_seps = plan.kwonly_kw_seps
+    varkey_sep = plan.varkey_sep
     count = 0
     while argv.current_index != argv.ndata:
         may_arg, _str = argv.next(arg.field.seps)
-        if not may_arg or (_str and may_arg in argv.stack_params and not argv.stack_params[may_arg].soft_keyword):
+        if not may_arg or (_str and argv.stack_params.hard_keyword(may_arg)):
             argv.rollback(may_arg)
             break
         if _str and may_arg in global_config.remainders:
@@ -93,7 +95,7 @@ def step_varpos(argv: Argv, args: _Args, slot: tuple[int | Literal["+", "*", "st
         if _str and kwonly_seps and split_once(pat.match(may_arg)["name"], kwonly_seps, argv.filter_crlf)[0] in args.keyword_only:  # noqa: E501  # type: ignore
             argv.rollback(may_arg)
             break
-        if _str and args.vars_keyword and args.vars_keyword[0][1].field.kw_sep in may_arg:
+        if _str and varkey_sep and varkey_sep in may_arg:
             argv.rollback(may_arg)
             break
         if (res := value.validate(may_arg)).flag != "valid":
@@ -118,23 +120,21 @@ def step_varpos(argv: Argv, args: _Args, slot: tuple[int | Literal["+", "*", "st
         result[key] = tuple(_result)
 
 
-def step_varkey(argv: Argv, slot: tuple[int | Literal["+", "*", "str"], Arg], result: dict[str, Any]):
-    flag, arg = slot
-    length = int(flag) if flag.__class__ is int else -1
+def step_varkey(argv: Argv, slot: tuple[int | Literal["+", "*", "str"], Arg, int, re.Pattern[str]], result: dict[str, Any]):
+    flag, arg, length, kw_pat = slot
     value = arg.type_
     name = arg.name
     default_val = arg.field.default
-    kw_sep = arg.field.kw_sep
     _result = {}
     count = 0
     while argv.current_index != argv.ndata:
         may_arg, _str = argv.next(arg.field.seps)
-        if not may_arg or (_str and may_arg in argv.stack_params and not argv.stack_params[may_arg].soft_keyword) or not _str:
+        if not may_arg or (_str and argv.stack_params.hard_keyword(may_arg)) or not _str:
             argv.rollback(may_arg)
             break
         if _str and may_arg in global_config.remainders:
             break
-        if not (_kwarg := re.match(rf"^(-*[^{kw_sep}]+){kw_sep}(.*?)$", may_arg)):
+        if not (_kwarg := kw_pat.match(may_arg)):
             argv.rollback(may_arg)
             break
         key = _kwarg[1]
@@ -160,36 +160,32 @@ def step_varkey(argv: Argv, slot: tuple[int | Literal["+", "*", "str"], Arg], re
 
 
 def step_keyword(argv: Argv, args: _Args, result: dict[str, Any]):
-    kwonly_seps = set()
-    for arg in args.keyword_only.values():
-        kwonly_seps.update(arg.field.seps)
-    kwonly_seps1 = "".join({arg.field.kw_sep for arg in args.keyword_only.values()})
+    plan = args.plan
+    kwonly_seps = plan.kwonly_seps
+    kwonly_seps1 = plan.kwonly_kw_seps
     target = len(args.keyword_only)
     count = 0
     while count < target:
-        may_arg, _str = argv.next("".join(kwonly_seps))
+        may_arg, _str = argv.next(kwonly_seps)
         if not may_arg or not _str:
             argv.rollback(may_arg)
             break
         if _str and may_arg in global_config.remainders:
             break
         key, _m_arg = split_once(may_arg, kwonly_seps1, argv.filter_crlf)
-        _key = pat.match(key)["name"]  # type: ignore
-        if _key not in args.keyword_only:
-            _key = key
+        if (_key := plan.keywords.get(key)) is None:
+            _key = pat.match(key)["name"]  # type: ignore
+            if _key not in args.keyword_only:
+                _key = key
         if _key not in args.keyword_only:
             argv.rollback(may_arg)
-            if args.vars_keyword or (
-                _str and may_arg in argv.stack_params
-                and not argv.stack_params[may_arg].soft_keyword
-            ):
+            if args.vars_keyword or (_str and argv.stack_params.hard_keyword(may_arg)):
                 break
             for arg in args.keyword_only.values():
                 if arg.type_.validate(may_arg).flag == "valid":
                     raise InvalidParam(lang.require("args", "key_missing").format(target=may_arg, key=arg.name), arg)
-            for name in args.keyword_only:
-                if levenshtein(_key, name) >= argv.fuzzy_threshold:
-                    raise FuzzyMatchSuccess(lang.require("fuzzy", "matched").format(source=name, target=_key))
+            if name := fuzzy_match(tuple(args.keyword_only), _key, argv.fuzzy_threshold):
+                raise FuzzyMatchSuccess(lang.require("fuzzy", "matched").format(source=name, target=_key))
             raise InvalidParam(lang.require("args", "key_not_found").format(name=_key), args)
         arg = args.keyword_only[_key]
         value = arg.type_
@@ -227,43 +223,49 @@ def analyse_args(argv: Argv, args: _Args) -> dict[str, Any]:
         dict[str, Any]: 解析结果
     """
     result = {}
-    for arg in args.normal:
-        value = arg.type_
-        field = arg.field
+    plan = args.plan
+    for arg, name, value, field, kind in plan.normal:
         may_arg, _str = argv.next(field.seps)
-        if _str and may_arg in argv.stack_params and not argv.stack_params[may_arg].soft_keyword:
+        if _str and argv.stack_params.hard_keyword(may_arg):
             argv.rollback(may_arg)
-            if (de := arg.field.default) is not Empty:
-                result[arg.name] = de
+            if (de := field.default) is not Empty:
+                result[name] = de
             elif not field.optional:
-                raise ArgumentMissing(field.get_missing_tips(lang.require("args", "missing").format(key=arg.name)), arg)
+                raise ArgumentMissing(field.get_missing_tips(lang.require("args", "missing").format(key=name)), arg)
             continue
         if may_arg is None or (_str and not may_arg):
-            if (de := arg.field.default) is not Empty:
-                result[arg.name] = de
+            if (de := field.default) is not Empty:
+                result[name] = de
             elif not field.optional:
-                raise ArgumentMissing(field.get_missing_tips(lang.require("args", "missing").format(key=arg.name)), arg)
+                raise ArgumentMissing(field.get_missing_tips(lang.require("args", "missing").format(key=name)), arg)
             continue
-        if value.alias == "*":
+        if kind == 1:
+            # ANY/STRING 参数无需校验, 与 _validate 的处理相同
+            if not argv.context_style and (_str or value is ANY):
+                result[name] = may_arg
+                continue
+        elif kind == 2:
             if TYPE_CHECKING:
                 assert isinstance(value, _AllParamPattern)
             argv.rollback(may_arg)
             if not value.types:
-                result[arg.name] = argv.converter(argv.release(no_split=True))
+                result[name] = argv.converter(argv.release(no_split=True))
             else:
                 data = [
                     d for d in argv.release(no_split=True)
                     if (res := value.validate(d)).flag == "valid" or (not value.ignore and _raise(arg, d, res))
                 ]
-                result[arg.name] = argv.converter(data)
+                result[name] = argv.converter(data)
             argv.current_index = argv.ndata
             return result
         _validate(argv, arg, value, result, may_arg, _str)
-    for slot in args.vars_positional:
+    if plan.simple:
+        return result
+    for slot in plan.varpos:
         step_varpos(argv, args, slot, result)
     if args.keyword_only:
         step_keyword(argv, args, result)
-    for slot in args.vars_keyword:
+    for slot in plan.varkey:
         step_varkey(argv, slot, result)
     # TODO: let the user decide whether to return the Args model or raw data
     # if args.origin:
@@ -271,7 +273,15 @@ def analyse_args(argv: Argv, args: _Args) -> dict[str, Any]:
     return result
 
 
-def handle_option(argv: Argv, opt: Option, name_validated: bool) -> tuple[str, OptionResult]:
+def _count_option(opt: Option, name: str) -> int:
+    """计数选项的重复次数, 名称不匹配时为 0"""
+    for al in opt.aliases:
+        if name.startswith(al) and (cnt := (len(name.lstrip("-")) / len(al.lstrip("-")))).is_integer():
+            return int(cnt)
+    return 0
+
+
+def handle_option(argv: Argv, opt: Option, name_validated: bool, count: int = 0) -> tuple[str, OptionResult]:
     """
     处理 `Option` 部分
 
@@ -279,8 +289,9 @@ def handle_option(argv: Argv, opt: Option, name_validated: bool) -> tuple[str, O
         argv (Argv): 命令行参数
         opt (Option): 目标 `Option`
         name_validated (bool): 是否已经验证过名称
+        count (int, optional): 已验证名称的计数选项的重复次数
     """
-    _cnt = 0
+    _cnt = count
     error = True
     if not name_validated:
         name, _ = argv.next(opt.separators)
@@ -290,20 +301,16 @@ def handle_option(argv: Argv, opt: Option, name_validated: bool) -> tuple[str, O
                 argv.rollback(mat["rest"], replace=True)
                 error = False
         elif opt.action.type == 2:
-            for al in opt.aliases:
-                if name.startswith(al) and (cnt := (len(name.lstrip("-")) / len(al.lstrip("-")))).is_integer():
-                    _cnt = int(cnt)
-                    error = False
-                    break
+            if _cnt := _count_option(opt, name):
+                error = False
         elif name in opt.aliases:
             error = False
         if error:
             argv.rollback(name)
             if not argv.fuzzy_match:
                 raise InvalidParam(lang.require("option", "name_error").format(source=opt.dest, target=name), opt)
-            for al in opt.aliases:
-                if levenshtein(name, al) >= argv.fuzzy_threshold:
-                    raise FuzzyMatchSuccess(lang.require("fuzzy", "matched").format(source=al, target=name))
+            if name.__class__ is str and (al := fuzzy_match(opt.aliases, name, argv.fuzzy_threshold)):
+                raise FuzzyMatchSuccess(lang.require("fuzzy", "matched").format(source=al, target=name))
             raise InvalidParam(lang.require("option", "name_error").format(source=opt.dest, target=name), opt)
     name = opt.dest
     if opt.nargs:
@@ -332,69 +339,126 @@ def handle_action(param: Option, source: OptionResult, target: OptionResult):
     return source
 
 
-def analyse_option(analyser: SubAnalyser, argv: Argv, opt: Option, name_validated: bool):
+def analyse_option(state: SubState, argv: Argv, opt: Option, name_validated: bool, count: int = 0):
     """
     分析 `Option` 部分
 
     _Args:
-        analyser (SubAnalyser): 当前解析器
+        state (SubState): 当前解析器的解析状态
         argv (Argv): 命令行参数
         opt (Option): 目标 `Option`
         name_validated (bool): 是否已经验证过名称
+        count (int, optional): 已验证名称的计数选项的重复次数
     """
-    opt_n, opt_v = handle_option(argv, opt, name_validated)
-    if opt_n not in analyser.options_result:
-        analyser.options_result[opt_n] = opt_v
+    opt_n, opt_v = handle_option(argv, opt, name_validated, count)
+    if opt_n not in state.options_result:
+        state.options_result[opt_n] = opt_v
         if opt.action.type == 1 and opt_v.args:
             for key in list(opt_v.args.keys()):
                 opt_v.args[key] = [opt_v.args[key]]
     else:
-        analyser.options_result[opt_n] = handle_action(opt, analyser.options_result[opt_n], opt_v)
+        state.options_result[opt_n] = handle_action(opt, state.options_result[opt_n], opt_v)
+
+
+def match_compact_name(argv: Argv, param: Option | SubAnalyser, alias: str) -> int | None:
+    """校验紧凑节点的名称, 匹配时消耗名称, 不匹配时放回; 不使用正则与异常
+
+    _Args:
+        argv (Argv): 命令行参数
+        param (Option | SubAnalyser): 目标节点
+        alias (str): 前缀树中是当前参数前缀的名称
+
+    Returns:
+        int | None: 名称不匹配时为 None, 否则为计数选项的重复次数 (其余节点为 0)
+    """
+    if param.__class__ is Option or param.__class__.__base__ is Option:
+        opt: Option = param  # type: ignore
+        name, _ = argv.next(opt.separators)
+        if opt.compact:
+            if name.startswith(alias):
+                argv.rollback(name[len(alias):], replace=True)
+                return 0
+        elif opt.action.type == 2:
+            if cnt := _count_option(opt, name):
+                return cnt
+        elif name in opt.aliases:
+            return 0
+    else:
+        sub = param.command  # type: ignore
+        name, _ = argv.next(sub.separators)
+        if name in sub.aliases:
+            return 0
+    argv.rollback(name)
+
+
+def _analyse_compact(state: SubState, argv: Argv, param: Option | SubAnalyser, name_validated: bool, count: int = 0):
+    if param.__class__ is Option or param.__class__.__base__ is Option:
+        analyse_option(state, argv, param, name_validated, count)  # type: ignore
+        return
+    sparam: SubAnalyser = param  # type: ignore
+    sub = sparam.new_state()
+    try:
+        sparam.process(argv, name_validated, sub)
+    except (FuzzyMatchSuccess, PauseTriggered):
+        raise
+    except InvalidParam as e:
+        if e.context_node is not sparam.command:
+            state.subcommands_result[sparam.command.dest] = sub.result()
+        raise
+    except AnalyseException:
+        state.subcommands_result[sparam.command.dest] = sub.result()
+        raise
+    else:
+        state.subcommands_result[sparam.command.dest] = sub.result()
 
 
-def analyse_compact_params(analyser: SubAnalyser, argv: Argv):
+def analyse_compact_params(state: SubState, argv: Argv):
     """分析紧凑参数
 
     _Args:
-        analyser (SubAnalyser): 当前解析器
+        state (SubState): 当前解析器的解析状态
         argv (Argv): 命令行参数
     """
     exc = None
-    for param in analyser.compact_params:
-        _data, _index = argv.data_set()
+    analyser = state.analyser
+    params = analyser.compact_params
+    # 只有节点名称长度以内的字符会影响查找的结果
+    text = argv.peek(analyser.compact_trie.width)
+    if argv.fuzzy_match or text.__class__ is not str or not _QUOTES.isdisjoint(text):  # type: ignore
+        # 模糊匹配需要逐个尝试; 引号与转义会改变名称, 无法按前缀查找
+        candidates = dict.fromkeys(range(len(params)), "")
+    else:
+        # 节点的名称必然是当前参数的前缀, 其余节点的名称校验必然失败, 无需尝试
+        candidates = dict.fromkeys(analyser.compact_any, "")
+        for length, indexes in analyser.compact_trie.prefixes(text):  # type: ignore
+            for index in indexes:
+                candidates.setdefault(index, text[:length])  # type: ignore
+    for index in sorted(candidates) if len(candidates) > 1 else candidates:
+        param = params[index]
+        if alias := candidates[index]:
+            # 由前缀树得到的名称可以直接校验, 无需快照与异常
+            if (count := match_compact_name(argv, param, alias)) is None:
+                continue
+            try:
+                _analyse_compact(state, argv, param, True, count)
+                return True
+            except InvalidParam as e:
+                exc = e
+            continue
+        _mark, _index = argv.data_set()
         try:
-            if param.__class__ is Option or param.__class__.__base__ is Option:
-                oparam: Option = param  # type: ignore
-                analyse_option(analyser, argv, oparam, False)
-            else:
-                sparam: SubAnalyser = param  # type: ignore
-                try:
-                    sparam.process(argv, False)
-                except (FuzzyMatchSuccess, PauseTriggered):
-                    sparam.result()
-                    raise
-                except InvalidParam as e:
-                    if e.context_node is sparam.command:
-                        sparam.result()
-                    else:
-                        analyser.subcommands_result[sparam.command.dest] = sparam.result()
-                    raise
-                except AnalyseException:
-                    analyser.subcommands_result[sparam.command.dest] = sparam.result()
-                    raise
-                else:
-                    analyser.subcommands_result[sparam.command.dest] = sparam.result()
-            _data.clear()
+            _analyse_compact(state, argv, param, False)
             return True
         except InvalidParam as e:
-            if e.context_node is not param:
+            # 名称不匹配时, 异常的 context_node 为节点自身
+            is_opt = param.__class__ is Option or param.__class__.__base__ is Option
+            if e.context_node is not (param if is_opt else param.command):  # type: ignore
                 exc = e
             else:
-                argv.data_reset(_data, _index)
-    else:
-        if exc and not argv.error:
-            argv.error = exc
-        return False
+                argv.data_reset(_mark, _index)
+    if exc and not argv.error:
+        argv.error = exc
+    return False
 
 
 def handle_opt_default(defaults: dict[str, tuple[OptionResult, Action]], data: dict[str, OptionResult]):
@@ -407,14 +471,15 @@ def handle_opt_default(defaults: dict[str, tuple[OptionResult, Action]], data: d
             data[k].args.setdefault(key, [value] if v[1].value == 1 else value)
 
 
-def analyse_param(analyser: SubAnalyser, argv: Argv, seps: str | None = None):
+def analyse_param(state: SubState, argv: Argv, seps: str | None = None):
     """处理参数
 
     _Args:
-        analyser (SubAnalyser): 当前解析器
+        state (SubState): 当前解析器的解析状态
         argv (Argv): 命令行参数
         seps (str, optional): 指定的分隔符.
     """
+    analyser = state.analyser
     # 每次调用都会尝试解析一个参数
     _text, _str = argv.next(seps)
     # analyser.compile_params 有命中，说明在当前子命令内有对应的选项/子命令
@@ -424,48 +489,46 @@ def analyse_param(analyser: SubAnalyser, argv: Argv, seps: str | None = None):
             oparam: Option = _param  # type: ignore
             try:
                 # 因为 _text 已经被确定为选项名，所以 name_validated 为 True
-                analyse_option(analyser, argv, oparam, True)
+                analyse_option(state, argv, oparam, True)
             except AnalyseException as e:
                 if not argv.error:
                     argv.error = e
             return True
         sparam: SubAnalyser = _param  # type: ignore
         # 禁止子命令重复解析
-        if sparam.command.dest not in analyser.subcommands_result:
+        if sparam.command.dest not in state.subcommands_result:
+            sub = sparam.new_state()
             try:
-                sparam.process(argv)
+                sparam.process(argv, True, sub)
             except (FuzzyMatchSuccess, PauseTriggered):
-                sparam.result()
                 raise
             except InvalidParam as e:
-                if e.context_node is sparam.command:
-                    sparam.result()
-                else:
-                    analyser.subcommands_result[sparam.command.dest] = sparam.result()
+                if e.context_node is not sparam.command:
+                    state.subcommands_result[sparam.command.dest] = sub.result()
                 if not argv.error:
                     argv.error = e
             except AnalyseException as e1:
-                analyser.subcommands_result[sparam.command.dest] = sparam.result()
+                state.subcommands_result[sparam.command.dest] = sub.result()
                 if not argv.error:
                     argv.error = e1
             else:
-                analyser.subcommands_result[sparam.command.dest] = sparam.result()
+                state.subcommands_result[sparam.command.dest] = sub.result()
             return True
     # 如果没有命中，则说明当前参数可能存在自定义分隔符，或者属于子命令的主参数，那么需要重新解析
     argv.rollback(_text)
     # 尝试以紧凑参数解析
-    if _str and _text and analyser.compact_params and analyse_compact_params(analyser, argv):
+    if _str and _text and analyser.compact_params and analyse_compact_params(state, argv):
         return True
     # 主参数同样只允许解析一次
-    if analyser.command.nargs and not analyser.args_result:
-        analyser.args_result = analyse_args(argv, analyser.self_args)
-        if analyser.args_result:
+    if analyser.command.nargs and not state.args_result:
+        state.args_result = analyse_args(argv, analyser.self_args)
+        if state.args_result:
             return True
     # 若参数属于该子命令的同级/上级选项或子命令，则终止解析
     if _str and _text and _text in argv.stack_params.parents():
         return False
     if analyser.extra_allow:
-        analyser.args_result.setdefault("$extra", []).append(_text)
+        state.args_result.setdefault("$extra", []).append(_text)
         argv.next()
         return True
     # 给 Completion 打的洞，若此时 analyser 属于主命令, 则让其先解析完主命令
@@ -478,22 +541,28 @@ def analyse_param(analyser: SubAnalyser, argv: Argv, seps: str | None = None):
 
 
 def analyse_header(header: "Header", argv: Argv):
-    content = header.content
     head_text, _str = argv.next()
     if _str:
-        if head_text in content:
+        if (end := header.match(head_text)) >= 0:
+            if end < len(head_text):
+                argv.rollback(head_text[end:], replace=True)
+                head_text = head_text[:end]
             return HeadResult(head_text, head_text, True)
-        if header.compact and (mat := header.compact_pattern.match(head_text)):
-            argv.rollback(head_text[len(mat[0]):], replace=True)
-            return HeadResult(mat[0], mat[0], True)
     may_cmd, _m_str = argv.next()
     if _m_str:
-        cmd = f"{head_text}{argv.separators[0]}{may_cmd}"
-        if cmd in content:
-            return HeadResult(cmd, cmd, True)
-        if header.compact and (mat := header.compact_pattern.match(cmd)):
-            argv.rollback(cmd[len(mat[0]):], replace=True)
-            return HeadResult(mat[0], mat[0], True)
+        if not _str and (end := header.match_element(head_text, may_cmd)) >= 0:
+            if end < len(may_cmd):
+                argv.rollback(may_cmd[end:], replace=True)
+            head = (head_text, may_cmd[:end])
+            return HeadResult(head, head, True)
+        # 只有当头部中含有分隔符时, 才可能横跨两个参数
+        if header.charset is None or argv.separators[0] in header.charset:
+            cmd = f"{head_text}{argv.separators[0]}{may_cmd}"
+            if (end := header.match(cmd)) >= 0:
+                if end < len(cmd):
+                    argv.rollback(cmd[end:], replace=True)
+                    cmd = cmd[:end]
+                return HeadResult(cmd, cmd, True)
     # _after_analyse_header
     if _str:
         argv.rollback(may_cmd)
@@ -505,6 +574,33 @@ def analyse_header(header: "Header", argv: Argv):
     raise InvalidHeader(lang.require("header", "error").format(target=head_text), None)
 
 
+def probe_header(header: "Header", argv: Argv, message: Any) -> InvalidHeader | None:
+    """在不构建 `argv` 的情况下, 只依据消息的前两个元素判断命令头是否匹配
+
+    判断方式与 `analyse_header` 一致: 可能匹配时返回 None, 否则返回 `analyse_header` 将会抛出的异常
+    """
+    # 多数命令只需第一个元素即可确认匹配, 此时无需再切分第二个元素
+    if not (tokens := argv.head(message, 1)):
+        # 交由完整的解析抛出 NullMessage
+        return
+    head_text, _str = tokens[0]
+    if _str and (head_text in header.content or header.match(head_text) >= 0):
+        return
+    tokens = argv.head(message)
+    may_cmd, _m_str = tokens[1] if len(tokens) > 1 else ("", True)
+    if _m_str:
+        if not _str and header.match_element(head_text, may_cmd) >= 0:
+            return
+        if (header.charset is None or argv.separators[0] in header.charset) and header.match(f"{head_text}{argv.separators[0]}{may_cmd}") >= 0:
+            return
+    if _str:
+        return InvalidHeader(lang.require("header", "error").format(target=head_text), head_text)
+    if _m_str and may_cmd:
+        cmd = f"{head_text}{argv.separators[0]}{may_cmd}"
+        return InvalidHeader(lang.require("header", "error").format(target=cmd), cmd)
+    return InvalidHeader(lang.require("header", "error").format(target=head_text), None)
+
+
 def handle_head_fuzzy(header: Header, source: str, threshold: float):
     command = header.origin[0]
     if not header.origin[1]:
@@ -518,6 +614,5 @@ def handle_head_fuzzy(header: Header, source: str, threshold: float):
                 headers_text.append(f"{prefix}{command}")
             else:
                 headers_text.append(f"{prefix} {command}")
-    for ht in headers_text:
-        if levenshtein(source, ht) >= threshold:
-            return lang.require("fuzzy", "matched").format(target=source, source=ht)
+    if ht := fuzzy_match(tuple(headers_text), source, threshold):
+        return lang.require("fuzzy", "matched").format(target=source, source=ht)
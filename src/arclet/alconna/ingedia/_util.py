@@ -1,54 +1,201 @@
-from typing import Generic, TypeVar, Optional
+from functools import lru_cache
+from typing import Generic, Hashable, Iterable, TypeVar, Optional
 
 T = TypeVar("T")
 
 
+_SOFT = (None, True)
+
+
+def scope_table(params: "dict[str, T]", parent: "Optional[dict[str, tuple[T, bool]]]" = None) -> "dict[str, tuple[T, bool]]":
+    """展开作用域表: 关键字 -> (节点, 是否为软关键字), 内层的节点优先于上级作用域的同名节点"""
+    table = dict(parent) if parent else {}
+    for key, node in params.items():
+        table[key] = (node, node.soft_keyword)  # type: ignore
+    return table
+
+
 class ChainMap(Generic[T]):
+    """解析时逐层进入的节点表
+
+    每一层都对应一张展开后的作用域表, 成员与上级作用域的检查只需一次字典查找
+    """
+
     def __init__(self, base: Optional[dict[str, T]] = None, *maps: dict[str, T]):
-        self.base: dict[str, T] = base or {}
-        self.stack: "list[dict[str, T]]" = list(maps)
+        self.stack: "list[dict[str, T]]" = []
+        self.scopes: "list[dict[str, tuple[T, bool]]]" = []
+        """上级作用域的作用域表"""
+        self.scope: "dict[str, tuple[T, bool]]" = {}
+        """当前的作用域表"""
+        self.set_base(base or {})
+        for map in reversed(maps):
+            self.enter(map)
+
+    @property
+    def base(self) -> "dict[str, T]":
+        return self._base
+
+    @base.setter
+    def base(self, value: "dict[str, T]"):
+        self.set_base(value)
 
-    def enter(self, map: dict):
+    def set_base(self, base: "dict[str, T]", scope: "Optional[dict[str, tuple[T, bool]]]" = None):
+        """设置最外层的节点表, 以及预先计算的作用域表"""
+        self._base = base
+        self.root = scope_table(base) if scope is None else scope
+        if not self.scopes:
+            self.scope = self.root
+
+    def clear(self):
+        """离开所有进入的节点表"""
+        self.stack.clear()
+        self.scopes.clear()
+        self.scope = self.root
+
+    def enter(self, map: dict, scope: "Optional[dict[str, tuple[T, bool]]]" = None):
+        """进入节点表, 可以传入预先计算的作用域表"""
         self.stack.insert(0, map)
+        self.scopes.append(self.scope)
+        self.scope = scope_table(map, self.scope) if scope is None else scope
 
     def __contains__(self, item: str):
-        return item in self.base or any(item in m for m in self.stack)
+        return item in self.scope
 
     def __getitem__(self, item: str) -> T:
-        for m in self.stack:
-            if item in m:
-                return m[item]
-        if item in self.base:
-            return self.base[item]
-        raise KeyError(item)
-
-    def parents(self):
-        if not self.stack:
-            return ChainMap()
-        return ChainMap(self.base, *self.stack[1:])
+        return self.scope[item][0]
+
+    def hard_keyword(self, item: str) -> bool:
+        """`item` 是否为当前作用域内非软关键字的节点名称"""
+        return not self.scope.get(item, _SOFT)[1]
+
+    def parents(self) -> "dict[str, tuple[T, bool]]":
+        """上级作用域的作用域表"""
+        return self.scopes[-1] if self.scopes else {}
 
     def leave(self):
         self.stack.pop(0)
+        self.scope = self.scopes.pop()
+
+
+def edit_distance(source: str, target: str, limit: Optional[int] = None) -> int:
+    """使用 Myers 位并行算法计算两个字符串的编辑距离
+
+    Args:
+        source (str): 源字符串
+        target (str): 目标字符串
+        limit (int | None, optional): 距离上限, 一旦确定距离超过上限便提前返回 `limit + 1`
+    """
+    if len(source) > len(target):
+        source, target = target, source
+    length = len(source)
+    if limit is not None and len(target) - length > limit:
+        return limit + 1
+    if not length:
+        return len(target)
+    peq: dict[str, int] = {}
+    for i, char in enumerate(source):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    pv, mv, score = full, 0, length
+    remain = len(target)
+    for char in target:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        remain -= 1
+        # 之后每个字符至多使距离减少 1
+        if limit is not None and score - remain > limit:
+            return limit + 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def max_distance(length: int, threshold: float) -> int:
+    """获取长度为 `length` 时, 相似度不低于 `threshold` 所允许的最大编辑距离"""
+    limit = int((1 - threshold) * length)
+    while limit < length and 1 - float(limit + 1) / length >= threshold:
+        limit += 1
+    while limit >= 0 and 1 - float(limit) / length < threshold:
+        limit -= 1
+    return limit
 
 
-def levenshtein(source: str, target: str) -> float:
+def levenshtein(source: str, target: str, threshold: Optional[float] = None) -> float:
     """`编辑距离算法`_, 计算源字符串与目标字符串的相似度, 取值范围[0, 1], 值越大越相似
 
     Args:
         source (str): 源字符串
         target (str): 目标字符串
+        threshold (float | None, optional): 相似度阈值, 一旦确定相似度低于阈值便提前返回 0
 
     .. _编辑距离算法:
         https://en.wikipedia.org/wiki/Levenshtein_distance
 
     """
-    l_s, l_t = len(source), len(target)
-    s_range, t_range = range(l_s + 1), range(l_t + 1)
-    matrix = [[(i if j == 0 else j) for j in t_range] for i in s_range]
+    if source == target:
+        return 1.0
+    length = max(len(source), len(target))
+    if threshold is None:
+        return 1 - float(edit_distance(source, target)) / length
+    limit = max_distance(length, threshold)
+    if limit < 0 or (distance := edit_distance(source, target, limit)) > limit:
+        return 0.0
+    return 1 - float(distance) / length
+
+
+class FuzzyIndex:
+    """模糊匹配的候选索引
+
+    候选词按长度分桶, 查询时跳过长度差已超过距离上限的桶, 其余候选词使用带上限的编辑距离比较
+    """
 
-    for i in s_range[1:]:
-        for j in t_range[1:]:
-            sub_distance = matrix[i - 1][j - 1] + (0 if source[i - 1] == target[j - 1] else 1)
-            matrix[i][j] = min(matrix[i - 1][j] + 1, matrix[i][j - 1] + 1, sub_distance)
+    __slots__ = ("words", "buckets")
 
-    return 1 - float(matrix[l_s][l_t]) / max(l_s, l_t)
+    def __init__(self, words: Iterable[str]):
+        self.words = [word for word in words if isinstance(word, str)]
+        self.buckets: dict[int, list[tuple[int, str]]] = {}
+        for index, word in enumerate(self.words):
+            self.buckets.setdefault(len(word), []).append((index, word))
+
+    def match(self, query: str, threshold: float) -> Optional[str]:
+        """按候选词的原有顺序, 获取第一个与查询词相似度不低于阈值的候选词"""
+        length = len(query)
+        best: Optional[tuple[int, str]] = None
+        for size, words in self.buckets.items():
+            limit = max_distance(max(length, size), threshold) if length or size else 0
+            if abs(length - size) > limit:
+                continue
+            for index, word in words:
+                if best and index > best[0]:
+                    break
+                if word == query or edit_distance(query, word, limit) <= limit:
+                    best = (index, word)
+                    break
+        return best[1] if best else None
+
+
+@lru_cache(4096)
+def fuzzy_index(words: Hashable) -> FuzzyIndex:
+    """获取一组候选词的模糊匹配索引; 同一组候选词只会建立一次索引"""
+    return FuzzyIndex(words)  # type: ignore
+
+
+def fuzzy_match(words: Hashable, query: str, threshold: float) -> Optional[str]:
+    """获取 `words` 中第一个与 `query` 相似度不低于阈值的候选词
+
+    Args:
+        words (frozenset[str] | tuple[str, ...]): 候选词, 需要可哈希以便复用索引
+        query (str): 查询词
+        threshold (float): 相似度阈值
+    """
+    return fuzzy_index(words).match(query, threshold)
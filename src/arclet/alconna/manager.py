@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import re
 import shelve
@@ -18,15 +19,42 @@ from tarina import LRU, lang
 from .arparma import Arparma
 from .base import Header, Metadata
 from .config import Namespace, global_config
+from .dispatch import CommandDispatcher, ProbeStats
 from .exceptions import ExceedMaxCount
+from .record import RecordStats, RecordStore, shallow_copy
 from .typing import TDC, DataCollection
-from .shortcut import InnerShortcutArgs, ShortcutArgs, find_shortcut as _find_shortcut
+from .shortcut import InnerShortcutArgs, ShortcutArgs, ShortcutStore, ShortcutTable, find_shortcut as _find_shortcut
 
 if TYPE_CHECKING:
     from .ingedia._analyser import Analyser
+    from .ingedia._argv import Argv
     from .core import Alconna
 
 
+class CacheStats:
+    """消息缓存的统计信息"""
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        """直接返回缓存结果的次数"""
+        self.misses = 0
+        """未能命中缓存而进行解析的次数"""
+
+    @property
+    def hit_rate(self) -> float:
+        """命中缓存的解析所占的比例"""
+        return self.hits / total if (total := self.hits + self.misses) else 0.0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"CacheStats(hits={self.hits}, misses={self.misses})"
+
+
 class CommandManager:
     """
     `Alconna` 命令管理器
@@ -42,39 +70,132 @@ class CommandManager:
         return global_config.command_max_count
 
     __analysers: dict[int, Analyser]
-    __abandons: list[int]
-    __record: LRU[int, Arparma]
-    _shortcuts: dict[str, tuple[dict[str, InnerShortcutArgs], dict[str, InnerShortcutArgs]]]
+    __abandons: set[int]
+    __namespaces: dict[str, dict[int, None]]
+    __names: dict[str, dict[str, dict[int, None]]]
+    __record: RecordStore
+    _shortcuts: dict[str, tuple[dict[str, InnerShortcutArgs], ShortcutTable]]
 
     def __init__(self):
         self.sign = "ALCONNA::"
         self.current_count = 0
 
         self.__analysers = {}
-        self.__abandons = []
+        self.__abandons = set()
+        self.__namespaces = {}
+        self.__names = {}
         self._shortcuts = {}
-        self.__record = LRU(128)
+        self._shortcut_store: ShortcutStore | None = None
+        self._shortcut_pending: set[str] = set()
+        """已持久化但尚未加载的快捷指令所属的命令路径"""
+        self._dispatcher = CommandDispatcher()
+        self.__record = RecordStore(128)
+        """命令管理器共享的解析结果记录"""
+        self.__recent = weakref.ref(self.__record)
+        """最近一次写入或命中的记录, 可能是共享的记录, 也可能是某个命令独立的记录"""
 
         def _del():
             for ana in self.__analysers.values():
                 ana._clr()
             self.__analysers.clear()
             self.__abandons.clear()
-            for arp in self.__record.values():
+            self.__namespaces.clear()
+            self.__names.clear()
+            for arp in self.__record.results.values():
                 arp._clr()
             self.__record.clear()
             self._shortcuts.clear()
+            self._shortcut_pending.clear()
+            if self._shortcut_store:
+                self._shortcut_store.close()
+            self._dispatcher.clear()
 
         weakref.finalize(self, _del)
 
+    def use_shortcut_store(self, file: str | Path | None = None, compact_interval: int = 1024) -> ShortcutStore:
+        """使用 SQLite 持久化快捷指令
+
+        此后增删快捷指令时只会写入发生变化的条目; 已持久化的快捷指令会在对应命令首次查找快捷指令时加载.
+        当前内存中的快捷指令会被写入存储中.
+
+        Args:
+            file (str | Path | None, optional): 数据库文件路径, 默认为当前目录下的 `shortcuts.sqlite3`
+            compact_interval (int, optional): 每写入多少次后在后台整理一次数据库, 为 0 时不自动整理
+        """
+        self.close_shortcut_store()
+        store = self._shortcut_store = ShortcutStore(file or (Path.cwd() / "shortcuts.sqlite3"), compact_interval)
+        for cmd, shorts in self._shortcuts.items():
+            store.set(cmd, self._shortcut_entries(shorts))
+        for cmd in store.commands():
+            if cmd in self._shortcuts:
+                self._load_stored_shortcuts(cmd)
+            else:
+                self._shortcut_pending.add(cmd)
+                self._dispatcher.defer_shortcuts(cmd)
+                self._clear_failures(cmd)
+        return store
+
+    def close_shortcut_store(self) -> None:
+        """加载尚未加载的快捷指令, 并关闭快捷指令存储"""
+        if not (store := self._shortcut_store):
+            return
+        for cmd in list(self._shortcut_pending):
+            self._shortcut_tables(cmd)
+        self._shortcut_store = None
+        store.close()
+
+    @staticmethod
+    def _shortcut_entries(shorts: tuple[dict[str, InnerShortcutArgs], ShortcutTable]):
+        for kind, table in enumerate(shorts):
+            for key, short in table.items():
+                if isinstance(short, InnerShortcutArgs):
+                    yield kind, key, short
+
+    def _load_stored_shortcuts(self, cmd: str):
+        self._shortcut_pending.discard(cmd)
+        _data = self._shortcuts.setdefault(cmd, ({}, ShortcutTable()))
+        for kind, key, short in self._shortcut_store.load(cmd):  # type: ignore
+            _data[kind].setdefault(key, short)
+        self._set_shortcuts(cmd, _data[1])
+        namespace, name = self._command_part(cmd)
+        for cmd_hash in self.__names.get(namespace, {}).get(name, ()):
+            command = self.__analysers[cmd_hash].command
+            # 命令注册时格式化器会主动获取快捷指令, 此时无需更新
+            if command.path == cmd and cmd_hash in command.formatter.data:
+                command.formatter.update_shortcut(command)
+
+    def _clear_failures(self, cmd: str):
+        """清除命令路径下所有命令缓存的解析失败结果"""
+        namespace, name = self._command_part(cmd)
+        for cmd_hash in self.__names.get(namespace, {}).get(name, ()):
+            if (failures := (analyser := self.__analysers[cmd_hash]).failures) is not None:
+                with analyser.cache_lock:
+                    failures.clear()
+
+    def _set_shortcuts(self, cmd: str, table: ShortcutTable | None):
+        """快捷指令变化后, 更新其索引; 此前解析失败的消息可能会因此匹配, 因此需要清除失败结果的缓存"""
+        self._dispatcher.set_shortcuts(cmd, table)
+        self._clear_failures(cmd)
+
+    def _shortcut_tables(self, cmd: str, create: bool = False):
+        """获取命令路径对应的快捷指令表, 按需加载已持久化的快捷指令"""
+        if cmd in self._shortcut_pending:
+            self._load_stored_shortcuts(cmd)
+        if create:
+            return self._shortcuts.setdefault(cmd, ({}, ShortcutTable()))
+        return self._shortcuts.get(cmd)
+
     def load_shortcuts(self, file: str | Path | None = None) -> None:
-        """加载缓存"""
+        """从 `shelve` 文件中加载快捷指令
+
+        若已调用 `use_shortcut_store`, 加载的快捷指令会同时写入存储中, 可借此迁移旧的快捷指令文件
+        """
         path = Path(file or (Path.cwd() / "shortcut.db"))
         with contextlib.suppress(FileNotFoundError, KeyError):
             with shelve.open(path.resolve().as_posix()) as db:
                 data: dict[str, tuple[dict, dict]] = dict(db["shortcuts"])  # type: ignore
             for cmd, shorts in data.items():
-                _data = self._shortcuts.setdefault(cmd, ({}, {}))
+                _data = self._shortcut_tables(cmd, create=True)
                 for key, short in shorts[0].items():
                     if isinstance(short, dict):
                         _data[0][key] = InnerShortcutArgs.load(short)
@@ -85,11 +206,22 @@ class CommandManager:
                         _data[1][key] = InnerShortcutArgs.load(short)
                     else:
                         _data[1][key] = short
+                self._set_shortcuts(cmd, _data[1])
+                if self._shortcut_store:
+                    self._shortcut_store.set(cmd, self._shortcut_entries(_data))
 
     load_cache = load_shortcuts
 
     def dump_shortcuts(self, file: str | Path | None = None) -> None:
-        """保存缓存"""
+        """将所有快捷指令保存至 `shelve` 文件中
+
+        若已调用 `use_shortcut_store`, 快捷指令在增删时即已写入存储, 此时不传入 `file` 只会整理存储
+        """
+        if self._shortcut_store:
+            if not file:
+                return self._shortcut_store.compact()
+            for cmd in list(self._shortcut_pending):
+                self._shortcut_tables(cmd)
         data = {}
         for cmd, shorts in self._shortcuts.items():
             _data = data.setdefault(cmd, ({}, {}))
@@ -123,8 +255,47 @@ class CommandManager:
         if self.current_count >= self.max_count:
             raise ExceedMaxCount
         cmd_hash = command._hash
-        self.__analysers.pop(cmd_hash, None)
-        self.__analysers[cmd_hash] = command.compile()
+        if cmd_hash in self.__analysers:
+            self._unindex_name(cmd_hash)
+            del self.__analysers[cmd_hash]
+        self.__analysers[cmd_hash] = analyser = command.compile()
+        self._index_name(command)
+        self._reindex(command, analyser)
+
+    def _index_name(self, command: Alconna) -> None:
+        """记录命令的命名空间与名称"""
+        cmd_hash = command._hash
+        self.__namespaces.setdefault(command.namespace, {})[cmd_hash] = None
+        names = self.__names.setdefault(command.namespace, {})
+        names.setdefault(command.name, {})[cmd_hash] = None
+        if command.command.__class__ is str:
+            names.setdefault(command.command, {})[cmd_hash] = None
+
+    def _unindex_name(self, cmd_hash: int) -> None:
+        """移除命令的命名空间与名称记录"""
+        command = self.__analysers[cmd_hash].command
+        namespace = command.namespace
+        if (hashes := self.__namespaces.get(namespace)) is not None:
+            hashes.pop(cmd_hash, None)
+            if not hashes:
+                del self.__namespaces[namespace]
+        if (names := self.__names.get(namespace)) is None:
+            return
+        for name in (command.name, command.command):
+            if name.__class__ is str and (hashes := names.get(name)) is not None:
+                hashes.pop(cmd_hash, None)
+                if not hashes:
+                    del names[name]
+        if not names:
+            del self.__names[namespace]
+
+    def _reindex(self, command: Alconna, analyser: Analyser | None = None) -> None:
+        """更新命令在分发器中的索引"""
+        self._dispatcher.add(command, (analyser or self.require(command)).argv)
+        if command.path in self._shortcut_pending:
+            self._dispatcher.defer_shortcuts(command.path)
+        elif command.path in self._shortcuts:
+            self._dispatcher.set_shortcuts(command.path, self._shortcuts[command.path][1])
 
     def _resolve(self, cmd_hash: int) -> Alconna:
         return self.__analysers[cmd_hash].command
@@ -143,7 +314,11 @@ class CommandManager:
         cmd_hash = command._hash
         try:
             command.formatter.remove(command)
+            self._unindex_name(cmd_hash)
             del self.__analysers[cmd_hash]
+            self._dispatcher.remove(command)
+            self.__abandons.discard(cmd_hash)
+            self.clear_result(command)
             self.current_count -= 1
         except KeyError:
             pass
@@ -156,7 +331,11 @@ class CommandManager:
             raise ValueError(lang.require("manager", "undefined_command").format(target=command.path))
         self.clear_result(command)
         command.formatter.remove(command)
+        self._unindex_name(cmd_hash)
         del self.__analysers[cmd_hash]
+        self._dispatcher.remove(command)
+        disabled = cmd_hash in self.__abandons
+        self.__abandons.discard(cmd_hash)
         yield
         command._header = Header.generate(command.command, command.prefixes, bool(command.config.compact))
         name = next(iter(command._header.content), command.command or command.prefixes[0])
@@ -164,7 +343,11 @@ class CommandManager:
         command.dest = command.name = name
         command.aliases = frozenset(command._header.content)
         cmd_hash = command._hash = command._calc_hash()
-        self.__analysers[cmd_hash] = command.compile()
+        self.__analysers[cmd_hash] = analyser = command.compile()
+        self._index_name(command)
+        self._reindex(command, analyser)
+        if disabled:
+            self.__abandons.add(cmd_hash)
         command.formatter.add(command)
 
     def is_disable(self, command: Alconna) -> bool:
@@ -175,10 +358,10 @@ class CommandManager:
         """设置命令是否被禁用"""
         if isinstance(command, str):
             command = self.get_command(command)
-        if enabled and command._hash in self.__abandons:
-            self.__abandons.remove(command._hash)
-        if not enabled and command not in self.__abandons:
-            self.__abandons.append(command._hash)
+        if enabled:
+            self.__abandons.discard(command._hash)
+        else:
+            self.__abandons.add(command._hash)
 
     def add_shortcut(self, target: Alconna, key: str | TPattern, source: ShortcutArgs):
         """添加快捷命令
@@ -190,7 +373,7 @@ class CommandManager:
         """
         namespace, name = self._command_part(target.path)
         argv = self.require(target).argv
-        _shortcut = self._shortcuts.setdefault(f"{namespace}::{name}", ({}, {}))
+        _shortcut = self._shortcut_tables(f"{namespace}::{name}", create=True)
         if isinstance(key, str):
             _key = key
             _flags = 0
@@ -198,26 +381,37 @@ class CommandManager:
             _key = key.pattern
             _flags = key.flags
         humanize = source.pop("humanized", None)
-        if source.get("prefix", False) and target.prefixes:
+        # 元素前缀无法作为快捷指令的触发词
+        prefixes = [prefix for prefix in target.prefixes if isinstance(prefix, str)]
+        if source.get("prefix", False) and prefixes:
             out = []
-            for prefix in target.prefixes:
-                _shortcut[1][f"{re.escape(prefix)}{_key}"] = InnerShortcutArgs(
+            entries = []
+            for prefix in prefixes:
+                _shortcut[1][f"{re.escape(prefix)}{_key}"] = short = InnerShortcutArgs(
                     **{**source, "command": argv.converter(prefix + source.get("command", str(target.command)))},
                     flags=_flags,
                 )
+                entries.append((1, f"{re.escape(prefix)}{_key}", short))
                 out.append(
                     lang.require("shortcut", "add_success").format(shortcut=f"{prefix}{_key}", target=target.path)
                 )
-            _shortcut[0][humanize or _key] = InnerShortcutArgs(
-                **{**source, "command": argv.converter(source.get("command", str(target.command))), "prefixes": target.prefixes},
+            _shortcut[0][humanize or _key] = short = InnerShortcutArgs(
+                **{**source, "command": argv.converter(source.get("command", str(target.command))), "prefixes": prefixes},
                 flags=_flags,
             )
+            entries.append((0, humanize or _key, short))
+            if self._shortcut_store:
+                self._shortcut_store.set(f"{namespace}::{name}", entries)
+            self._set_shortcuts(f"{namespace}::{name}", _shortcut[1])
             target.formatter.update_shortcut(target)
             return "\n".join(out)
-        _shortcut[0][humanize or _key] = _shortcut[1][_key] = InnerShortcutArgs(
+        _shortcut[0][humanize or _key] = _shortcut[1][_key] = short = InnerShortcutArgs(
             **{**source, "command": argv.converter(source.get("command", str(target.command)))},
             flags=_flags,
         )
+        if self._shortcut_store:
+            self._shortcut_store.set(f"{namespace}::{name}", [(0, humanize or _key, short), (1, _key, short)])
+        self._set_shortcuts(f"{namespace}::{name}", _shortcut[1])
         target.formatter.update_shortcut(target)
         return lang.require("shortcut", "add_success").format(shortcut=_key, target=target.path)
 
@@ -234,7 +428,7 @@ class CommandManager:
         cmd_hash = target._hash
         if cmd_hash not in self.__analysers:
             raise ValueError(lang.require("manager", "undefined_command").format(target=f"{namespace}.{name}"))
-        shortcuts = self._shortcuts.get(f"{namespace}::{name}", {})
+        shortcuts = self._shortcut_tables(f"{namespace}::{name}")
         if not shortcuts:
             return {}
         return shortcuts[0]
@@ -252,7 +446,7 @@ class CommandManager:
             tuple[str, list, InnerShortcutArgs, re.Match[str]]: 返回匹配的快捷命令
         """
         namespace, name = self._command_part(target.path)
-        if not (_shortcut := self._shortcuts.get(f"{namespace}::{name}")):
+        if not (_shortcut := self._shortcut_tables(f"{namespace}::{name}")):
             raise ValueError(lang.require("manager", "undefined_command").format(target=f"{namespace}.{name}"))
         if res := _find_shortcut(_shortcut[1], data.copy(), target.separators):
             return res
@@ -263,28 +457,33 @@ class CommandManager:
     def delete_shortcut(self, target: Alconna, key: str | TPattern | None = None):
         """删除快捷命令"""
         namespace, name = self._command_part(target.path)
-        if not (_shortcut := self._shortcuts.get(f"{namespace}::{name}")):
+        if not (_shortcut := self._shortcut_tables(f"{namespace}::{name}")):
             raise ValueError(lang.require("manager", "undefined_command").format(target=f"{namespace}.{name}"))
         if key:
             _key = key if isinstance(key, str) else key.pattern
             try:
                 _shortcut[0].pop(_key, None)
                 del _shortcut[1][_key]
+                if self._shortcut_store:
+                    self._shortcut_store.delete(f"{namespace}::{name}", [(0, _key), (1, _key)])
+                self._set_shortcuts(f"{namespace}::{name}", _shortcut[1])
                 return lang.require("shortcut", "delete_success").format(shortcut=_key, target=target.path)
             except KeyError as e:
                 raise ValueError(
                     lang.require("manager", "shortcut_parse_error").format(target=f"{namespace}.{name}", query=_key)
                 ) from e
         else:
-            self._shortcuts.pop(f"{namespace}.{name}")
+            self._shortcuts.pop(f"{namespace}::{name}")
+            if self._shortcut_store:
+                self._shortcut_store.delete_command(f"{namespace}::{name}")
+            self._set_shortcuts(f"{namespace}::{name}", None)
             return lang.require("shortcut", "delete_success").format(shortcut="all", target=target.path)
 
     def get_command(self, command: str) -> Alconna:
         """获取命令"""
-        for ana in self.__analysers.values():
-            namespace, name = self._command_part(command)
-            if ana.command.namespace == namespace and (ana.command.command == name or ana.command.name == name):
-                return ana.command
+        namespace, name = self._command_part(command)
+        if hashes := self.__names.get(namespace, {}).get(name):
+            return self.__analysers[next(iter(hashes))].command
         raise ValueError(lang.require("manager", "undefined_command").format(target=command))
 
     def get_commands(self, namespace: str | Namespace = "") -> list[Alconna]:
@@ -293,22 +492,70 @@ class CommandManager:
             return [ana.command for ana in self.__analysers.values()]
         if isinstance(namespace, Namespace):
             namespace = namespace.name
-        return [ana.command for ana in self.__analysers.values() if ana.command.namespace == namespace]
+        return [self.__analysers[cmd_hash].command for cmd_hash in self.__namespaces.get(namespace, ())]
+
+    def dispatch(self, message: TDC, namespace: str | Namespace = "") -> list[Alconna]:
+        """获取当前空间内可能匹配该命令的所有命令, 按注册顺序排列
+
+        只依据命令头部、紧凑前缀与快捷指令的触发词进行筛选, 不会进行完整的解析
+        """
+        if isinstance(namespace, Namespace):
+            namespace = namespace.name
+        return [self.__analysers[cmd_hash].command for cmd_hash in self._dispatcher.dispatch(message, namespace)]
+
+    @property
+    def probe_stats(self) -> ProbeStats:
+        """分发时头部探测的统计信息; 未命中的消息不会交给任何命令解析"""
+        return self._dispatcher.stats
+
+    def may_shortcut(self, command: Alconna, trigger: str) -> bool:
+        """判断目标命令是否可能存在由 `trigger` 触发的快捷指令, 不会加载尚未加载的快捷指令"""
+        return self._dispatcher.may_shortcut(command.path, trigger)
 
     def test(self, message: TDC, namespace: str | Namespace = "") -> Arparma[TDC] | None:
         """将一段命令给当前空间内的所有命令测试匹配"""
-        for cmd in self.get_commands(namespace):
+        for cmd in self.dispatch(message, namespace):
             if (res := cmd.parse(message)) and res.matched:
                 return res
 
+    def matches(self, message: TDC, namespace: str | Namespace = "") -> dict[str, str]:
+        """将一段命令给当前空间内的所有命令测试匹配, 但不构建解析结果
+
+        Returns:
+            dict[str, str]: 匹配的命令的路径, 以及其进入的最深一层子命令的路径
+        """
+        data = {}
+        for cmd in self.dispatch(message, namespace):
+            matched, endpoint = cmd.matches(message)
+            if matched:
+                data[cmd.path] = endpoint
+        return data
+
     def broadcast(self, message: TDC, namespace: str | Namespace = "") -> WeakValueDictionary[str, Arparma[TDC]]:
         """将一段命令给当前空间内的所有命令测试匹配"""
         data = WeakValueDictionary()
-        for cmd in self.get_commands(namespace):
+        for cmd in self.dispatch(message, namespace):
             if (res := cmd.parse(message)) and res.matched:
                 data[cmd.path] = res
         return data
 
+    async def abroadcast(
+        self, message: TDC, namespace: str | Namespace = "", concurrency: int | None = None
+    ) -> dict[str, Arparma[TDC]]:
+        """将一段命令给当前空间内的所有命令测试匹配, 并且并发地执行匹配命令的执行器
+
+        与 `broadcast` 不同, 返回的解析结果不会因为被挤出消息缓存而失效
+
+        Args:
+            message (TDC): 命令消息
+            namespace (str | Namespace, optional): 指定的命名空间
+            concurrency (int, optional): 同时执行的执行器的最大数量, 默认为 `global_config.executor_concurrency`
+        """
+        semaphore = asyncio.Semaphore(concurrency or global_config.executor_concurrency)
+        cmds = self.dispatch(message, namespace)
+        results = await asyncio.gather(*(cmd._aparse(message, None, semaphore) for cmd in cmds))
+        return {cmd.path: res for cmd, res in zip(cmds, results) if res and res.matched}
+
     def all_command_help(
         self,
         show_index: bool = False,
@@ -370,56 +617,100 @@ class CommandManager:
         if cmd := self.get_command(command):
             return cmd.get_help()
 
+    def _record_store(self, cmd_hash: int) -> RecordStore:
+        """命令所使用的解析结果记录, 未配置独立记录的命令使用共享的记录"""
+        if (analyser := self.__analysers.get(cmd_hash)) is not None and analyser.records is not None:
+            return analyser.records
+        return self.__record
+
     def record(self, token: int, result: Arparma):
         """记录某个命令的 `token`"""
-        self.__record[token] = result
+        if (analyser := self.__analysers.get(result._id)) is None:
+            self.__recent = weakref.ref(self.__record)
+            return self.__record.add(token, result)
+        store = self.__record if analyser.records is None else analyser.records
+        self.__recent = weakref.ref(store)
+        store.add(token, result, bool(analyser.command.config.record_compact))
 
     def get_record(self, token: int) -> Arparma | None:
-        """获取某个 `token` 对应的 `Arparma` 对象"""
-        if token in self.__record:
-            return self.__record[token]
+        """获取共享记录中某个 `token` 对应的 `Arparma` 对象"""
+        return self.__record.get(token)
+
+    def replay(self, command: Alconna, argv: Argv) -> Arparma | None:
+        """获取命令对当前消息的解析记录
+
+        紧凑记录不保存原始消息与上下文, 此时由当前的命令行参数补全
+        """
+        # 不同命令可能解析出相同的 token, 因此需要确认记录属于当前命令
+        store = self._record_store(command._hash)
+        if (res := store.get(argv.token)) is None or res._id != command._hash:
+            return None
+        self.__recent = weakref.ref(store)
+        if command.config.record_compact:
+            res = shallow_copy(res)
+            res.origin = argv.origin
+            res.context = argv.exit()
+        return res
 
     def get_token(self, result: Arparma) -> int:
         """获取某个命令的 `token`"""
-        return next((token for token, res in self.__record.items() if res == result), 0)
+        return self._record_store(result._id).token_of(result)
 
     def get_result(self, command: Alconna) -> list[Arparma[Any]]:
         """获取某个命令的所有 `Arparma` 对象"""
-        return [v for v in self.__record.values() if v._id == command._hash]
+        return self._record_store(command._hash).results_of(command._hash)
 
     def clear_result(self, command: Alconna):
         """清除某个命令下的所有解析缓存"""
-        tokens = list(self.__record.keys())
-        for token in tokens:
-            if self.__record[token]._id == command._hash:
-                del self.__record[token]
+        if (analyser := self.__analysers.get(command._hash)) and analyser.failures is not None:
+            with analyser.cache_lock:
+                analyser.failures.clear()
+        self._record_store(command._hash).discard(command._hash)
+
+    def record_stats(self, command: Alconna | None = None) -> RecordStats:
+        """获取解析结果记录的淘汰统计
+
+        Args:
+            command (Alconna | None, optional): 目标命令, 为 None 时获取共享记录的统计
+        """
+        return self.__record.stats if command is None else self._record_store(command._hash).stats
+
+    def _recent_record(self) -> Arparma | None:
+        if (store := self.__recent()) is None:
+            store = self.__record
+        return store.recent()
 
     @property
     def recent_message(self) -> DataCollection[str | Any] | None:
-        """获取最近一次使用的命令"""
-        if rct := self.__record.peek_first_item():
-            return rct[1].origin  # type: ignore
+        """获取最近一次使用的命令, 包括使用独立记录的命令; 紧凑记录不保存原始消息"""
+        if rct := self._recent_record():
+            return rct.origin
 
     @property
     def last_using(self):
-        """获取最近一次使用的 `Alconna` 对象"""
-        if rct := self.__record.peek_first_item():
-            return rct[1].source  # type: ignore
+        """获取最近一次使用的 `Alconna` 对象, 包括使用独立记录的命令"""
+        if rct := self._recent_record():
+            return rct.source
 
     @property
     def records(self) -> LRU[int, Arparma[Any]]:
-        """获取当前记录"""
-        return self.__record
+        """获取当前共享的记录; 使用独立记录的命令的记录需通过 `get_result` 获取"""
+        return self.__record.results
 
     def reuse(self, index: int = -1):
-        """获取当前记录中的某个值"""
-        key = self.__record.keys()[index]
-        return self.__record[key]
+        """获取当前共享记录中的某个值, 不包括使用独立记录的命令"""
+        with self.__record.lock:
+            key = self.__record.results.keys()[index]
+            return self.__record.results[key]
 
     def set_record_size(self, size: int):
-        """设置记录的最大长度"""
+        """设置共享记录的最大长度"""
         self.__record.set_size(size)
 
+    def set_record_budget(self, budget: int):
+        """设置共享记录的近似字节预算, 0 为不限制"""
+        self.__record.set_budget(budget)
+
     def __repr__(self):
         return (
             f"Current: {hex(id(self))} in {datetime.now().strftime('%Y/%m/%d %H:%M:%S')}\n"
@@ -428,7 +719,7 @@ class CommandManager:
             + "\nShortcuts:\n"
             + "\n".join([f" {k} => {v}" for short in self._shortcuts.values() for k, v in short[0].items()])
             + "\nRecords:\n"
-            + "\n".join([f" [{k}]: {v[1].origin}" for k, v in enumerate(self.__record.items()[:20])])
+            + "\n".join([f" [{k}]: {v[1].origin}" for k, v in enumerate(self.__record.results.items()[:20])])
             + "\nDisabled Commands:\n"
             + f"[{', '.join(map(lambda x: self.__analysers[x].command.path, self.__abandons))}]"
         )
@@ -0,0 +1,308 @@
+"""Alconna 解析结果记录相关"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+from nepattern import BasePattern
+from tarina import LRU
+
+from .args import Arg, _Args
+from .base import CommandNode, Header
+
+if TYPE_CHECKING:
+    from .arparma import Arparma
+
+BUDGETED_STORE_SIZE = 4096
+"""设置了字节预算的独立记录的最大数量; 这类记录主要由字节预算限制, 数量上限只是兜底"""
+MAX_DEPTH = 4
+"""估算大小时向下展开的最大层数, 更深的对象只计入其自身的大小"""
+
+_ATOMIC = frozenset({str, bytes, bytearray, int, float, bool, type(None), type})
+_SEQUENCE = frozenset({list, tuple, set, frozenset})
+_ATOMIC_TYPES = tuple(_ATOMIC)
+_SEQUENCE_TYPES = tuple(_SEQUENCE)
+_SLOTS: dict[type, tuple[str, ...]] = {}
+_SIZERS: dict[type, Callable[[Any], int]] = {}
+_SIZER_CACHE: dict[type, Callable[[Any], int] | None] = {}
+
+
+def _slots_of(cls: type) -> tuple[str, ...]:
+    if (slots := _SLOTS.get(cls)) is None:
+        names = (getattr(c, "__slots__", ()) for c in cls.__mro__)
+        slots = _SLOTS[cls] = tuple(n for ns in names for n in ((ns,) if isinstance(ns, str) else ns))
+    return slots
+
+
+def _sizer_of(cls: type) -> Callable[[Any], int] | None:
+    try:
+        return _SIZER_CACHE[cls]
+    except KeyError:
+        sizer = _SIZER_CACHE[cls] = next((_SIZERS[c] for c in cls.__mro__ if c in _SIZERS), None)
+        return sizer
+
+
+def shared(obj: Any) -> int:
+    """由命令共享的对象不计入记录的大小"""
+    return 0
+
+
+def register_size(cls: type, func: Callable[[Any], int]):
+    """注册某类对象 (包括其子类) 的大小估算方法
+
+    该类对象的大小由 `func` 给出, 不再向下展开; 由命令共享、不随记录释放的对象可以注册为 `shared`
+
+    Args:
+        cls (type): 目标类型
+        func (Callable[[Any], int]): 估算方法, 返回近似的字节数
+    """
+    _SIZERS[cls] = func
+    _SIZER_CACHE.clear()
+
+
+def _children(obj: Any, cls: type) -> Iterable[Any]:
+    if isinstance(obj, dict):
+        return (*obj.keys(), *obj.values())
+    if isinstance(obj, _SEQUENCE_TYPES):
+        return obj
+    if isinstance(obj, _ATOMIC_TYPES):
+        return ()
+    if (attrs := getattr(obj, "__dict__", None)) is not None:
+        return attrs.values()
+    return [getattr(obj, name) for name in _slots_of(cls) if hasattr(obj, name)]
+
+
+def estimate_size(obj: Any, seen: set[int] | None = None, depth: int = MAX_DEPTH) -> int:
+    """估算对象占用的字节数
+
+    会向下展开容器与对象的属性, 至多展开 `depth` 层, 更深的对象只计入其自身的大小; 同一对象只计算一次.
+    可调用对象与注册为 `shared` 的对象不计入
+
+    Args:
+        obj (Any): 目标对象
+        seen (set[int] | None, optional): 已计算过的对象的 id
+        depth (int, optional): 向下展开的最大层数
+    """
+    return _estimate([obj], set() if seen is None else seen, depth)
+
+
+def _estimate(objs: list[Any], seen: set[int], depth: int) -> int:
+    # 逐层展开, 对象总是在最浅的一层被计算
+    getsizeof = sys.getsizeof
+    size = 0
+    level = 0
+    while objs:
+        expand = level < depth
+        children = []
+        for obj in objs:
+            if (key := id(obj)) in seen:
+                continue
+            seen.add(key)
+            cls = type(obj)
+            if cls in _ATOMIC:
+                size += getsizeof(obj)
+            elif cls is dict:
+                size += getsizeof(obj)
+                if expand:
+                    children.extend(obj.keys())
+                    children.extend(obj.values())
+            elif cls in _SEQUENCE:
+                size += getsizeof(obj)
+                if expand:
+                    children.extend(obj)
+            elif (sizer := _sizer_of(cls)) is not None:
+                size += sizer(obj)
+            elif not callable(obj):
+                size += getsizeof(obj)
+                if expand:
+                    children.extend(_children(obj, cls))
+        objs = children
+        level += 1
+    return size
+
+
+_UNOWNED = frozenset({"origin", "context", "_error_source"})
+
+
+def size_of_result(result: Arparma) -> int:
+    """估算解析结果占用的字节数
+
+    只计入记录自身持有的数据; 原始消息与上下文由调用方持有, 不计入. 解析参数中的元素仍会计入
+    """
+    owned = [value for name, value in result.__dict__.items() if name not in _UNOWNED]
+    return sys.getsizeof(result) + _estimate(owned, set(), MAX_DEPTH)
+
+
+for _cls in (CommandNode, Header, _Args, Arg, BasePattern):
+    register_size(_cls, shared)
+
+
+def shallow_copy(result: Arparma) -> Arparma:
+    """不经过 `__getstate__` 地浅复制解析结果, 惰性的解析结果在复制后仍保持未构建"""
+    new = result.__class__.__new__(result.__class__)
+    new.__dict__.update(result.__dict__)
+    return new
+
+
+class RecordStats:
+    """解析结果记录的淘汰统计"""
+
+    __slots__ = ("evictions", "evicted_bytes", "rejected")
+
+    def __init__(self):
+        self.evictions = 0
+        """因数量或字节预算而被淘汰的记录数"""
+        self.evicted_bytes = 0
+        """被淘汰的记录的近似字节数, 仅在设置了字节预算时统计"""
+        self.rejected = 0
+        """单条即超出字节预算而未被记录的结果数"""
+
+    def reset(self):
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejected = 0
+
+    def __repr__(self):
+        return f"RecordStats(evictions={self.evictions}, evicted_bytes={self.evicted_bytes}, rejected={self.rejected})"
+
+
+class RecordStore:
+    """以 token 为键的解析结果记录
+
+    记录按最近使用的顺序淘汰, 其大小受记录数量与近似的字节预算共同限制; 读写均由锁保护, 可在多个线程中共享
+    """
+
+    def __init__(self, size: int = 128, budget: int = 0):
+        """初始化记录
+
+        Args:
+            size (int, optional): 记录的最大数量
+            budget (int, optional): 记录的近似字节预算, 0 为不限制
+        """
+        self.results: LRU[int, Arparma] = LRU(size)
+        self.budget = budget
+        self.nbytes = 0
+        """当前记录的近似字节数, 仅在设置了字节预算时统计"""
+        self.sizes: dict[int, int] = {}
+        self.tokens: dict[int, dict[int, Arparma]] = {}
+        """命令 -> token -> 解析结果, 与 LRU 的顺序保持一致"""
+        self.ids: dict[int, int] = {}
+        """`id(Arparma)` -> token, 用于不触碰 LRU 顺序地反查记录"""
+        self.stats = RecordStats()
+        self.lock = threading.Lock()
+        """保护记录与各索引的一致性; 即便只是读取, LRU 也会调整其顺序"""
+        self.results.set_callback(self._evict)
+
+    def _forget(self, token: int, result: Arparma):
+        self.ids.pop(id(result), None)
+        self.nbytes -= self.sizes.pop(token, 0)
+        if (tokens := self.tokens.get(result._id)) is not None:
+            tokens.pop(token, None)
+            if not tokens:
+                del self.tokens[result._id]
+
+    def _evict(self, token: int, result: Arparma):
+        self.stats.evictions += 1
+        self.stats.evicted_bytes += self.sizes.get(token, 0)
+        self._forget(token, result)
+
+    def _trim(self):
+        # LRU.popitem 会残留被弹出值的引用, 因此先查看再删除
+        while self.nbytes > self.budget and (item := self.results.peek_last_item()):
+            token, result = item
+            del self.results[token]
+            self._evict(token, result)
+
+    def add(self, token: int, result: Arparma, compact: bool = False):
+        """记录解析结果
+
+        Args:
+            token (int): 消息的 token
+            result (Arparma): 解析结果
+            compact (bool, optional): 是否只保留重放所需的数据, 丢弃原始消息、上下文与错误数据
+        """
+        if compact:
+            result = shallow_copy(result)
+            result.origin = None  # type: ignore
+            result.context = {}
+            result.error_data = []
+        # 估算大小不涉及记录本身, 放在锁外进行
+        if (budget := self.budget) and (size := size_of_result(result)) > budget:
+            with self.lock:
+                self.stats.rejected += 1
+            return
+        with self.lock:
+            if (old := self.results.get(token)) is not None:
+                self._forget(token, old)
+            self.results[token] = result
+            self.ids[id(result)] = token
+            self.tokens.setdefault(result._id, {})[token] = result
+            if budget and self.budget:
+                self.sizes[token] = size
+                self.nbytes += size
+                self._trim()
+
+    def get(self, token: int) -> Arparma | None:
+        with self.lock:
+            if (res := self.results.get(token)) is not None and (tokens := self.tokens.get(res._id)):
+                # 与 LRU 保持一致, 最近使用的记录排在最后
+                tokens[token] = tokens.pop(token, res)
+            return res
+
+    def recent(self) -> Arparma | None:
+        """最近使用的记录"""
+        with self.lock:
+            if item := self.results.peek_first_item():
+                return item[1]
+
+    def token_of(self, result: Arparma) -> int:
+        with self.lock:
+            token = self.ids.get(id(result), 0)
+            if token in self.results and self.tokens.get(result._id, {}).get(token) is result:
+                return token
+            return 0
+
+    def results_of(self, cmd_hash: int) -> list[Arparma]:
+        """某个命令的所有记录, 最近使用的排在最前"""
+        with self.lock:
+            tokens = self.tokens.get(cmd_hash, {})
+            return [arp for token, arp in reversed(list(tokens.items())) if token in self.results]
+
+    def discard(self, cmd_hash: int):
+        """清除某个命令的所有记录"""
+        with self.lock:
+            for token, arp in self.tokens.pop(cmd_hash, {}).items():
+                self.ids.pop(id(arp), None)
+                self.nbytes -= self.sizes.pop(token, 0)
+                if token in self.results:
+                    del self.results[token]
+
+    def set_size(self, size: int):
+        with self.lock:
+            self.results.set_size(size)
+
+    def set_budget(self, budget: int):
+        """设置近似字节预算, 0 为不限制"""
+        with self.lock:
+            self.budget = budget
+            self.sizes.clear()
+            self.nbytes = 0
+            if not budget:
+                return
+            for token, result in self.results.items():
+                self.sizes[token] = size = size_of_result(result)
+                self.nbytes += size
+            self._trim()
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.sizes.clear()
+            self.tokens.clear()
+            self.ids.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self.results)
@@ -0,0 +1,168 @@
+"""Alconna 多进程分片广播相关"""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterable
+
+from .arparma import Arparma
+from .config import Namespace
+from .manager import command_manager
+from .typing import TDC
+
+_commands: dict[str, list] | None = None
+"""工作进程内, 命令路径 -> 命令"""
+
+
+def _worker_commands() -> dict[str, list]:
+    global _commands
+    if _commands is None:
+        _commands = {}
+        for cmd in command_manager.get_commands():
+            _commands.setdefault(cmd.path, []).append(cmd)
+    return _commands
+
+
+def _worker_init(initializer: Callable[..., Any] | None, initargs: tuple):
+    global _commands
+    _commands = None
+    if initializer:
+        initializer(*initargs)
+
+
+def _broadcast_shard(tasks: list[tuple[int, Any, list[str]]]) -> list[tuple[int, str, Arparma]]:
+    """在工作进程中解析分配给该分片的命令
+
+    Args:
+        tasks (list[tuple[int, Any, list[str]]]): 消息序号, 消息, 以及该分片内需要尝试的命令路径
+    """
+    commands = _worker_commands()
+    result = []
+    for index, message, paths in tasks:
+        for path in paths:
+            for cmd in commands.get(path, ()):
+                if (res := cmd.parse(message)) and res.matched:
+                    result.append((index, path, res))
+    return result
+
+
+class ShardedBroadcaster:
+    """多进程分片广播
+
+    将命令按注册顺序轮流分配到若干工作进程中, 每个工作进程持有自己的命令解析器;
+    广播时先由命令分发器筛选出候选命令, 再按分片并行解析, 最后按注册顺序合并解析结果.
+
+    工作进程默认通过 `fork` 继承当前已注册的命令, 因此在启动后注册的命令会在主进程中解析;
+    在不支持 `fork` 的平台上, 需要通过 `initializer` 在工作进程中重新注册相同路径的命令.
+    消息与解析结果需要能够被 `pickle`, 命令的执行器与行为器会在工作进程中执行.
+
+    Examples:
+        >>> with ShardedBroadcaster(4) as broadcaster:
+        ...     results = broadcaster.broadcast("cmd 123")
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        namespace: str | Namespace = "",
+        initializer: Callable[..., Any] | None = None,
+        initargs: tuple = (),
+    ):
+        """初始化分片广播
+
+        Args:
+            workers (int | None, optional): 工作进程数量, 默认为 CPU 核心数
+            namespace (str | Namespace, optional): 参与广播的命名空间, 默认为所有命令
+            initializer (Callable[..., Any] | None, optional): 工作进程的初始化函数, 用于注册命令
+            initargs (tuple, optional): 初始化函数的参数
+        """
+        self.workers = workers or multiprocessing.cpu_count()
+        self.namespace = namespace.name if isinstance(namespace, Namespace) else namespace
+        self.initializer = initializer
+        self.initargs = initargs
+        self.shards: dict[str, int] = {}
+        """命令路径 -> 分片序号"""
+        self._executor: Executor | None = None
+
+    def start(self):
+        """启动工作进程, 并依据当前已注册的命令进行分片"""
+        if self._executor:
+            return self
+        self.shards.clear()
+        for index, cmd in enumerate(command_manager.get_commands(self.namespace)):
+            self.shards.setdefault(cmd.path, index % self.workers)
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods and not self.initializer else None)
+        self._executor = ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=_worker_init, initargs=(self.initializer, self.initargs)
+        )
+        return self
+
+    def shutdown(self):
+        """关闭工作进程"""
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def refresh(self):
+        """重启工作进程, 以同步启动后注册或更新的命令"""
+        self.shutdown()
+        return self.start()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def broadcast_many(self, messages: Iterable[TDC]) -> list[dict[str, Arparma[TDC]]]:
+        """将多段命令分别广播给所有命令
+
+        Args:
+            messages (Iterable[TDC]): 命令消息
+
+        Returns:
+            list[dict[str, Arparma[TDC]]]: 每段消息对应的匹配结果, 按命令的注册顺序排列
+        """
+        if not self._executor:
+            self.start()
+        messages = list(messages)
+        tasks: dict[int, list[tuple[int, Any, list[str]]]] = {}
+        orders: list[dict[str, int]] = []
+        results: list[dict[str, Arparma]] = []
+        local = []
+        for index, message in enumerate(messages):
+            cmds = command_manager.dispatch(message, self.namespace)
+            orders.append({cmd.path: order for order, cmd in enumerate(cmds)})
+            results.append({})
+            shard_paths: dict[int, dict[str, None]] = {}
+            for cmd in cmds:
+                if (shard := self.shards.get(cmd.path)) is None:
+                    local.append((index, cmd))
+                else:
+                    shard_paths.setdefault(shard, {})[cmd.path] = None
+            for shard, paths in shard_paths.items():
+                tasks.setdefault(shard, []).append((index, message, list(paths)))
+        futures = [self._executor.submit(_broadcast_shard, shard_tasks) for shard_tasks in tasks.values()]  # type: ignore
+        matched: list[tuple[int, str, Arparma]] = []
+        for index, cmd in local:
+            if (res := cmd.parse(messages[index])) and res.matched:
+                matched.append((index, cmd.path, res))
+        for fut in futures:
+            matched.extend(fut.result())
+        matched.sort(key=lambda x: (x[0], orders[x[0]][x[1]]))
+        for index, path, res in matched:
+            results[index][path] = res
+        return results  # type: ignore
+
+    def broadcast(self, message: TDC) -> dict[str, Arparma[TDC]]:
+        """将一段命令广播给所有命令
+
+        Args:
+            message (TDC): 命令消息
+
+        Returns:
+            dict[str, Arparma[TDC]]: 匹配结果, 按命令的注册顺序排列
+        """
+        return self.broadcast_many([message])[0]
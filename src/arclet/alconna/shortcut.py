@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 import inspect
+import pickle
 import re
-from typing import Any, TypedDict, Protocol, cast
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TypedDict, Protocol, cast
 
 from tarina import lang
 from typing_extensions import NotRequired, TypeAlias
 
+from ._trie import CharTrie
+from .dispatch import literal_pattern
 from .exceptions import ArgumentMissing, ParamsUnmatched
 
 class _ShortcutRegWrapper(Protocol):
@@ -266,7 +272,150 @@ def wrap_shortcut(
     return result
 
 
+class ShortcutTable(dict):
+    """编译后的快捷指令表
+
+    字面量触发词存放于前缀树中, 其余触发词预先编译为正则表达式; 增删快捷指令时只更新对应的条目.
+    查找时先通过前缀树确定最早添加的字面量候选, 再按添加顺序尝试排在其之前的正则触发词,
+    因此结果与逐个尝试所有触发词一致.
+    """
+
+    __slots__ = ("_count", "_order", "_patterns", "_fuzzy", "_exact", "_regex")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._count = 0
+        self._order: dict[str, int] = {}
+        """触发词 -> 添加顺序"""
+        self._patterns: dict[str, re.Pattern] = {}
+        self._fuzzy: CharTrie[str] = CharTrie()
+        """允许后随参数的字面量触发词"""
+        self._exact: dict[str, dict[str, None]] = {}
+        """不允许后随参数的字面量触发词"""
+        self._regex: dict[str, re.Pattern] = {}
+        """非字面量触发词, 按添加顺序排列"""
+        self.update(*args, **kwargs)
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    def _discard(self, key: str):
+        self._patterns.pop(key, None)
+        if self._regex.pop(key, None) is not None:
+            return
+        literal = literal_pattern(key, super().__getitem__(key).flags)
+        self._fuzzy.discard(literal, key)  # type: ignore
+        if (keys := self._exact.get(literal)) is not None:  # type: ignore
+            keys.pop(key, None)
+            if not keys:
+                del self._exact[literal]  # type: ignore
+
+    def __setitem__(self, key: str, value: InnerShortcutArgs):
+        if key in self:
+            self._discard(key)
+        else:
+            self._order[key] = self._count
+            self._count += 1
+        super().__setitem__(key, value)
+        self._patterns[key] = re.compile(key, value.flags)
+        if (literal := literal_pattern(key, value.flags)) is None:
+            self._regex[key] = self._patterns[key]
+            if self._order[key] != self._count - 1:
+                # 覆盖已有的触发词时保持其原有顺序
+                self._regex = dict(sorted(self._regex.items(), key=lambda x: self._order[x[0]]))
+        elif value.fuzzy:
+            self._fuzzy.insert(literal, key)
+        else:
+            self._exact.setdefault(literal, {})[key] = None
+
+    def __delitem__(self, key: str):
+        if key in self:
+            self._discard(key)
+            del self._order[key]
+        super().__delitem__(key)
+
+    def pop(self, key: str, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def setdefault(self, key: str, default: InnerShortcutArgs):  # type: ignore
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        super().clear()
+        self._count = 0
+        self._order.clear()
+        self._patterns.clear()
+        self._fuzzy.clear()
+        self._exact.clear()
+        self._regex.clear()
+
+    def _candidates(self, query: str, rest: bool) -> Iterator[str]:
+        for _, keys in self._fuzzy.prefixes(query):
+            yield from keys
+        if not rest:
+            yield from self._exact.get(query, ())
+
+    def match(self, query: str, rest: bool = False) -> tuple[str, re.Match[str]] | None:
+        """获取最早添加的、能够匹配查询词的触发词
+
+        Args:
+            query (str): 查询词
+            rest (bool, optional): 查询词之后是否还有其他参数, 此时不允许后随参数的触发词不会被匹配
+        """
+        order = self._order
+        best = None
+        for key in self._candidates(query, rest):
+            if best is None or order[key] < order[best]:
+                best = key
+        limit = self._count if best is None else order[best]
+        for key, pattern in self._regex.items():
+            if order[key] >= limit:
+                break
+            if super().__getitem__(key).fuzzy:
+                if mat := pattern.match(query):
+                    return key, mat
+            elif not rest and (mat := pattern.fullmatch(query)):
+                return key, mat
+        if best is None:
+            return None
+        return best, self._patterns[best].match(query)  # type: ignore
+
+    def find(self, data: list, separators: str = " "):
+        """查找快捷指令, 参数与返回值同 `find_shortcut`"""
+        query = data.pop(0)
+        if not isinstance(query, str):
+            return
+        while True:
+            if query in self:
+                return query, data, self[query], None
+            if res := self.match(query, bool(data)):
+                key, mat = res
+                short = self[key]
+                if short.fuzzy and len(query) > mat.end():
+                    data.insert(0, query[mat.end():].lstrip(separators))
+                return query, data, short, mat
+            if not data:
+                break
+            next_data = data.pop(0)
+            if not isinstance(next_data, str):
+                break
+            query += f"{separators}{next_data}"
+        return
+
+
 def find_shortcut(table: dict[str, InnerShortcutArgs], data: list, separators: str = " "):
+    if isinstance(table, ShortcutTable):
+        return table.find(data, separators)
     query = data.pop(0)
     if not isinstance(query, str):
         return
@@ -305,3 +454,120 @@ def execute_shortcut(table: dict[str, InnerShortcutArgs], data: list, separators
     if res := find_shortcut(table, data.copy(), separators):
         return wrap_shortcut(*res[1:], ctx=ctx or {})
     return data
+
+
+class ShortcutStore:
+    """基于 SQLite 的快捷指令持久化存储
+
+    每条快捷指令单独存为一行, 增删快捷指令时只写入发生变化的条目, 并以 WAL 模式保证写入中断时数据不损坏;
+    快捷指令按命令路径读取, 以便命令管理器按需加载. 写入达到一定次数后, 会在后台线程中合并日志并整理数据库.
+    """
+
+    def __init__(self, file: str | Path, compact_interval: int = 1024):
+        """初始化存储
+
+        Args:
+            file (str | Path): 数据库文件路径
+            compact_interval (int, optional): 每写入多少次后在后台整理一次数据库, 为 0 时不自动整理
+        """
+        self.path = Path(file).resolve()
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._compacting: threading.Thread | None = None
+        self._conn = sqlite3.connect(self.path.as_posix(), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shortcuts ("
+            "command TEXT NOT NULL, kind INTEGER NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, "
+            "UNIQUE (command, kind, key))"
+        )
+
+    def commands(self) -> list[str]:
+        """获取存有快捷指令的命令路径"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT command FROM shortcuts")]
+
+    def load(self, command: str) -> Iterator[tuple[int, str, InnerShortcutArgs]]:
+        """按添加顺序读取某个命令的快捷指令
+
+        Yields:
+            tuple[int, str, InnerShortcutArgs]: 所属的表 (0 为展示用的表, 1 为匹配用的表), 触发词, 以及快捷指令
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, key, data FROM shortcuts WHERE command = ? ORDER BY rowid", (command,)
+            ).fetchall()
+        for kind, key, data in rows:
+            yield kind, key, InnerShortcutArgs.load(pickle.loads(data))
+
+    def set(self, command: str, entries: Iterable[tuple[int, str, InnerShortcutArgs]]):
+        """写入某个命令的若干条快捷指令; 已存在的触发词会保持原有顺序"""
+        self._write(
+            "INSERT INTO shortcuts (command, kind, key, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (command, kind, key) DO UPDATE SET data = excluded.data",
+            [(command, kind, key, pickle.dumps(short.dump())) for kind, key, short in entries],
+        )
+
+    def delete(self, command: str, entries: Iterable[tuple[int, str]]):
+        """删除某个命令的若干条快捷指令"""
+        self._write(
+            "DELETE FROM shortcuts WHERE command = ? AND kind = ? AND key = ?",
+            [(command, kind, key) for kind, key in entries],
+        )
+
+    def delete_command(self, command: str):
+        """删除某个命令的所有快捷指令"""
+        self._write("DELETE FROM shortcuts WHERE command = ?", [(command,)])
+
+    def _write(self, sql: str, params: list[tuple]):
+        if not params:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(sql, params)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._writes += 1
+            if not self.compact_interval or self._writes < self.compact_interval:
+                return
+            self._writes = 0
+        self.compact(background=True)
+
+    def compact(self, background: bool = False):
+        """合并预写日志, 并在空闲页较多时整理数据库
+
+        Args:
+            background (bool, optional): 是否在后台线程中进行
+        """
+        if not background:
+            return self._compact()
+        if self._compacting and self._compacting.is_alive():
+            return
+        self._compacting = threading.Thread(target=self._compact, name="alconna-shortcut-compact", daemon=True)
+        self._compacting.start()
+
+    def _compact(self):
+        # 使用独立的连接, 避免整理期间阻塞写入快捷指令的调用方
+        conn = sqlite3.connect(self.path.as_posix(), isolation_level=None)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free * 4 > pages:
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+    def close(self):
+        """等待后台整理结束并关闭数据库"""
+        if self._compacting:
+            self._compacting.join()
+            self._compacting = None
+        with self._lock:
+            self._conn.close()
@@ -3,8 +3,8 @@ from typing import Any, Union
 
 from nepattern import BasePattern, MatchMode
 
-from arclet.alconna import Alconna, Args, Option
-from arclet.alconna.ingedia._argv import argv_config
+from arclet.alconna import Alconna, Args, Config, Option, Subcommand, codegen_compiler, codegen_source, command_manager, count
+from arclet.alconna.ingedia._argv import Argv, argv_config
 
 
 @dataclass
@@ -99,6 +99,213 @@ def test_checker():
         print(e)
 
 
+def test_codegen():
+    def make(name: str, compiler=None):
+        return Alconna(
+            name,
+            Args.a(int).b(int, 2),
+            Option("--foo|-f", Args.x(str)),
+            Option("-v", action=count),
+            Option("-c", Args.c(int), compact=True),
+            *(Option(f"--opt{i}", Args.o(int, optional=True)) for i in range(8)),
+            Subcommand("sub", Args.y(float), Option("--bar", Args.z(int, 5)), Subcommand("deep", Option("--baz"))),
+            Config(compiler=compiler, enable_message_cache=False),
+        )
+
+    alc = make("codegen")
+    alc1 = make("codegen1", codegen_compiler)
+    source = codegen_source(command_manager.require(alc1))
+    assert source and "def process_0" in source
+    assert codegen_source(command_manager.require(alc)) is None
+    for message in [
+        "{} 1",
+        "{} 1 3 --foo hi -v -v",
+        "{} -c3 2 --opt3 4 --opt7",
+        "{} 1 sub 2.5 --bar 7 deep --baz",
+        "{} 1 sub 2.5 sub 3",
+        "{} 1 sub 2.5 -f x",
+        "{} 1 2 3",
+        "{} x",
+        "{} 1 --foo",
+        "{} 1 sub",
+        "{} 1 --help",
+    ]:
+        res = alc.parse(message.format("codegen"))
+        res1 = alc1.parse(message.format("codegen1"))
+        assert res1.matched == res.matched, message
+        assert res1.all_matched_args == res.all_matched_args, message
+        assert repr(res1.options) == repr(res.options), message
+        assert repr(res1.subcommands) == repr(res.subcommands), message
+        assert repr(res1.error_info) == repr(res.error_info), message
+    # 命令更新后重新生成
+    alc1.add(Option("--new"))
+    assert codegen_source(command_manager.require(alc1)) != source
+    assert alc1.parse("codegen1 1 --new").find("new")
+    command_manager.delete(alc)
+    command_manager.delete(alc1)
+
+
+def test_compact_trie():
+    alc = Alconna(
+        "compact_trie",
+        Args.a(int, 0),
+        Option("-c", Args.c(int), compact=True),
+        Option("-cc", Args.d(str), compact=True),
+        Option("-v", action=count),
+        Option("--path", Args.p(str), separators="="),
+        Subcommand("sub", Args.s(int), separators="."),
+        Option("--re.x", Args.r(int), compact=True),
+    )
+    analyser = command_manager.require(alc)
+    assert [i for _, i in analyser.compact_trie.prefixes("-ccx")] == [(0,), (1,)]
+    assert analyser.compact_any == [5]
+    res = alc.parse("compact_trie 3 -c1 -vvv --path=a sub.2 --reyx5")
+    assert res.matched
+    assert res.query[int]("c.c") == 1
+    assert res.query[int]("v.value") == 3
+    assert res.query[str]("path.p") == "a"
+    assert res.query[int]("sub.s") == 2
+    assert res.options["re.x"].args == {"r": 5}
+    # 带自定义分隔符的子命令不再使主参数的解析出错
+    assert alc.parse("compact_trie 3").matched
+    # 前缀树命中的节点直接校验名称, 只有无法放入前缀树的节点需要逐个尝试
+    from arclet.alconna.ingedia import _handlers
+
+    validated = []
+    handle_option = _handlers.handle_option
+
+    def _handle_option(argv, opt, name_validated, count=0):
+        validated.append(name_validated)
+        return handle_option(argv, opt, name_validated, count)
+
+    _handlers.handle_option = _handle_option
+    try:
+        res = alc.parse("compact_trie -c1 -vv sub.2")
+        assert res.query[int]("v.value") == 2
+        assert res.query[int]("sub.s") == 2
+        assert validated == [True, True]
+        assert alc.parse("compact_trie --reyx5").matched
+        assert validated[2:] == [False]
+    finally:
+        _handlers.handle_option = handle_option
+    command_manager.delete(alc)
+
+
+def test_argv_checkpoint():
+    argv = Argv(Config(), separators=" ")
+    argv.build(["a b c", 1, "d"])
+    assert argv.next() == ("a", True)
+    mark, index = argv.data_set()
+    assert argv.next() == ("b", True)
+    argv.rollback("x", replace=False)
+    assert argv.next() == ("x", True)
+    assert argv.next() == ("c", True)
+    assert argv.next() == (1, False)
+    argv.data_reset(mark, index)
+    assert argv.raw_data == ["b c", 1, "d"]
+    assert argv.next() == ("b", True)
+    # 备份数据由撤销日志还原
+    assert argv.bak_data == ["a b c", 1, "d"]
+    assert argv.release(recover=True) == ["a", "b", "c", 1, "d"]
+    mark, index = argv.data_set()
+    argv.free()
+    assert argv.raw_data == ["", 1, "d"]
+    argv.data_reset(mark, index)
+    assert argv.raw_data == ["c", 1, "d"]
+
+
+def test_argv_span():
+    threshold = Argv.span_threshold
+    Argv.span_threshold = 1
+    try:
+        argv = Argv(Config(), separators=" ")
+        argv.build(["a  bb c", 1])
+        assert argv.next() == ("a", True)
+        mark, index = argv.data_set()
+        assert argv.next() == ("bb", True)
+        # 放回刚取出的数据只需移动位置
+        argv.rollback("bb")
+        assert argv.next() == ("bb", True)
+        argv.rollback("x")
+        assert argv.raw_data == ["x c", 1]
+        argv.data_reset(mark, index)
+        assert argv.next() == ("bb", True)
+        assert argv.next() == ("c", True)
+        assert argv.next() == (1, False)
+        assert argv.bak_data == ["a  bb c", 1]
+        # 引号交由 split_once 处理
+        argv.build("a 'b c' d")
+        assert [argv.next()[0] for _ in range(3)] == ["a", "b c", "d"]
+        alc = Alconna("span", Args.foo(str).bar(str, multiple=True))
+        res = alc.parse("span 1 " + " ".join(map(str, range(300))))
+        assert res.query("bar") == tuple(map(str, range(300)))
+        command_manager.delete(alc)
+    finally:
+        Argv.span_threshold = threshold
+
+
+def test_lazy_result():
+    from arclet.alconna.arparma import LazyArparma
+
+    def build(lazy: bool):
+        return Alconna(
+            "lazy",
+            Option("--foo", Args.foo(int), default=1),
+            Option("--bar", Args.bar(str)),
+            Subcommand("sub", Args.baz(int), Option("--qux", Args.qux(str))),
+            Config(lazy_result=lazy, enable_message_cache=False),
+        )
+
+    eager, lazy = build(False), build(True)
+    for message in ("lazy --bar a sub 2 --qux b", "lazy", "lazy --foo x"):
+        res, res1 = eager.parse(message), lazy.parse(message)
+        assert isinstance(res1, LazyArparma)
+        assert res1.matched == res.matched
+        assert res1.query("qux") == res.query("qux")
+        assert res1.query("foo") == res.query("foo")
+        assert res1.query("missing") is None
+        assert res1.non_component == res.non_component
+        assert res1.options == res.options
+        assert res1.subcommands == res.subcommands
+        assert res1.other_args == res.other_args
+        assert res1.all_matched_args == res.all_matched_args
+    command_manager.delete(eager)
+    command_manager.delete(lazy)
+
+
+def test_fingerprint():
+    class Image:
+        def __init__(self, url: str):
+            self.url = url
+
+        def __repr__(self):
+            return "[image]"
+
+    argv = Argv(Config(enable_message_cache=True), separators=" ")
+    data = ["a b", 1, Segment.at(123)]
+    assert argv.build(data).token == argv.generate_token(argv.raw_data)
+    assert argv.build(["a b", 1, Segment.at(123)]).token == argv.generate_token(data)
+    assert argv.build(["a b", 1, Segment.at(456)]).token != argv.generate_token(data)
+    assert argv.build(["a", "1"]).token != argv.build(["a", 1]).token
+    # 仅有基于对象标识的哈希时使用 repr
+    assert argv.build(["a", Image("x")]).token == argv.build(["a", Image("y")]).token
+
+    argv_config(fingerprints={Image: lambda x: x.url})
+    argv1 = Argv(Config(enable_message_cache=True), separators=" ")
+    assert argv1.build(["a", Image("x")]).token == argv1.build(["a", Image("x")]).token
+    assert argv1.build(["a", Image("x")]).token != argv1.build(["a", Image("y")]).token
+    argv_config(fingerprints={})
+
+    ana5 = Alconna("ana5", Args.foo(int))
+    stats = ana5.cache_stats
+    ana5.parse("ana5 1")
+    ana5.parse("ana5 1")
+    ana5.parse("ana5 2")
+    assert (stats.hits, stats.misses) == (1, 2)
+    assert stats.hit_rate == 1 / 3
+    command_manager.delete(ana5)
+
+
 if __name__ == "__main__":
     import pytest
 
@@ -142,6 +142,18 @@ def test_kwonly():
     }
 
 
+def test_plan():
+    arg14_4 = Args.foo(str).bar(int, kw_only=True).notify(int, 1, kw_only=True).build()
+    plan = arg14_4.plan
+    assert not plan.simple
+    assert plan.keywords["--no-bar"] == "bar"
+    assert plan.keywords["notify"] == "notify"
+    assert plan.normal[0][-1] == 1
+    assert analyse_args(arg14_4, ["abc --no-bar=2 notify=3"]) == {"foo": "abc", "bar": 2, "notify": 3}
+    assert analyse_args(arg14_4, ["abc ---bar=4"]) == {"foo": "abc", "bar": 4, "notify": 1}
+    assert Args.foo(str).bar(int).build().plan.simple
+
+
 def test_pattern():
     test_type = BasePattern("(.+?).py", MatchMode.REGEX_CONVERT, list, lambda _, x: x[1].split("/"), "test")
     arg15 = Args.bar(test_type)
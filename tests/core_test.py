@@ -15,7 +15,9 @@ from arclet.alconna import (
     Option,
     Subcommand,
     namespace, command_manager,
+    query_path,
 )
+from arclet.alconna.exceptions import InvalidHeader
 
 
 def test_alconna_create():
@@ -74,6 +76,14 @@ def test_alconna_multi_match():
     assert res1.matched is True
     assert res1.query("num.count") == 222
     assert res1.query("test.u.username") == "AAA"
+    # 编译后的路径与字符串路径的查询结果一致
+    username = query_path("test.u.username", str)
+    assert username is query_path("test.u.username")
+    assert res1.get(username) == "AAA"
+    assert res1.get(query_path("test.u.missing"), 1) == 1
+    with pytest.raises(KeyError):
+        res1.get(query_path("test.u.missing"), force_return=True)
+    assert res1.get("$main.IP") == "127.0.0.1"
     res2 = alc1.parse(["/core1 127.0.0.1 -u", 321])
     assert res2.IP == "127.0.0.1"
     res3 = alc1.parse("/core1 aa")
@@ -221,23 +231,28 @@ def test_alconna_multi_header():
     # alc6_5 = Alconna(a)
     # assert alc6_5.parse([a]).head_matched is True
     # assert alc6_5.parse([b]).head_matched is False
-    # # 元素类头
-    # alc6_6 = Alconna("core6_6", [A])
-    # assert alc6_6.parse([a, "core6_6"]).head_matched is True
-    # assert alc6_6.parse([b, "core6_6"]).head_matched is True
-    # assert alc6_6.parse([A, "core6_6"]).head_matched is False
-    # assert alc6_6.parse("core6_6").head_matched is False
-    # # 表达式头
-    # alc6_7 = Alconna("core6_7", [NUMBER])
-    # assert alc6_7.parse([123, "core6_7"]).head_matched is True
-    # assert alc6_7.parse("123core6_7").head_matched is False
-    # # 混合头
-    # alc6_8 = Alconna("core6_8", [A, "/"])
-    # assert alc6_8.parse([a, "core6_8"]).head_matched is True
-    # assert alc6_8.parse([b, "core6_8"]).head_matched is True
-    # assert alc6_8.parse("/core6_8").head_matched is True
-    # assert alc6_8.parse([A, "core6_8"]).head_matched is False
+    # 元素类头
+    alc6_6 = Alconna("core6_6", [A])
+    assert alc6_6.parse([a, "core6_6"]).head_matched is True
+    assert alc6_6.parse([b, "core6_6"]).head_matched is True
+    assert alc6_6.parse([A, "core6_6"]).head_matched is False
+    assert alc6_6.parse("core6_6").head_matched is False
+    # 表达式头
+    alc6_7 = Alconna("core6_7", [NUMBER])
+    assert alc6_7.parse([123, "core6_7"]).head_matched is True
+    assert alc6_7.parse("123core6_7").head_matched is False
+    # 混合头
+    alc6_8 = Alconna("core6_8", [A, "/"])
+    assert alc6_8.parse([a, "core6_8"]).head_matched is True
+    assert alc6_8.parse([b, "core6_8"]).head_matched is True
+    assert alc6_8.parse("/core6_8").head_matched is True
+    assert alc6_8.parse([A, "core6_8"]).head_matched is False
     # assert alc6_8.parse(["/", "core6_8"]).head_matched is True
+    # 紧凑头优先匹配最长的前缀
+    alc6_9 = Alconna("core6_9", ["!", "!!", a], Args.foo(str), Config(compact=True))
+    assert alc6_9.parse("!!core6_9abc").query("foo") == "abc"
+    assert alc6_9.parse("!core6_9 abc").header_match.origin == "!core6_9"
+    assert alc6_9.parse([a, "core6_9abc"]).query("foo") == "abc"
     # assert alc6_8.parse("core6_8").head_matched is False
     # alc6_9 = Alconna("core6_9", ["/", a])
     # assert alc6_9.parse("/core6_9").head_matched is True
@@ -264,6 +279,13 @@ def test_alconna_multi_header():
     alc6_13 = Alconna("core6_13", ["/", "?"], Args.foo(str), Config(compact=True))
     assert alc6_13.parse("/core6_13 abc").matched is True
     assert alc6_13.parse("/core6_13abc").matched is True
+    # 命令名不是字面量时, 紧凑头部仍按正则表达式匹配
+    alc6_14 = Alconna(["/"], r"core6_14\d", Args.foo(str), Config(compact=True))
+    assert alc6_14.parse("/core6_141abc").query("foo") == "abc"
+    assert alc6_14.parse("/core6_141 abc").matched is True
+    assert alc6_14.parse("/core6_14abc").matched is False
+    assert alc6_14 in command_manager.dispatch("/core6_142xyz")
+    command_manager.delete(alc6_14)
 
 
 def test_alconna_namespace():
@@ -748,6 +770,21 @@ def test_call():
     alc22_1.parse("core22_1 abc")
     assert alc22_1.exec_result["A"] == A("abc")
 
+    # 绑定计划按目标函数缓存, 保留参数与附加参数同样可用
+    from arclet.alconna.arparma import Arparma, _call_plans
+
+    def cb1(bar: str, *, args, extra=None, **kwargs):
+        return bar, args, extra, kwargs
+
+    res = alc22.parse("core22 1 abc")
+    Arparma.addition(extra=lambda: "extra")
+    try:
+        assert res.call(cb1) == ("abc", {"foo": 1, "bar": "abc"}, "extra", {})
+        assert cb1 in _call_plans
+    finally:
+        Arparma._additional.pop("extra")
+    assert res.call(cb1) == ("abc", {"foo": 1, "bar": "abc"}, None, {})
+
 
 def test_nest_subcommand():
     class A:
@@ -770,6 +807,10 @@ def test_nest_subcommand():
     assert alc23.parse(["core23 bar baz --qux", A(), "123"]).matched
     assert not alc23.parse(["core23 bar baz", A(), "--qux 123"]).matched
     assert alc23.parse(["core23 bar baz --qux", A(), "123"]).query("Bar.Baz.qux.value") is Ellipsis
+    assert alc23.matches(["core23 bar baz --qux", A(), "123"]) == (True, "Bar.Baz")
+    assert alc23.matches("core23 123") == (True, "")
+    assert alc23.matches(["core23 bar baz", A(), "--qux 123"]) == (False, "")
+    assert alc23.matches("core24 123") == (False, "")
 
     # alc23.parse("core23 --help")
     assert alc23.parse("core23 bar baz --help").output == (
@@ -1010,5 +1051,196 @@ def test_update():
     assert res1.query[str]("foo.bar") == "bar"
 
 
+def test_reentrant_parse():
+    core31 = Alconna("core31", Args.foo(int), Option("--bar", Args.baz(str)), Config(enable_message_cache=False))
+    inner = []
+
+    @core31.bind()
+    def _(foo: int):
+        if foo > 0:
+            inner.append(core31.parse(f"core31 {foo - 1} --bar inner{foo}"))
+
+    res = core31.parse("core31 2 --bar outer")
+    assert res.query[str]("bar.baz") == "outer"
+    assert [r.query[str]("bar.baz") for r in inner] == ["inner1", "inner2"]
+    assert [r.query[int]("foo") for r in inner] == [0, 1]
+
+
+def test_concurrent_parse():
+    from concurrent.futures import ThreadPoolExecutor
+
+    core32 = Alconna(
+        "core32",
+        Args.foo(int),
+        Option("--bar", Args.baz(str)),
+        Subcommand("sub", Args.qux(int)),
+        Config(enable_message_cache=False),
+    )
+
+    def work(index: int):
+        for i in range(200):
+            res = core32.parse(f"core32 {index} --bar t{index}_{i} sub {i}")
+            assert res.matched
+            assert res.query[int]("foo") == index
+            assert res.query[str]("bar.baz") == f"t{index}_{i}"
+            assert res.query[int]("sub.qux") == i
+
+    with ThreadPoolExecutor(8) as pool:
+        for fut in [pool.submit(work, i) for i in range(8)]:
+            fut.result()
+
+
+def test_concurrent_cache():
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    core32_1 = Alconna("core32_1", Args.foo(int), Option("--bar", Args.baz(str)), Config(failure_cache=16))
+    core32_2 = Alconna("core32_2", Args.foo(int), Config(record_budget=20000, record_compact=True, failure_cache=16))
+
+    def work(index: int):
+        for i in range(1000):
+            res = core32_1.parse(f"core32_1 {i % 50} --bar x")
+            assert res.matched and res.query[int]("foo") == i % 50
+            assert not core32_1.parse(f"core32_1 x{i % 20}").matched
+            res = core32_2.parse(f"core32_2 {(i + index) % 300}")
+            assert res.matched and res.query[int]("foo") == (i + index) % 300
+
+    # 缩短线程切换间隔, 使记录与失败结果的缓存更容易被并发读写
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            for fut in [pool.submit(work, i) for i in range(8)]:
+                fut.result()
+    finally:
+        sys.setswitchinterval(interval)
+    command_manager.delete(core32_1)
+    command_manager.delete(core32_2)
+
+
+def test_aparse():
+    import asyncio
+
+    from arclet.alconna import Arparma, ArparmaBehavior
+
+    class Double(ArparmaBehavior):
+        async def operate(self, interface: Arparma):
+            await asyncio.sleep(0)
+            self.update(interface, "foo", interface.query[int]("foo") * 2)
+
+    core33 = Alconna("core33", Args.foo(int), Config(offload_parse=True), behaviors=[Double()])
+    running = []
+
+    @core33.bind()
+    async def ext1(foo: int):
+        running.append(foo)
+        await asyncio.sleep(0.01)
+        return len(running)
+
+    @core33.bind()
+    def ext2(foo: int):
+        return foo + 1
+
+    res = asyncio.run(core33.aparse("core33 21"))
+    assert res.matched
+    assert res.query[int]("foo") == 42
+    assert core33.exec_result == {"ext1": 1, "ext2": 43}
+    assert not asyncio.run(core33.aparse("core33 abc")).matched
+
+
+def test_parse_many():
+    core34 = Alconna("core34", Args.foo(int), Option("--bar", Args.baz(str)))
+    messages = [f"core34 {i} --bar b{i}" for i in range(5)] + ["core34 abc", "core34 --help"]
+    res = core34.parse_many(messages)
+    assert [r.query[int]("foo") for r in res[:5]] == list(range(5))
+    assert [r.query[str]("bar.baz") for r in res[:5]] == [f"b{i}" for i in range(5)]
+    assert not res[5].matched
+    assert res[6].output
+
+    stream = core34.iter_parse(iter(messages))
+    assert next(stream).query[int]("foo") == 0
+    assert next(stream).query[str]("bar.baz") == "b1"
+    assert [r.matched for r in stream] == [True, True, True, False, False]
+
+    # 提前结束迭代或解析抛出异常时, 解析状态同样会放回状态池
+    analyser = command_manager.require(core34)
+    pool = len(analyser._pool)
+    for _ in range(analyser.pool_size + 4):
+        for _ in core34.iter_parse(messages):
+            break
+    assert len(analyser._pool) == pool
+    stream = core34.iter_parse(messages)
+    next(stream)
+    stream.close()
+    assert len(analyser._pool) == pool
+    core34_1 = Alconna("core34_1", Args.foo(int), Config(raise_exception=True))
+    analyser = command_manager.require(core34_1)
+    core34_1.parse("core34_1 1")
+    pool = len(analyser._pool)
+    with pytest.raises(Exception):
+        core34_1.parse("core34_1 abc")
+    with pytest.raises(Exception):
+        next(core34_1.iter_parse(["core34_1 abc"]))
+    assert len(analyser._pool) == pool
+
+
+def test_probe():
+    core35 = Alconna("core35", ["!"], Args.foo(int), Option("--bar", default=True), Config(probe_header=True))
+    stats = core35.probe_stats
+    stats.reset()
+    res = core35.parse("hello core35 1")
+    assert not res.matched
+    assert str(res.error_info) == "命令头部 hello 匹配失败"
+    assert res.error_data == ["core35", "1"]
+    assert res.query("bar.value") is True
+    assert core35.matches("hello") == (False, "")
+    assert core35.parse("!core35 1").query("foo") == 1
+    assert (stats.hits, stats.misses) == (1, 2)
+
+    # 快捷指令可能使不匹配的头部解析成功, 此时探测总是命中
+    core35.shortcut("hey", {"command": "!core35 2"})
+    assert core35.parse("hey").query("foo") == 2
+    assert (stats.hits, stats.misses) == (2, 2)
+    core35.shortcut("hey", delete=True)
+
+    core35_1 = Alconna("core35_1", Args.foo(int), Config(raise_exception=True, probe_header=True))
+    with pytest.raises(InvalidHeader):
+        core35_1.parse("hello")
+    assert core35_1.probe_stats.misses == 1
+
+    # 默认不进行探测
+    core35_2 = Alconna("core35_2", Args.foo(int))
+    assert not core35_2.parse("hello").matched
+    assert core35_2.probe_stats.total == 0
+
+
+def test_failure_cache():
+    core36 = Alconna("core36", Args.foo(int), Config(failure_cache=2))
+    failures = command_manager.require(core36).failures
+    res = core36.parse("core36 abc")
+    assert not res.matched
+    assert core36.parse("core36 abc") is res
+    assert core36.parse("core36 1").matched
+    assert len(failures) == 1  # type: ignore
+    # 携带上下文的解析不使用缓存
+    assert core36.parse("core36 abc", {"foo": 1}) is not res
+
+    # 快捷指令变化后, 此前命令头不匹配的消息可能会匹配
+    core36.shortcut("he", {"args": ["1"]})
+    res = core36.parse("hey")
+    assert not res.matched
+    assert core36.parse("hey") is res
+    core36.shortcut("hey", {"args": ["2"]})
+    assert not failures
+    assert core36.parse("hey").query("foo") == 2
+    core36.shortcut("hey", delete=True)
+    core36.shortcut("he", delete=True)
+
+    core36.parse("core36 abc")
+    core36.add(Option("--bar"))
+    assert command_manager.require(core36).failures is not failures
+    assert not command_manager.require(core36).failures
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-vs"])
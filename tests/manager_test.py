@@ -0,0 +1,340 @@
+from arclet.alconna import Alconna, AllParam, Args, Config, Option, command_manager, namespace
+
+
+def test_dispatch():
+    with namespace("mgr1") as np:
+        np.prefixes = ["!", "/"]
+        mgr = Alconna("mgr", Args.foo(int))
+        mgr1 = Alconna("mgr1", Option("--bar"))
+        mgr2 = Alconna("mgr2", Args.baz(str), Config(compact=True))
+        others = [Alconna(f"mgr_other{i}") for i in range(20)]
+
+    assert command_manager.dispatch("!mgr 123", "mgr1") == [mgr]
+    assert command_manager.dispatch("/mgr1 --bar", "mgr1") == [mgr1]
+    assert command_manager.dispatch("!mgr2abc", "mgr1") == [mgr2]
+    assert command_manager.dispatch("mgr 123", "mgr1") == []
+    assert command_manager.dispatch("hello world", "mgr1") == []
+    assert command_manager.test("!mgr 123", "mgr1").query("foo") == 123  # type: ignore
+    assert command_manager.test("!mgr2abc", "mgr1").query("baz") == "abc"  # type: ignore
+    assert list(command_manager.broadcast("/mgr_other3", "mgr1").keys()) == [others[3].path]
+    assert command_manager.matches("!mgr 123", "mgr1") == {mgr.path: ""}
+    assert command_manager.matches("!mgr abc", "mgr1") == {}
+
+    with command_manager.update(mgr1):
+        mgr1.command = "mgr1_1"
+    assert command_manager.dispatch("/mgr1 --bar", "mgr1") == []
+    assert command_manager.dispatch("/mgr1_1 --bar", "mgr1") == [mgr1]
+
+    command_manager.delete(mgr)
+    assert command_manager.dispatch("!mgr 123", "mgr1") == []
+
+
+def test_dispatch_shortcut():
+    with namespace("mgr2") as np:
+        np.config.disable_builtin_options = set()
+        mgr3 = Alconna("mgr3", Args.foo(int))
+        mgr3_1 = Alconna("mgr3_1", Args.foo(int))
+    mgr3.shortcut("test", {"args": ["123"]})
+    mgr3.shortcut(r"re(\d+)", {"args": ["{0}"]})
+    assert command_manager.dispatch("test", "mgr2") == [mgr3]
+    assert command_manager.dispatch("whatever", "mgr2") == [mgr3]
+    assert command_manager.test("re321", "mgr2").query("foo") == 321  # type: ignore
+    assert command_manager.matches("re321", "mgr2") == {mgr3.path: ""}
+
+    mgr3.shortcut(r"re(\d+)", delete=True)
+    assert command_manager.dispatch("whatever", "mgr2") == []
+    assert command_manager.test("test", "mgr2").query("foo") == 123  # type: ignore
+
+    mgr3_1.shortcut("test1 arg", {"args": ["321"]})
+    assert command_manager.dispatch("test1 arg", "mgr2") == [mgr3, mgr3_1]
+    assert command_manager.test("test1 arg", "mgr2").query("foo") == 321  # type: ignore
+
+
+def test_abroadcast():
+    import asyncio
+
+    with namespace("mgr3") as np:
+        np.prefixes = ["/"]
+        mgr4 = Alconna("mgr4", Args.foo(int))
+        mgr4_2 = Alconna("mgr4_2")
+    with namespace("mgr3_1") as np:
+        np.prefixes = ["/"]
+        mgr4_1 = Alconna("mgr4", Args.bar(str))
+
+    active = []
+    peak = []
+
+    async def track():
+        active.append(None)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+
+    for cmd in (mgr4, mgr4_1, mgr4_2):
+        cmd.bind()(track)
+
+    res = asyncio.run(command_manager.abroadcast("/mgr4 123"))
+    assert list(res.keys()) == [mgr4.path, mgr4_1.path]
+    assert res[mgr4.path].query("foo") == 123
+    assert res[mgr4_1.path].query("bar") == "123"
+    assert max(peak) == 2
+
+    peak.clear()
+    asyncio.run(command_manager.abroadcast("/mgr4 123", concurrency=1))
+    assert max(peak) == 1
+
+
+def test_sharded_broadcast():
+    from arclet.alconna import ShardedBroadcaster
+
+    with namespace("mgr4") as np:
+        np.prefixes = ["/"]
+        cmds = [Alconna(f"mgr5_{i}", Args.foo(int)) for i in range(6)]
+        fallback = Alconna("mgr5", Args.bar(AllParam), Config(compact=True))
+
+    with ShardedBroadcaster(2, "mgr4") as broadcaster:
+        late = Alconna("mgr5_late", Args.foo(int), namespace="mgr4")
+        res = broadcaster.broadcast("/mgr5_3 123")
+        assert list(res.keys()) == [cmds[3].path, fallback.path]
+        assert res[cmds[3].path].query("foo") == 123
+        assert res[fallback.path].query("bar") == ["_3 123"]
+        results = broadcaster.broadcast_many(["/mgr5_1 1", "/mgr5_late 2", "/mgr5_5 abc"])
+        assert [list(r.keys()) for r in results] == [
+            [cmds[1].path, fallback.path],
+            [fallback.path, late.path],
+            [fallback.path],
+        ]
+        assert results[2][fallback.path].query("bar") == ["_5 abc"]
+        assert results[1][late.path].query("foo") == 2
+
+
+def test_indexes():
+    with namespace("mgr5") as np:
+        np.prefixes = ["/"]
+        mgr6 = Alconna("mgr6", Args.foo(int))
+        mgr6_1 = Alconna("mgr6_1")
+
+    assert command_manager.get_command("mgr5::mgr6") is mgr6
+    assert command_manager.get_command("mgr5::/mgr6_1") is mgr6_1
+    assert command_manager.get_commands("mgr5") == [mgr6, mgr6_1]
+    with command_manager.update(mgr6):
+        mgr6.command = "mgr6_2"
+    assert command_manager.get_command("mgr5::mgr6_2") is mgr6
+    assert command_manager.get_commands("mgr5") == [mgr6_1, mgr6]
+    try:
+        command_manager.get_command("mgr5::mgr6")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError
+
+    command_manager.set_enabled(mgr6_1, False)
+    command_manager.set_enabled(mgr6_1, False)
+    assert command_manager.is_disable(mgr6_1)
+    command_manager.set_enabled("mgr5::mgr6_1", True)
+    assert not command_manager.is_disable(mgr6_1)
+
+    command_manager.set_record_size(3)
+    try:
+        res = [mgr6.parse(f"/mgr6_2 {i}") for i in range(3)]
+        assert command_manager.get_result(mgr6) == res[::-1]
+        assert command_manager.get_token(res[0]) != 0
+        mgr6_1.parse("/mgr6_1")
+        assert command_manager.get_result(mgr6) == res[:0:-1]
+        assert command_manager.get_token(res[0]) == 0
+        mgr6.parse("/mgr6_2 1")
+        assert command_manager.get_result(mgr6) == [res[1], res[2]]
+        command_manager.clear_result(mgr6)
+        assert command_manager.get_result(mgr6) == []
+        assert len(command_manager.get_result(mgr6_1)) == 1
+        command_manager.delete(mgr6_1)
+        assert command_manager.get_result(mgr6_1) == []
+        assert command_manager.get_commands("mgr5") == [mgr6]
+    finally:
+        command_manager.set_record_size(128)
+
+
+def test_record_store():
+    with namespace("mgr_record") as ns:
+        ns.config = Config(record_budget=4096)
+        mgr11 = Alconna("mgr11", Args.foo(int))
+        mgr12 = Alconna("mgr12", Args.foo(int), Config(record_budget=10**6, record_compact=True))
+    # 独立的记录不受共享记录的影响
+    res = [mgr11.parse(f"mgr11 {i}") for i in range(20)]
+    stats = command_manager.record_stats(mgr11)
+    assert stats.evictions > 0
+    assert stats.evicted_bytes > 0
+    assert command_manager.get_result(mgr11)[0] is res[-1]
+    assert len(command_manager.get_result(mgr11)) < 20
+    assert command_manager.require(mgr11).records.nbytes <= 4096  # type: ignore
+    assert mgr11.parse("mgr11 19") is res[-1]
+    # 最近使用的命令包括使用独立记录的命令
+    assert command_manager.recent_message == "mgr11 19"
+    assert command_manager.last_using is mgr11
+
+    # 紧凑记录不保存原始消息与上下文, 重放时由当前消息补全
+    res1 = mgr12.parse("mgr12 1", {"a": 1})
+    (record,) = command_manager.get_result(mgr12)
+    assert record.origin is None and record.context == {}
+    res2 = mgr12.parse("mgr12 1")
+    assert res2 is not res1
+    assert res2.origin == "mgr12 1"
+    assert res2.query("foo") == 1
+    assert mgr12.cache_stats.hits == 1
+
+    mgr13 = Alconna("mgr13", Config(enable_message_cache=True))
+    mgr13.parse("mgr13")
+    shared = command_manager.record_stats()
+    evictions = shared.evictions
+    command_manager.set_record_budget(1)
+    try:
+        assert len(command_manager.records) == 0
+        assert shared.evictions > evictions
+        mgr13.parse("mgr13")
+        assert shared.rejected == 1
+    finally:
+        command_manager.set_record_budget(0)
+        shared.reset()
+
+
+def test_record_payload():
+    from dataclasses import dataclass, field
+
+    from arclet.alconna.record import estimate_size
+
+    @dataclass
+    class Segment:
+        type: str
+        data: dict = field(default_factory=dict)
+
+    # 元素的数据嵌套在字典中时, 其大小同样计入
+    message = ["mgr14 0", Segment("image", {"raw": bytes(64 * 1024)})]
+    assert estimate_size(message) > 64 * 1024
+    mgr14 = Alconna("mgr14", Args.index(int).image(Segment), Config(record_budget=200 * 1024))
+    for i in range(10):
+        assert mgr14.parse([f"mgr14 {i}", Segment("image", {"raw": bytes(64 * 1024)})]).matched
+    store = command_manager.require(mgr14).records
+    assert store.nbytes <= 200 * 1024  # type: ignore
+    assert len(command_manager.get_result(mgr14)) <= 3
+    assert command_manager.record_stats(mgr14).evictions >= 7
+    # 上下文与原始消息由调用方持有, 不计入记录的大小; 过深的对象只计入其自身的大小
+    bot = Segment("bot", {"cache": {i: [str(i)] for i in range(50000)}})
+    assert estimate_size([[[[bot]]]]) < estimate_size(bot)
+    mgr14_1 = Alconna("mgr14_1", Args.index(int), Config(record_budget=10 * 1024))
+    for i in range(3):
+        assert mgr14_1.parse(f"mgr14_1 {i}", {"event": Segment("event", {"bot": bot})}).matched
+    assert len(command_manager.get_result(mgr14_1)) == 3
+    assert command_manager.record_stats(mgr14_1).rejected == 0
+    command_manager.delete(mgr14_1)
+
+    # 紧凑记录不会构建惰性的解析结果
+    mgr15 = Alconna(
+        "mgr15", Args.foo(int), Option("--bar", default=1), Config(lazy_result=True, record_budget=10**6, record_compact=True)
+    )
+    res = mgr15.parse("mgr15 1")
+    assert res._record is not None  # type: ignore
+    (record,) = command_manager.get_result(mgr15)
+    assert record._record is not None  # type: ignore
+    res1 = mgr15.parse("mgr15 1")
+    assert res1 is not res and res1._record is not None  # type: ignore
+    assert res1.query[int]("bar.value") == 1
+    assert record._record is not None  # type: ignore
+
+
+def test_shortcut_table():
+    import re
+
+    from arclet.alconna.shortcut import InnerShortcutArgs, ShortcutTable, find_shortcut
+
+    table = {}
+    compiled = ShortcutTable()
+    for key, short in [
+        ("ab", InnerShortcutArgs("x1")),
+        (r"a(\d+)", InnerShortcutArgs("x2")),
+        ("abc", InnerShortcutArgs("x3", fuzzy=False)),
+        (r"a\.b", InnerShortcutArgs("x4")),
+        ("AB C", InnerShortcutArgs("x5", flags=re.I)),
+        ("hello world", InnerShortcutArgs("x6", fuzzy=False)),
+    ]:
+        table[key] = compiled[key] = short
+    queries = [["abc"], ["a12", "b"], ["abd"], ["a.bcd"], ["ab", "c"], ["hello", "world"], ["hello", "world", "1"], ["zz"]]
+
+    def check():
+        for query in queries:
+            expected = find_shortcut(table, query.copy())
+            result = find_shortcut(compiled, query.copy())
+            assert (expected and expected[:3]) == (result and result[:3])
+            assert (expected and expected[3] and expected[3].group()) == (result and result[3] and result[3].group())
+
+    check()
+    assert find_shortcut(compiled, ["a.bcd"])[1] == ["cd"]  # type: ignore
+    del table["ab"], compiled["ab"]
+    check()
+    table[r"a(\d+)"] = compiled[r"a(\d+)"] = InnerShortcutArgs("x7", fuzzy=False)
+    table["ab"] = compiled["ab"] = InnerShortcutArgs("x8")
+    check()
+    assert list(compiled) == list(table)
+
+    with namespace("mgr6"):
+        mgr7 = Alconna("mgr7", Args.foo(int))
+    mgr7.shortcut("test", {"args": ["1"]})
+    mgr7.shortcut("test", delete=True)
+    mgr7.shortcut("test", {"args": ["2"]})
+    assert command_manager.test("test", "mgr6").query("foo") == 2  # type: ignore
+    mgr7.shortcut(None, delete=True)
+    assert command_manager.get_shortcut(mgr7) == {}
+
+
+def test_shortcut_store(tmp_path):
+    from arclet.alconna.shortcut import ShortcutStore
+
+    file = tmp_path / "shortcuts.sqlite3"
+    with namespace("mgr7"):
+        mgr8 = Alconna("mgr8", Args.foo(int))
+    try:
+        command_manager.use_shortcut_store(file)
+        mgr8.shortcut("t1", {"args": ["1"]})
+        mgr8.shortcut(r"t(\d+)x", {"args": ["{0}"]})
+        mgr8.shortcut("t2", {"args": ["2"]})
+        mgr8.shortcut("t1", delete=True)
+        command_manager.close_shortcut_store()
+
+        store = ShortcutStore(file)
+        assert [(kind, key) for kind, key, _ in store.load(mgr8.path)] == [
+            (0, r"t(\d+)x"), (1, r"t(\d+)x"), (0, "t2"), (1, "t2")
+        ]
+        store.compact()
+        store.close()
+
+        # 模拟重启: 快捷指令只在命令首次查找时加载
+        command_manager._shortcuts.pop(mgr8.path)
+        command_manager._dispatcher.set_shortcuts(mgr8.path, None)
+        command_manager.use_shortcut_store(file)
+        assert mgr8.path in command_manager._shortcut_pending
+        assert command_manager.dispatch("whatever", "mgr7") == [mgr8]
+        assert command_manager.test("t5x", "mgr7").query("foo") == 5  # type: ignore
+        assert mgr8.path not in command_manager._shortcut_pending
+        assert command_manager.test("t2", "mgr7").query("foo") == 2  # type: ignore
+        assert list(command_manager.get_shortcut(mgr8)) == [r"t(\d+)x", "t2"]
+    finally:
+        command_manager.close_shortcut_store()
+
+
+def test_probe_stats():
+    with namespace("mgr_probe"):
+        mgr9 = Alconna("mgr9", Args.foo(int), Config(probe_header=True))
+        mgr10 = Alconna("mgr10", ["!"])
+    stats = command_manager.probe_stats
+    stats.reset()
+    assert command_manager.test("hello world", "mgr_probe") is None
+    assert command_manager.test("!mgr10", "mgr_probe").matched  # type: ignore
+    assert command_manager.test("mgr9 1", "mgr_probe").matched  # type: ignore
+    assert (stats.hits, stats.misses) == (2, 1)
+    # 分发时被拒绝的消息不会交给任何命令
+    assert mgr9.probe_stats.total == 1
+
+
+if __name__ == "__main__":
+    import pytest
+
+    pytest.main([__file__, "-vs"])
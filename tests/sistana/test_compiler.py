@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from arclet.alconna import Alconna, Args, Option, Subcommand, command_manager, count, namespace
+from arclet.alconna._stargazing.compiler import compile_sistana, parse_sistana
+
+
+def _commands(backend: str):
+    with namespace(f"compiler_{backend}") as ns:
+        ns.config.backend = backend
+        ns.config.enable_message_cache = False
+        return [
+            Alconna(
+                "cmp",
+                Args.a(int).b(int, 2),
+                Option("--foo|-f", Args.x(str)),
+                Option("-v"),
+                Option("--opt", Args.o(int, optional=True)),
+                Subcommand(
+                    "sub",
+                    Args.y(float),
+                    Option("--bar", Args.z(int, 5)),
+                    Subcommand("deep", Args.w(str, optional=True), Option("--baz")),
+                ),
+            ),
+            Alconna("cmp2", Args.p(str, "dp").q(int, 3), Option("--foo"), Subcommand("sub", Option("--bar", Args.z(str)))),
+            Alconna("cmp3", Args.p(int, optional=True).q(str, optional=True), Option("--foo", Args.x(int).y(int, 1))),
+            Alconna("cmp4", Args.a(int), Option("--cnt", action=count), Option("-c", Args.c(int), compact=True)),
+        ]
+
+
+ingedia = _commands("ingedia")
+sistana = _commands("sistana")
+corpus = {
+    "cmp": [
+        "cmp 1",
+        "cmp 1 3 --foo hi -v",
+        "cmp -v 2 -f 3.5",
+        "cmp --opt -v 2 1",
+        "cmp --opt 4",
+        "cmp 1 sub 2.5 --bar",
+        "cmp 1 sub 2.5 --bar 7 deep w --baz",
+        "cmp 1 sub 2.5 deep -v",
+        "cmp 1 sub 2.5 -f x 3",
+        "cmp 1 2 3",
+        "cmp x",
+        "cmp 1 --foo",
+        "cmp 1 --foo sub",
+        "cmp 1 -v -v",
+        "cmp 1 --help",
+        "cmp 1 sub",
+        "cmp 1 \"sub\" 2",
+        "cmp",
+    ],
+    "cmp2": ["cmp2", "cmp2 a", "cmp2 a 4 --foo", "cmp2 --foo", "cmp2 sub --bar x", "cmp2 sub --bar", "cmp2 a sub --foo"],
+    "cmp3": ["cmp3", "cmp3 1", "cmp3 1 a", "cmp3 a", "cmp3 --foo 1", "cmp3 --foo 1 2 3", "cmp3 --foo x"],
+    "cmp4": ["cmp4 1", "cmp4 1 --cnt --cnt", "cmp4 1 -c2"],
+}
+
+
+def _dump(res):
+    return (
+        res.matched,
+        res.origin,
+        repr(res.header_result),
+        res.main_args,
+        repr(res.options),
+        repr(res.subcommands),
+        repr(res.error_info),
+    )
+
+
+def test_parity():
+    for ing, sis in zip(ingedia, sistana):
+        for message in corpus[ing.command]:
+            assert _dump(sis.parse(message)) == _dump(ing.parse(message)), message
+
+
+def test_fast_path():
+    alc = sistana[0]
+    analyser = command_manager.require(alc)
+    assert compile_sistana(analyser) is not None
+    assert parse_sistana(alc, analyser, "cmp 1 sub 2.5 --bar 7") is not None
+    # 失败的解析与引号交由默认流程处理
+    assert parse_sistana(alc, analyser, "cmp x") is None
+    assert parse_sistana(alc, analyser, "cmp 1 \"sub\" 2") is None
+    # 不受支持的命令只会编译一次
+    analyser = command_manager.require(sistana[3])
+    assert compile_sistana(analyser) is None
+    assert analyser.compiled == {"sistana": None}
+    # 之后的解析不再经过 Sistana
+    from arclet.alconna._stargazing import compiler
+
+    called = []
+    compiler.parse_sistana = lambda *args: called.append(args)  # type: ignore
+    try:
+        assert sistana[3].parse("cmp4 1 -c2").matched
+    finally:
+        compiler.parse_sistana = parse_sistana
+    assert not called
+
+
+def test_probe_first():
+    with namespace("compiler_probe") as ns:
+        ns.config.backend = "sistana"
+        ns.config.probe_header = True
+        alc = Alconna("cmp6", Args.a(int))
+    assert not alc.parse("hello 1").matched
+    assert alc.parse("cmp6 1").query("a") == 1
+    assert (alc.probe_stats.hits, alc.probe_stats.misses) == (1, 1)
+    command_manager.delete(alc)
+
+
+def test_invalidate():
+    with namespace("compiler_update") as ns:
+        ns.config.backend = "sistana"
+        alc = Alconna("cmp5", Args.a(int), Option("--foo"))
+    plan = compile_sistana(command_manager.require(alc))
+    assert alc.parse("cmp5 1 --foo").find("foo")
+    alc.add(Option("--bar", Args.b(str)))
+    assert compile_sistana(command_manager.require(alc)) is not plan
+    res = alc.parse("cmp5 1 --bar x")
+    assert res.matched
+    assert res.query[str]("bar.b") == "x"
+    command_manager.delete(alc)
@@ -10,6 +10,45 @@ def test_collection():
     assert issubclass(list, DataCollection)
 
 
+def test_fuzzy():
+    """测试编辑距离与模糊匹配索引"""
+    from arclet.alconna.ingedia._util import FuzzyIndex, edit_distance, levenshtein
+
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("", "abc") == 3
+    assert edit_distance("kitten", "sitting", 1) == 2
+    assert edit_distance("a", "abcdef", 2) == 3
+    assert levenshtein("kitten", "sitting") == 1 - 3 / 7
+    assert levenshtein("kitten", "sitting", 0.8) == 0.0
+    assert levenshtein("kitten", "sittin", 0.6) == 1 - 2 / 6
+
+    index = FuzzyIndex(["--help", "--hepl", "-h", "--version"])
+    assert index.match("--hlep", 0.6) == "--help"
+    assert index.match("--versoin", 0.6) == "--version"
+    assert index.match("-x", 0.6) is None
+
+
+def test_scope():
+    """测试展开的作用域表"""
+    from types import SimpleNamespace
+
+    from arclet.alconna.ingedia._util import ChainMap
+
+    opt = SimpleNamespace(soft_keyword=False)
+    soft = SimpleNamespace(soft_keyword=True)
+    inner = SimpleNamespace(soft_keyword=True)
+    stack = ChainMap({"--opt": opt, "soft": soft})
+    assert "--opt" in stack and stack.hard_keyword("--opt")
+    assert not stack.hard_keyword("soft") and not stack.hard_keyword("none")
+    assert stack.parents() == {}
+    stack.enter({"--opt": inner})
+    assert stack["--opt"] is inner and not stack.hard_keyword("--opt")
+    assert "soft" in stack and "soft" in stack.parents()
+    assert stack.parents()["--opt"] == (opt, False)
+    stack.leave()
+    assert stack["--opt"] is opt
+
+
 if __name__ == "__main__":
     import pytest
 